@@ -34,6 +34,7 @@ class Observer(ops.Object):
         charm.framework.observe(charm.on.allow_domains_action, self._allow_domains)
         charm.framework.observe(charm.on.revoke_domains_action, self._revoke_domains)
         charm.framework.observe(charm.on.list_domains_action, self._list_domains)
+        charm.framework.observe(charm.on.compact_history_action, self._compact_history)
 
     def _generate_password(self) -> str:
         """Generate a new password.
@@ -123,3 +124,16 @@ class Observer(ops.Object):
         """
         username = event.params["username"]
         self._execute_command(["list_domains", username], event)
+
+    def _compact_history(self, event: ops.ActionEvent) -> None:
+        """Handle the compact-history action.
+
+        Args:
+            event: The event fired by the action.
+        """
+        command = ["compact_history", "--keep", str(event.params.get("keep", 100))]
+        if event.params.get("tag"):
+            command += ["--tag", event.params["tag"]]
+        if event.params.get("repository"):
+            command += ["--repository", event.params["repository"]]
+        self._execute_command(command, event)
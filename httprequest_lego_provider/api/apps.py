@@ -15,3 +15,8 @@ class ApiConfig(AppConfig):
 
     default_auto_field = "django.db.models.BigAutoField"
     name = "api"
+
+    def ready(self) -> None:
+        """Connect the signal receivers."""
+        # pylint: disable=import-outside-toplevel
+        from . import signals  # noqa: F401 pylint: disable=unused-import
@@ -0,0 +1,166 @@
+# Copyright 2025 Canonical Ltd.
+# See LICENSE file for licensing details.
+"""Authentication classes."""
+
+# imported-auth-user has to be disable as the conflicting import is needed for typing
+# pylint:disable=imported-auth-user
+
+import threading
+import time
+from collections import OrderedDict
+from typing import Iterable, Tuple
+
+from django.contrib.auth.models import User
+from django.utils.crypto import constant_time_compare, salted_hmac
+from opentelemetry import trace
+from rest_framework.authentication import BasicAuthentication
+
+from .settings import DNS_AUTH_CACHE_SIZE, DNS_AUTH_CACHE_TTL
+
+tracer = trace.get_tracer(__name__)
+
+
+class CredentialCache:
+    """Bounded cache of recently verified credentials, expiring them after a TTL.
+
+    Credentials are only kept as an HMAC keyed with the secret key, so that neither the
+    passwords nor an offline-attackable digest of them are held in memory. Each entry also
+    records the password hash the credentials were verified against: a password changed by
+    another worker or unit no longer matches it, so the entry is ignored. Entries are dropped
+    when the user is saved or deleted in this process.
+
+    Attributes:
+        enabled: whether the cache holds any credential.
+    """
+
+    def __init__(self, size: int, ttl: float):
+        """Initialize the cache.
+
+        Args:
+            size: maximum number of credentials cached, or 0 to disable the cache.
+            ttl: seconds a verified credential stays valid.
+        """
+        self._size = size
+        self._ttl = ttl
+        self._entries: OrderedDict[str, Tuple[float, int, str]] = OrderedDict()
+        self._lock = threading.Lock()
+
+    @property
+    def enabled(self) -> bool:
+        """Whether the cache holds any credential.
+
+        Returns:
+            whether the cache is enabled.
+        """
+        return self._size > 0 and self._ttl > 0
+
+    @staticmethod
+    def _key(username: str, password: str) -> str:
+        """Get the cache key of credentials.
+
+        Args:
+            username: the username.
+            password: the password.
+
+        Returns:
+            the cache key.
+        """
+        return salted_hmac(
+            "api.authentication.CredentialCache", f"{username}\0{password}", algorithm="sha256"
+        ).hexdigest()
+
+    def get(self, username: str, password: str) -> User | None:
+        """Get the user the credentials were verified for, if still valid.
+
+        Args:
+            username: the username.
+            password: the password.
+
+        Returns:
+            the active user, or None if the credentials have to be verified.
+        """
+        if not self.enabled:
+            return None
+        key = self._key(username, password)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            if entry[0] <= time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+        _, user_id, password_hash = entry
+        user = User.objects.filter(pk=user_id).first()
+        if (
+            user is None
+            or not user.is_active
+            or not constant_time_compare(user.password, password_hash)
+        ):
+            with self._lock:
+                self._entries.pop(key, None)
+            return None
+        return user
+
+    def add(self, username: str, password: str, user: User) -> None:
+        """Record credentials that have just been verified.
+
+        Args:
+            username: the username.
+            password: the password.
+            user: the user the credentials were verified for.
+        """
+        if not self.enabled:
+            return
+        key = self._key(username, password)
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self._ttl, user.pk, user.password)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self._size:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, user_ids: Iterable[int]) -> None:
+        """Drop the cached credentials of users.
+
+        Args:
+            user_ids: the user identifiers.
+        """
+        user_ids = set(user_ids)
+        with self._lock:
+            for key in [key for key, entry in self._entries.items() if entry[1] in user_ids]:
+                del self._entries[key]
+
+    def clear(self) -> None:
+        """Drop all the cached credentials."""
+        with self._lock:
+            self._entries.clear()
+
+
+credential_cache = CredentialCache(DNS_AUTH_CACHE_SIZE, DNS_AUTH_CACHE_TTL)
+
+
+class CachedBasicAuthentication(BasicAuthentication):
+    """HTTP Basic authentication skipping the password hash for recently verified credentials.
+
+    Lego authenticates every present and cleanup call, each of which would otherwise pay for a
+    full password hash.
+    """
+
+    @tracer.start_as_current_span("CachedBasicAuthentication.authenticate_credentials")
+    def authenticate_credentials(self, userid, password, request=None):
+        """Authenticate the credentials, from the cache when they were recently verified.
+
+        Args:
+            userid: the username.
+            password: the password.
+            request: the request.
+
+        Returns:
+            the authenticated user and no token.
+        """
+        user = credential_cache.get(userid, password)
+        if user is not None:
+            return (user, None)
+        user, auth = super().authenticate_credentials(userid, password, request)
+        credential_cache.add(userid, password, user)
+        return (user, auth)
@@ -2,31 +2,60 @@
 # See LICENSE file for licensing details.
 """DNS utiilities."""
 
-import io
+import abc
+import asyncio
+import binascii
+import contextvars
+import functools
 import logging
-from collections.abc import Iterable
-from os import PathLike
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
-from tempfile import TemporaryDirectory
-from typing import List, Tuple
+from typing import Any, Callable, Dict, List, Tuple
 
-from git import GitCommandError, Repo
+from django.db import connection
+from git import Blob, GitCommandError, PushInfo, Reference, Repo
+from git.objects.fun import tree_entries_from_data
 from opentelemetry import trace
 
-from .settings import GIT_REPO_URL
+from .locks import zone_file_locks
+from .mirror import RepositoryMirror, get_mirror
+from .objects import TREE_MODE, read_blob, store_object, store_tree_and_commit
+from .settings import (
+    DNS_BACKEND,
+    DNS_BATCH_WINDOW,
+    DNS_GIT_WRITER,
+    DNS_PUSH_BACKOFF,
+    DNS_PUSH_RETRIES,
+    DNS_SHARDS,
+    DNS_ZONE_DIR,
+    GIT_MIRROR_MAINTENANCE_INTERVAL,
+    GIT_MIRROR_REFRESH_INTERVAL,
+    GIT_REPO_URL,
+)
+from .zones import edit_indexed_zone, rewrite_zone_file
 
 logger = logging.getLogger(__name__)
 tracer = trace.get_tracer(__name__)
 
 FILENAME_TEMPLATE = "{domain}.domain"
-RECORD_CONTENT = "{record} 600 IN TXT \042{value}\042\n"
+BACKEND_LOCAL = "local"
+GIT_WRITER_OBJECT_DATABASE = "objectdb"
+PUSH_REJECTION_MARKERS = ("[rejected]", "non-fast-forward", "fetch first")
+REMOVE_ACTION = "Remove"
+# git only reports a push of a raw SHA rejected as "failed to push some refs", so the commits
+# written to the object database are pushed from this ref instead.
+PENDING_COMMIT_REF = "refs/dns/pending"
+
+_random = random.SystemRandom()
 
 
 class DnsSourceUpdateError(Exception):
     """Exception for DNS update errors."""
 
 
-@tracer.start_as_current_span("parse_repository_url")
 def parse_repository_url(repository_url: str) -> Tuple[str, str, str | None]:
     """Get the parsed connection details from the repository connection string.
 
@@ -43,7 +72,51 @@ def parse_repository_url(repository_url: str) -> Tuple[str, str, str | None]:
     return user, base_url, branch
 
 
-@tracer.start_as_current_span("_get_domain_and_subdomain_from_fqdn")
+@functools.lru_cache(maxsize=1)
+def parse_shards(shards: str) -> Dict[str, str]:
+    """Get the repository holding the zone file of each sharded domain.
+
+    Shards are separated by semicolons or new lines, each one holding a comma-separated list of
+    domains, an equal sign and the repository connection string, e.g.
+    ``example.com,example.org=git+ssh://user@repository@branch``.
+
+    Args:
+        shards: the shards configuration.
+
+    Returns:
+        the repository connection string by domain.
+
+    Raises:
+        ValueError: if a shard is malformed or a domain belongs to several shards.
+    """
+    repositories: Dict[str, str] = {}
+    for shard in shards.replace("\n", ";").split(";"):
+        if not shard.strip():
+            continue
+        domains, separator, repository_url = shard.partition("=")
+        if not separator or "//" not in repository_url:
+            raise ValueError(f"Invalid DNS shard: {shard.strip()!r}")
+        for domain in domains.split(","):
+            domain = domain.strip().lower()
+            if domain in repositories:
+                raise ValueError(f"Domain {domain} belongs to several DNS shards")
+            repositories[domain] = repository_url.strip()
+    return repositories
+
+
+def repository_urls() -> List[str]:
+    """Get the connection strings of all the configured repositories.
+
+    Returns:
+        the connection string of the default repository, then the ones of the shards.
+    """
+    urls = [GIT_REPO_URL] if GIT_REPO_URL else []
+    for url in parse_shards(DNS_SHARDS).values():
+        if url not in urls:
+            urls.append(url)
+    return urls
+
+
 def _get_domain_and_subdomain_from_fqdn(fqdn: str) -> Tuple[str, str]:
     """Get the domain and subdomain for the FQDN record provided.
 
@@ -60,107 +133,744 @@ def _get_domain_and_subdomain_from_fqdn(fqdn: str) -> Tuple[str, str]:
     )
 
 
-def _line_matches_subdomain(line: str, subdomain: str) -> bool:
-    """Check if the line in bind9 format corresponds to a given subdomain.
+def _record_filename(fqdn: str) -> str:
+    """Get the name of the zone file holding the records for a FQDN.
 
     Args:
-        line: the line in bind9 format.
-        subdomain: the subdomain to compare with.
+        fqdn: Fully qualified domain name.
 
     Returns:
-        true if the subdomain matches the line.
+        the relative filename of the DNS record file.
     """
-    return not line.strip().startswith(";") and bool(line.split()) and line.split()[0] == subdomain
+    domain, _ = _get_domain_and_subdomain_from_fqdn(fqdn)
+    return FILENAME_TEMPLATE.format(domain=domain)
 
 
-@tracer.start_as_current_span("_remove_subdomain_entries_from_file_content")
-def _remove_subdomain_entries_from_file_content(
-    content: Iterable[str], subdomain: str
-) -> List[str]:
-    """Remove from the file the entries matching a subdomain.
+def _missing_record_file_message(filename: str, source: str = "git repository") -> str:
+    """Describe a DNS record file missing from the repository.
 
     Args:
-        content: the file content.
-        subdomain: the subdomain for which to filter out the entries.
+        filename: the relative filename of the DNS record file.
+        source: where the DNS record file was looked up.
 
     Returns:
-        the content excluding the entries for the  subdomain.
+        the error message.
     """
-    new_content = []
-    for line in content:
-        if not _line_matches_subdomain(line, subdomain):
-            new_content.append(line)
-        else:
-            logging.error("Subdomain %s already present as a DNS record.", subdomain)
-    return new_content
+    return f"{filename} file not found in {source}. Is this site configured for DNS?"
+
+
+class RecordChange:  # pylint: disable=too-few-public-methods
+    """A pending change to a TXT record of a FQDN.
+
+    A FQDN can hold several TXT records, e.g. when a certificate covers both a domain and its
+    wildcard, so a change only adds or removes the record holding its own value.
+
+    Attributes:
+        fqdn: the FQDN for which to update the record.
+        value: ACME challenge of the record, or None to remove all the records of the FQDN.
+        commit_action: the verb used in the commit message, "Remove" for the changes removing
+            the record and e.g. "Add" for the ones adding it.
+        add: whether the change adds the record.
+        error: the error that prevented applying the change, if any.
+        done: whether the change has been processed.
+    """
+
+    def __init__(self, fqdn: str, value: str | None, commit_action: str):
+        """Initialize the change.
+
+        Args:
+            fqdn: the FQDN for which to update the record.
+            value: ACME challenge of the record, or None to remove all the records of the FQDN.
+            commit_action: the verb used in the commit message, "Remove" for the changes
+                removing the record and e.g. "Add" for the ones adding it.
+        """
+        self.fqdn = fqdn
+        self.value = value
+        self.commit_action = commit_action
+        self.add = value is not None and commit_action != REMOVE_ACTION
+        self.error: DnsSourceUpdateError | None = None
+        self.done = False
+
+    def describe(self) -> str:
+        """Describe the change for a commit message.
+
+        Returns:
+            a one-line description of the change.
+        """
+        return f"{self.commit_action} {self.fqdn} record"
+
+
+def _group_by_filename(changes: List[RecordChange]) -> Dict[str, List[RecordChange]]:
+    """Group changes by the DNS record file they edit.
+
+    Args:
+        changes: the changes.
+
+    Returns:
+        the changes, by relative filename of their DNS record file.
+    """
+    by_filename: Dict[str, List[RecordChange]] = {}
+    for change in changes:
+        by_filename.setdefault(_record_filename(change.fqdn), []).append(change)
+    return by_filename
+
+
+def _record_edits(changes: List[RecordChange]) -> Dict[Tuple[str, str | None], bool]:
+    """Get the record edits applying changes to a DNS record file one after the other.
+
+    A later change of a record replaces the earlier ones, and moves after the changes made in
+    between, so that the edits apply in the order of the last change of each record.
+
+    Args:
+        changes: the changes, all for the same DNS record file.
+
+    Returns:
+        whether to add or remove the record, by subdomain and value, a None value removing all
+        the records of the subdomain, in the order the edits apply.
+    """
+    edits: Dict[Tuple[str, str | None], bool] = {}
+    for change in changes:
+        _, subdomain = _get_domain_and_subdomain_from_fqdn(change.fqdn)
+        edits.pop((subdomain, change.value), None)
+        edits[(subdomain, change.value)] = change.add
+    return edits
 
 
 @tracer.start_as_current_span("_write_record_file")
-def _write_record_file(repo_dir: str | PathLike[str] | None, fqdn: str, value: str | None) -> str:
-    """Update the DNS record file in the working tree for the given FQDN.
+def _write_record_file(repo: Repo, filename: str, changes: List[RecordChange]) -> bool:
+    """Update a DNS record file in the working tree for a group of changes.
+
+    The working tree matches the last commit, so the file is edited through the index cached
+    for its blob in that commit, only being read and parsed if it is not cached.
 
     Args:
-        repo_dir: the repository working tree directory.
-        fqdn: the FQDN for which to update the record.
-        value: ACME challenge for the DNS record to add, or None to only remove it.
+        repo: the repository to update.
+        filename: the relative filename of the DNS record file.
+        changes: the changes to the records of the file.
 
     Returns:
-        the relative filename of the updated DNS record file.
+        whether the file has been updated, false if it already held the requested records.
 
     Raises:
         DnsSourceUpdateError: if the DNS record file does not exist.
     """
-    domain, subdomain = _get_domain_and_subdomain_from_fqdn(fqdn)
-    filename = FILENAME_TEMPLATE.format(domain=domain)
-    dns_record_file = Path(f"{repo_dir}/{filename}")
+    path = Path(f"{repo.working_tree_dir}/{filename}")
     try:
-        with tracer.start_as_current_span("git.read_file"):
-            content = dns_record_file.read_text("utf-8")
-    except FileNotFoundError as exc:
-        raise DnsSourceUpdateError(
-            f"{filename} file not found in git repository. Is this site configured for DNS?"
-        ) from exc
+        content = edit_indexed_zone(
+            repo.head.commit.tree[filename].binsha,
+            lambda: path.read_text("utf-8"),
+            _record_edits(changes),
+        )
+    except (KeyError, FileNotFoundError) as exc:
+        raise DnsSourceUpdateError(_missing_record_file_message(filename)) from exc
+    if content is None:
+        return False
     with tracer.start_as_current_span("git.modify"):
-        new_content = _remove_subdomain_entries_from_file_content(io.StringIO(content), subdomain)
-        if value is not None:
-            new_content.append(RECORD_CONTENT.format(record=subdomain, value=value))
-        dns_record_file.write_text("".join(new_content), encoding="utf-8")
-    return filename
+        path.write_bytes(content)
+    return True
+
+
+def _commit_message(changes: List[RecordChange]) -> str:
+    """Build the commit message for a group of changes.
+
+    Args:
+        changes: the changes included in the commit.
+
+    Returns:
+        the commit message.
+    """
+    if len(changes) == 1:
+        return changes[0].describe()
+    details = "\n".join(f"- {change.describe()}" for change in changes)
+    return f"Update {len(changes)} records\n\n{details}"
+
+
+def _push(repo: Repo, refspec: str | None = None) -> bool:
+    """Push to the remote.
+
+    Args:
+        repo: the repository to push.
+        refspec: what to push, defaults to the current branch.
+
+    Returns:
+        false if the remote rejected the push because it has moved ahead, true otherwise.
+
+    Raises:
+        GitCommandError: if the push fails for any other reason.
+    """
+    remote = repo.remote(name="origin")
+    try:
+        push_infos = remote.push(refspec) if refspec else remote.push()
+    except GitCommandError as exc:
+        if any(marker in str(exc) for marker in PUSH_REJECTION_MARKERS):
+            return False
+        raise
+    if any(info.flags & (PushInfo.REJECTED | PushInfo.REMOTE_REJECTED) for info in push_infos):
+        return False
+    push_infos.raise_if_error()
+    return True
+
+
+def _commit_record_changes(repo: Repo, changes: List[RecordChange]) -> List[RecordChange]:
+    """Edit the zone files in the working tree for a group of changes and commit them.
+
+    Args:
+        repo: the repository to update.
+        changes: the changes to apply.
+
+    Returns:
+        the changes included in the commit. The ones of zone files already reflecting them are
+        left out, and the other ones get their own error.
+    """
+    applied: List[RecordChange] = []
+    filenames = set()
+    for filename, file_changes in _group_by_filename(changes).items():
+        try:
+            updated = _write_record_file(repo, filename, file_changes)
+        except DnsSourceUpdateError as exc:
+            for change in file_changes:
+                change.error = exc
+            continue
+        for change in file_changes:
+            change.error = None
+        if updated:
+            filenames.add(filename)
+            applied.extend(file_changes)
+    if applied:
+        with tracer.start_as_current_span("git.commit"):
+            repo.git.add(*sorted(filenames))
+            repo.git.commit("-m", _commit_message(applied))
+    return applied
+
+
+@tracer.start_as_current_span("_commit_record_changes_to_object_database")
+def _commit_record_changes_to_object_database(
+    mirror: RepositoryMirror, repo: Repo, changes: List[RecordChange]
+) -> Tuple[List[RecordChange], str | None]:
+    """Commit a group of changes on top of the remote branch without a working tree.
+
+    Blobs, the root tree and the commit are written straight to the object database of the
+    mirror, in process, so that no git subprocess is spawned until the push. Objects are read
+    through the persistent cat-file processes GitPython keeps for the mirror.
+
+    Args:
+        mirror: the mirror of the repository.
+        repo: the repository of the mirror, with the remote branch freshly fetched.
+        changes: the changes to apply.
+
+    Returns:
+        the changes included in the commit, the ones the zone files already reflect being left
+        out and the other ones getting their own error, and the refspec pushing the commit,
+        held by PENDING_COMMIT_REF, to the remote branch.
+    """
+    parent = repo.commit(f"refs/remotes/origin/{mirror.tracking_branch}")
+    entries = {
+        name: (binsha, mode)
+        for binsha, mode, name in tree_entries_from_data(parent.tree.data_stream.read())
+    }
+    contents: Dict[str, bytes] = {}
+    applied: List[RecordChange] = []
+    for filename, file_changes in _group_by_filename(changes).items():
+        if filename not in entries or entries[filename][1] == TREE_MODE:
+            error = DnsSourceUpdateError(_missing_record_file_message(filename))
+            for change in file_changes:
+                change.error = error
+            continue
+        binsha = entries[filename][0]
+        for change in file_changes:
+            change.error = None
+        content = edit_indexed_zone(
+            binsha,
+            functools.partial(read_blob, repo, binsha),
+            _record_edits(file_changes),
+        )
+        if content is not None:
+            contents[filename] = content
+            applied.extend(file_changes)
+    if not applied:
+        return applied, None
+    with tracer.start_as_current_span("git.commit"):
+        for filename, content in contents.items():
+            binsha = store_object(repo, Blob.type, content)
+            entries[filename] = (binsha, entries[filename][1])
+        commit = store_tree_and_commit(repo, entries, parent.hexsha, _commit_message(applied))
+        Reference.create(
+            repo, PENDING_COMMIT_REF, binascii.hexlify(commit).decode("ascii"), force=True
+        )
+    return applied, f"{PENDING_COMMIT_REF}:refs/heads/{mirror.tracking_branch}"
+
+
+@tracer.start_as_current_span("_apply_record_changes")
+def _apply_record_changes(mirror: RepositoryMirror, changes: List[RecordChange]) -> None:
+    """Apply a group of changes to the repository in a single commit and push.
+
+    Changes that cannot be applied get their own error and are left out of the commit. The
+    zone files involved stay locked across workers and units for the whole update. If the
+    remote moved ahead, the new tip is fetched and the changes are applied again on top of it,
+    with a jittered exponential backoff between attempts. If the commit or the push fail for
+    good, all the remaining changes get the error.
+
+    Args:
+        mirror: the mirror of the repository to update.
+        changes: the changes to apply.
+    """
+    span = trace.get_current_span()
+    span.set_attribute("dns.batch_size", len(changes))
+    filenames = [_record_filename(change.fqdn) for change in changes]
+    with zone_file_locks(f"{mirror.base_url}@{mirror.branch or ''}", filenames), mirror.lock:
+        try:
+            for attempt in range(DNS_PUSH_RETRIES + 1):
+                span.set_attribute("git.push.retries", attempt)
+                if attempt:
+                    time.sleep(_random.uniform(0, DNS_PUSH_BACKOFF * 2 ** (attempt - 1)))
+                if DNS_GIT_WRITER == GIT_WRITER_OBJECT_DATABASE:
+                    repo = mirror.sync(checkout=False)
+                    applied, refspec = _commit_record_changes_to_object_database(
+                        mirror, repo, changes
+                    )
+                else:
+                    repo = mirror.sync(filenames=filenames)
+                    applied, refspec = _commit_record_changes(repo, changes), None
+                if not applied:
+                    return
+                with tracer.start_as_current_span("git.push") as push_span:
+                    push_span.set_attribute("git.push.attempt", attempt)
+                    if _push(repo, refspec):
+                        return
+                logger.info("Push rejected by the remote, retrying on top of its new tip")
+            raise DnsSourceUpdateError(
+                f"Push still rejected by the remote after {DNS_PUSH_RETRIES} retries."
+            )
+        except (GitCommandError, ValueError, DnsSourceUpdateError) as ex:
+            for change in changes:
+                change.error = change.error or DnsSourceUpdateError(str(ex))
+
+
+class RecordBackend(abc.ABC):  # pylint: disable=too-few-public-methods
+    """Storage the DNS record files are written to."""
+
+    @abc.abstractmethod
+    def apply(self, changes: List[RecordChange]) -> None:
+        """Apply a group of changes.
+
+        Changes that cannot be applied get their own error. If the whole group fails, all the
+        remaining changes get the error.
+
+        Args:
+            changes: the changes to apply.
+        """
+
+
+class GitRecordBackend(RecordBackend):  # pylint: disable=too-few-public-methods
+    """Backend committing the DNS record files to a git repository and pushing them."""
+
+    def __init__(self, mirror: RepositoryMirror):
+        """Initialize the backend.
+
+        Args:
+            mirror: the mirror of the repository to update.
+        """
+        self._mirror = mirror
+
+    def apply(self, changes: List[RecordChange]) -> None:
+        """Apply a group of changes in a single commit and push.
+
+        Args:
+            changes: the changes to apply.
+        """
+        _apply_record_changes(self._mirror, changes)
+
+
+class LocalRecordBackend(RecordBackend):  # pylint: disable=too-few-public-methods
+    """Backend rewriting the DNS record files in a local directory, without version control.
+
+    Attributes:
+        path: the directory holding the DNS record files.
+    """
+
+    def __init__(self, path: Path):
+        """Initialize the backend.
+
+        Args:
+            path: the directory holding the DNS record files.
+        """
+        self.path = path
+
+    @tracer.start_as_current_span("LocalRecordBackend.apply")
+    def apply(self, changes: List[RecordChange]) -> None:
+        """Apply a group of changes, rewriting every DNS record file involved once.
+
+        The DNS record files stay locked across workers and units while they are rewritten.
+        Files already holding the requested records are left untouched.
+
+        Args:
+            changes: the changes to apply.
+        """
+        trace.get_current_span().set_attribute("dns.batch_size", len(changes))
+        by_filename = _group_by_filename(changes)
+        with zone_file_locks(str(self.path), by_filename):
+            for filename, file_changes in by_filename.items():
+                try:
+                    rewrite_zone_file(
+                        self.path / filename, _record_edits(file_changes), durable=True
+                    )
+                except FileNotFoundError:
+                    error = DnsSourceUpdateError(
+                        _missing_record_file_message(filename, str(self.path))
+                    )
+                    for change in file_changes:
+                        change.error = error
+                except OSError as exc:
+                    for change in file_changes:
+                        change.error = DnsSourceUpdateError(str(exc))
+
+
+def _resolve(future: asyncio.Future) -> None:
+    """Release a submitter waiting on a future, unless it has given up.
+
+    Args:
+        future: the future the submitter waits on.
+    """
+    if not future.done():
+        future.set_result(None)
+
+
+def _raise_for_errors(changes: List[RecordChange]) -> None:
+    """Raise the error of the first change that could not be applied, if any.
+
+    Args:
+        changes: the processed changes.
+
+    Raises:
+        DnsSourceUpdateError: if any of the changes could not be applied.
+    """
+    for change in changes:
+        if change.error:
+            raise DnsSourceUpdateError(str(change.error)) from change.error
+
+
+def _run_closing_connection(func: Callable[..., None], *args: Any) -> None:
+    """Run a function on a worker thread, then close the database connection of the thread.
+
+    The zone file locks may open a database connection on the thread, which Django only
+    closes for the threads serving its requests.
+
+    Args:
+        func: the function to run.
+        args: the arguments of the function.
+    """
+    try:
+        func(*args)
+    finally:
+        connection.close()
+
+
+class RecordWriter:  # pylint: disable=too-few-public-methods
+    """Group-commit writer for DNS record changes.
+
+    Changes submitted concurrently are applied together. The first submitter becomes the
+    leader: it waits for the batching window, then applies everything pending to the backend
+    in one go, e.g. one commit and push, while later submitters queue up for the next group.
+    Every submitter is released with the outcome of its own changes.
+
+    Changes are coalesced by record: only the last pending change of a FQDN and value is
+    applied, as it fully determines the record, and the changes it supersedes share its
+    outcome. A change identical to one being applied, with nothing pending in between for the
+    FQDN, waits for that one instead of being applied again.
+    """
+
+    def __init__(self, backend: RecordBackend, window: float):
+        """Initialize the writer.
+
+        Args:
+            backend: the backend the changes are applied to.
+            window: seconds the leader waits for more changes before applying them.
+        """
+        self._backend = backend
+        self._window = window
+        self._pending: List[RecordChange] = []
+        self._condition = threading.Condition()
+        self._leader_active = False
+        self._async_waiters: List[Tuple[asyncio.AbstractEventLoop, asyncio.Future]] = []
+        self._in_flight: Dict[Tuple[str, str | None, bool], List[RecordChange]] = {}
+
+    def _enqueue(self, changes: List[RecordChange]) -> None:
+        """Queue changes for the next group, or attach them to identical in-flight ones.
+
+        The condition must be held.
+
+        Args:
+            changes: the changes to queue.
+        """
+        for change in changes:
+            followers = self._in_flight.get((change.fqdn, change.value, change.add))
+            if followers is not None and not any(
+                pending.fqdn == change.fqdn for pending in self._pending
+            ):
+                followers.append(change)
+            else:
+                self._pending.append(change)
+
+    def _notify(self) -> None:
+        """Wake up every submitter waiting for its changes, with the condition held."""
+        self._condition.notify_all()
+        waiters, self._async_waiters = self._async_waiters, []
+        for loop, future in waiters:
+            try:
+                loop.call_soon_threadsafe(_resolve, future)
+            except RuntimeError:
+                # The event loop of the submitter has been closed in the meantime.
+                pass
+
+    def _lead(self, changes: List[RecordChange]) -> None:
+        """Apply pending groups of changes until the given ones are processed.
+
+        Args:
+            changes: the changes of the leading submitter.
+        """
+        try:
+            if self._window:
+                time.sleep(self._window)
+            while not all(change.done for change in changes):
+                with self._condition:
+                    batch, self._pending = self._pending, []
+                    latest: Dict[Tuple[str, str | None], RecordChange] = {}
+                    for change in batch:
+                        # Keep the changes in the order of the last change of each record.
+                        latest.pop((change.fqdn, change.value), None)
+                        latest[(change.fqdn, change.value)] = change
+                    self._in_flight = {
+                        (change.fqdn, change.value, change.add): [change]
+                        for change in latest.values()
+                    }
+                if len(latest) < len(batch):
+                    logger.debug("Coalesced %d DNS record changes", len(batch) - len(latest))
+                try:
+                    self._backend.apply(list(latest.values()))
+                except Exception as exc:  # pylint: disable=broad-exception-caught
+                    # Waiting submitters must always be released with an outcome.
+                    logger.exception("Unexpected error applying DNS record changes")
+                    for change in latest.values():
+                        change.error = change.error or DnsSourceUpdateError(str(exc))
+                finally:
+                    with self._condition:
+                        for change in batch:
+                            change.error = latest[(change.fqdn, change.value)].error
+                            change.done = True
+                        for applied, *followers in self._in_flight.values():
+                            for follower in followers:
+                                follower.error = applied.error
+                                follower.done = True
+                        self._in_flight = {}
+                        self._notify()
+        finally:
+            with self._condition:
+                self._leader_active = False
+                self._notify()
+
+    def submit(self, changes: List[RecordChange]) -> None:
+        """Apply changes, blocking until they are stored.
+
+        A DnsSourceUpdateError is raised if any of the changes could not be applied.
+
+        Args:
+            changes: the changes to apply.
+        """
+        with self._condition:
+            self._enqueue(changes)
+            while not all(change.done for change in changes):
+                if not self._leader_active:
+                    self._leader_active = True
+                    break
+                self._condition.wait()
+        if not all(change.done for change in changes):
+            self._lead(changes)
+        _raise_for_errors(changes)
+
+    async def asubmit(self, changes: List[RecordChange]) -> None:
+        """Apply changes, waiting without blocking the event loop until they are stored.
+
+        A DnsSourceUpdateError is raised if any of the changes could not be applied. Waiting
+        submitters only hold a future, so an event loop can keep many of them in flight. A
+        submitter becoming the leader applies the pending changes on an executor.
+
+        Args:
+            changes: the changes to apply.
+        """
+        loop = asyncio.get_running_loop()
+        lead = False
+        with self._condition:
+            self._enqueue(changes)
+        while True:
+            with self._condition:
+                if all(change.done for change in changes):
+                    break
+                if not self._leader_active:
+                    self._leader_active = lead = True
+                    break
+                future = loop.create_future()
+                self._async_waiters.append((loop, future))
+            await future
+        if lead:
+            # The executor runs in a copy of the context, to keep the trace of the request.
+            await loop.run_in_executor(
+                None,
+                contextvars.copy_context().run,
+                _run_closing_connection,
+                self._lead,
+                changes,
+            )
+        _raise_for_errors(changes)
+
+
+_writers: Dict[Tuple[str, str], RecordWriter] = {}
+_writers_lock = threading.Lock()
+
+
+def _create_backend(repository_url: str) -> RecordBackend:
+    """Create the configured backend.
+
+    Args:
+        repository_url: the connection string of the repository, for the git backend.
+
+    Returns:
+        the local directory backend if configured, the git repository backend otherwise.
+    """
+    if DNS_BACKEND == BACKEND_LOCAL:
+        return LocalRecordBackend(Path(DNS_ZONE_DIR))
+    user, base_url, branch = parse_repository_url(repository_url)
+    return GitRecordBackend(get_mirror(user, base_url, branch))
+
+
+def _get_writer(repository_url: str | None = None) -> RecordWriter:
+    """Get the process-wide writer for the configured backend, creating it if needed.
+
+    Args:
+        repository_url: the connection string of the repository, defaults to the default
+            repository.
+
+    Returns:
+        the writer for the configured backend.
+    """
+    repository_url = repository_url or GIT_REPO_URL
+    location = DNS_ZONE_DIR if DNS_BACKEND == BACKEND_LOCAL else repository_url
+    with _writers_lock:
+        writer = _writers.get((DNS_BACKEND, location))
+        if writer is None:
+            writer = RecordWriter(_create_backend(repository_url), DNS_BATCH_WINDOW)
+            _writers[(DNS_BACKEND, location)] = writer
+        return writer
+
+
+def _group_by_repository(changes: List[RecordChange]) -> Dict[str, List[RecordChange]]:
+    """Group changes by the repository holding their zone file.
+
+    Args:
+        changes: the changes to group.
+
+    Returns:
+        the changes by repository connection string, the default repository holding the zone
+        files of the domains outside of the shards and of the local backend.
+    """
+    shards = parse_shards(DNS_SHARDS) if DNS_BACKEND != BACKEND_LOCAL else {}
+    grouped: Dict[str, List[RecordChange]] = {}
+    for change in changes:
+        domain, _ = _get_domain_and_subdomain_from_fqdn(change.fqdn)
+        grouped.setdefault(shards.get(domain.lower(), GIT_REPO_URL), []).append(change)
+    return grouped
+
+
+def start_mirror_warmer() -> None:
+    """Clone the configured repositories in the background and keep them up to date.
+
+    Nothing is started for the local backend, without a repository configured or with the
+    background refresh disabled.
+    """
+    if DNS_BACKEND == BACKEND_LOCAL or GIT_MIRROR_REFRESH_INTERVAL <= 0:
+        return
+    for repository_url in repository_urls():
+        user, base_url, branch = parse_repository_url(repository_url)
+        get_mirror(user, base_url, branch).start_warmer(
+            GIT_MIRROR_REFRESH_INTERVAL, checkout=DNS_GIT_WRITER != GIT_WRITER_OBJECT_DATABASE
+        )
+
+
+def start_mirror_maintenance() -> None:
+    """Repack the mirrors of the configured repositories periodically, in the background.
+
+    Nothing is started for the local backend, without a repository configured or with the
+    background maintenance disabled.
+    """
+    if DNS_BACKEND == BACKEND_LOCAL or GIT_MIRROR_MAINTENANCE_INTERVAL <= 0:
+        return
+    for repository_url in repository_urls():
+        user, base_url, branch = parse_repository_url(repository_url)
+        get_mirror(user, base_url, branch).start_maintenance(GIT_MIRROR_MAINTENANCE_INTERVAL)
+
+
+def apply_record_changes(changes: List[RecordChange]) -> None:
+    """Apply a group of DNS record changes, blocking until they are stored.
+
+    Every change is given its own outcome: on failure, the changes that could not be applied
+    hold the error. Changes to zone files held by different shards are applied in parallel,
+    each shard committing and pushing its own.
+
+    Args:
+        changes: the changes to apply.
+    """
+    grouped = _group_by_repository(changes)
+    if len(grouped) < 2:
+        for repository_url, shard_changes in grouped.items():
+            _get_writer(repository_url).submit(shard_changes)
+        return
+    with ThreadPoolExecutor(max_workers=len(grouped)) as executor:
+        futures = [
+            # Each thread runs in a copy of the context, to keep the trace of the request.
+            executor.submit(
+                contextvars.copy_context().run,
+                _run_closing_connection,
+                _get_writer(repository_url).submit,
+                shard_changes,
+            )
+            for repository_url, shard_changes in grouped.items()
+        ]
+    _raise_for_errors(changes)
+    for future in futures:
+        future.result()
+
+
+async def aapply_record_changes(changes: List[RecordChange]) -> None:
+    """Apply a group of DNS record changes, waiting asynchronously until they are stored.
+
+    Args:
+        changes: the changes to apply.
+    """
+    with tracer.start_as_current_span("aapply_record_changes"):
+        tasks = [
+            asyncio.ensure_future(_get_writer(repository_url).asubmit(shard_changes))
+            for repository_url, shard_changes in _group_by_repository(changes).items()
+        ]
+        await asyncio.gather(*tasks, return_exceptions=True)
+        _raise_for_errors(changes)
+        for task in tasks:
+            task.result()
 
 
 @tracer.start_as_current_span("_update_dns_record")
 def _update_dns_record(fqdn: str, value: str | None, commit_action: str) -> None:
-    """Update the git repository for a DNS record, removing any existing entry.
+    """Update the configured backend for a DNS record.
 
     Args:
         fqdn: the FQDN for which to update the record.
-        value: ACME challenge for the DNS record to add, or None to only remove it.
+        value: ACME challenge of the record, or None to remove all the records of the FQDN.
         commit_action: the verb used in the commit message (e.g. "Add" or "Remove").
-
-    Raises:
-        DnsSourceUpdateError: if an error while updating the repository occurs.
     """
-    user, base_url, branch = parse_repository_url(GIT_REPO_URL)
-    with TemporaryDirectory() as tmp_dir:
-        try:
-            with tracer.start_as_current_span("git.clone"):
-                repo = Repo.clone_from(base_url, tmp_dir, branch=branch, depth=1)
-            config_writer = repo.config_writer()
-            config_writer.set_value("user", "name", user)
-            config_writer.release()
-            filename = _write_record_file(repo.working_tree_dir, fqdn, value)
-            with tracer.start_as_current_span("git.commit"):
-                repo.index.add([filename])
-                repo.git.commit("-m", f"{commit_action} {fqdn} record")
-            with tracer.start_as_current_span("git.push"):
-                repo.remote(name="origin").push()
-        except (GitCommandError, ValueError) as ex:
-            raise DnsSourceUpdateError(str(ex)) from ex
+    apply_record_changes([RecordChange(fqdn, value, commit_action)])
 
 
 @tracer.start_as_current_span("write_dns_record")
 def write_dns_record(fqdn: str, value: str) -> None:
-    """Write a DNS record.
+    """Write a DNS record, keeping the records of the FQDN holding other values.
 
     Args:
         fqdn: the FQDN for which to add a record.
@@ -170,10 +880,31 @@ def write_dns_record(fqdn: str, value: str) -> None:
 
 
 @tracer.start_as_current_span("remove_dns_record")
-def remove_dns_record(fqdn: str) -> None:
+def remove_dns_record(fqdn: str, value: str | None = None) -> None:
     """Delete a DNS record if it exists.
 
     Args:
         fqdn: the FQDN for which to delete the record.
+        value: ACME challenge of the record, or None to delete all the records of the FQDN.
+    """
+    _update_dns_record(fqdn, value, REMOVE_ACTION)
+
+
+async def awrite_dns_record(fqdn: str, value: str) -> None:
+    """Write a DNS record without blocking the event loop, keeping the other values.
+
+    Args:
+        fqdn: the FQDN for which to add a record.
+        value: ACME challenge for DNS record to add.
+    """
+    await aapply_record_changes([RecordChange(fqdn, value, "Add")])
+
+
+async def aremove_dns_record(fqdn: str, value: str | None = None) -> None:
+    """Delete a DNS record if it exists, without blocking the event loop.
+
+    Args:
+        fqdn: the FQDN for which to delete the record.
+        value: ACME challenge of the record, or None to delete all the records of the FQDN.
     """
-    _update_dns_record(fqdn, None, "Remove")
+    await aapply_record_changes([RecordChange(fqdn, value, REMOVE_ACTION)])
@@ -0,0 +1,203 @@
+# Copyright 2025 Canonical Ltd.
+# See LICENSE file for licensing details.
+"""Compaction of the history of the DNS records repository."""
+
+import binascii
+import logging
+import shutil
+import time
+from pathlib import Path
+from tempfile import mkdtemp
+from typing import List
+
+from git import Commit, GitCommandError, Repo
+from opentelemetry import trace
+
+from .dns import (
+    BACKEND_LOCAL,
+    PUSH_REJECTION_MARKERS,
+    DnsSourceUpdateError,
+    parse_repository_url,
+)
+from .objects import serialize_commit, store_object
+from .settings import DNS_BACKEND, GIT_MIRROR_DIR, GIT_REPO_URL
+
+logger = logging.getLogger(__name__)
+tracer = trace.get_tracer(__name__)
+
+ARCHIVE_TAG_TEMPLATE = "archive/{branch}/{timestamp}"
+SIGNATURE_HEADERS = (b"gpgsig ", b"gpgsig-sha256 ")
+
+
+class HistoryCompaction:  # pylint: disable=too-few-public-methods
+    """Outcome of a compaction of the repository history.
+
+    Attributes:
+        checkpoint: the hexsha of the commit whose tree the new root commit holds, or None if
+            the history was already short enough.
+        kept: the number of recent commits replayed on top of the new root commit.
+        tip: the hexsha of the new tip of the branch, or None if nothing was compacted.
+        tag: the tag holding the previous history, or None if nothing was compacted.
+    """
+
+    def __init__(
+        self, checkpoint: str | None, kept: int, tip: str | None = None, tag: str | None = None
+    ):
+        """Initialize the outcome.
+
+        Args:
+            checkpoint: the hexsha of the commit whose tree the new root commit holds.
+            kept: the number of recent commits replayed on top of the new root commit.
+            tip: the hexsha of the new tip of the branch.
+            tag: the tag holding the previous history.
+        """
+        self.checkpoint = checkpoint
+        self.kept = kept
+        self.tip = tip
+        self.tag = tag
+
+
+def _replay_commit(repo: Repo, raw: bytes, parent: str) -> str:
+    """Copy a commit onto another parent, keeping its tree, authorship and message.
+
+    Signatures are dropped, as they no longer match the copy.
+
+    Args:
+        repo: the repository.
+        raw: the raw commit object to copy.
+        parent: the hexadecimal SHA of the new parent.
+
+    Returns:
+        the hexadecimal SHA of the copy.
+    """
+    header, _, message = raw.partition(b"\n\n")
+    lines: List[bytes] = []
+    signature = False
+    for line in header.split(b"\n"):
+        # Continuation lines of a multi-line header start with a space.
+        signature = line.startswith(SIGNATURE_HEADERS) or (signature and line.startswith(b" "))
+        if signature or line.startswith(b"parent "):
+            continue
+        lines.append(line)
+        if line.startswith(b"tree "):
+            lines.append(f"parent {parent}".encode("ascii"))
+    binsha = store_object(repo, Commit.type, b"\n".join(lines) + b"\n\n" + message)
+    return binascii.hexlify(binsha).decode("ascii")
+
+
+def _clone(user: str, base_url: str, branch: str | None, path: Path, keep: int) -> Repo:
+    """Clone the last commits of the repository branch, without their blobs.
+
+    Args:
+        user: the name of the committer.
+        base_url: the URL of the repository.
+        branch: the branch to clone, defaults to the default branch.
+        path: the directory to clone the repository in.
+        keep: the number of recent commits to keep on top of the checkpoint.
+
+    Returns:
+        the bare clone.
+    """
+    with tracer.start_as_current_span("git.clone"):
+        # Two more commits than kept: the checkpoint and at least one to squash into it.
+        repo = Repo.clone_from(
+            base_url, path, bare=True, branch=branch, depth=keep + 2, filter="blob:none"
+        )
+    repo.config_writer().set_value("user", "name", user).release()
+    return repo
+
+
+def _tag_and_push(repo: Repo, branch: str, previous_tip: str, tip: str, tag: str) -> None:
+    """Tag the previous tip and force-push the compacted branch, atomically.
+
+    Args:
+        repo: the clone holding the compacted history.
+        branch: the compacted branch.
+        previous_tip: the hexsha of the tip of the branch before the compaction.
+        tip: the hexsha of the tip of the compacted history.
+        tag: the name of the tag holding the previous history.
+
+    Raises:
+        DnsSourceUpdateError: if the branch moved since it was read or the push failed.
+    """
+    with tracer.start_as_current_span("git.push"):
+        try:
+            repo.git.push(
+                "--atomic",
+                f"--force-with-lease=refs/heads/{branch}:{previous_tip}",
+                "origin",
+                f"{previous_tip}:refs/tags/{tag}",
+                f"{tip}:refs/heads/{branch}",
+            )
+        except GitCommandError as exc:
+            if any(marker in str(exc) for marker in (*PUSH_REJECTION_MARKERS, "stale info")):
+                raise DnsSourceUpdateError(
+                    f"The {branch} branch changed during the compaction, try again."
+                ) from exc
+            raise DnsSourceUpdateError(f"Failed to push the compacted history: {exc}") from exc
+
+
+@tracer.start_as_current_span("compact_history")
+def compact_history(
+    keep: int, tag: str | None = None, repository_url: str | None = None
+) -> HistoryCompaction:
+    """Squash the history of the repository branch behind a checkpoint.
+
+    The tree of the commit preceding the last ``keep`` ones becomes a new root commit, and the
+    last ``keep`` commits are replayed on top of it, so the content of the branch is unchanged
+    but its history stops growing with every record change. The previous tip is tagged before
+    the branch is force-pushed, so that the old history stays available. The push is refused
+    if the branch moved since it was read, e.g. because a record changed meanwhile.
+
+    Only a shallow, blobless clone of the last commits is needed, so the cost of a compaction
+    does not grow with the length of the history it squashes.
+
+    Args:
+        keep: the number of recent commits to keep on top of the checkpoint.
+        tag: the name of the tag holding the previous history, defaults to one derived from
+            the branch name and the current time.
+        repository_url: the connection string of the repository, e.g. of a shard, defaults to
+            the default repository.
+
+    Returns:
+        the outcome of the compaction.
+
+    Raises:
+        DnsSourceUpdateError: if no git repository is configured or the push failed.
+    """
+    repository_url = repository_url or GIT_REPO_URL
+    if DNS_BACKEND == BACKEND_LOCAL or not repository_url:
+        raise DnsSourceUpdateError("No git repository is configured.")
+    user, base_url, branch = parse_repository_url(repository_url)
+    span = trace.get_current_span()
+    path = Path(mkdtemp(prefix="dns-compaction-", dir=GIT_MIRROR_DIR or None))
+    try:
+        repo = _clone(user, base_url, branch, path, keep)
+        branch = branch or repo.active_branch.name
+        commits = repo.git.rev_list("--first-parent", "HEAD").splitlines()
+        span.set_attribute("git.compaction.commits", len(commits))
+        if len(commits) <= keep + 1:
+            return HistoryCompaction(None, len(commits))
+        previous_tip, checkpoint = commits[0], commits[keep]
+        tag = tag or ARCHIVE_TAG_TEMPLATE.format(
+            branch=branch, timestamp=time.strftime("%Y%m%d%H%M%S", time.gmtime())
+        )
+        with tracer.start_as_current_span("git.commit"):
+            message = (
+                f"Compact the history up to {checkpoint}\n\n"
+                f"The previous history is kept in the {tag} tag."
+            )
+            tip = binascii.hexlify(
+                store_object(
+                    repo,
+                    Commit.type,
+                    serialize_commit(repo, repo.commit(checkpoint).tree.binsha, None, message),
+                )
+            ).decode("ascii")
+            for commit in reversed(commits[:keep]):
+                tip = _replay_commit(repo, repo.odb.stream(bytes.fromhex(commit)).read(), tip)
+        _tag_and_push(repo, branch, previous_tip, tip, tag)
+        logger.info("Compacted the history of %s up to %s into %s", branch, checkpoint, tip)
+        return HistoryCompaction(checkpoint, keep, tip, tag)
+    finally:
+        shutil.rmtree(path, ignore_errors=True)
@@ -0,0 +1,201 @@
+# Copyright 2025 Canonical Ltd.
+# See LICENSE file for licensing details.
+"""Replay of the outcomes of the DNS record requests retried by the clients.
+
+lego retries a request which timed out, e.g. at a proxy, even if the provider went on to apply
+it. The outcome of every successful present and cleanup request is kept in the Django cache for
+a while, shared across the workers and units when the charm is related to Redis, so that the
+retries are answered from it instead of cloning, committing and pushing again.
+"""
+
+import hashlib
+from typing import Any, Dict, List
+
+from django.core.cache import caches
+from opentelemetry import metrics, trace
+
+from .models import RecordAction
+from .settings import DNS_IDEMPOTENCY_TTL
+
+IDEMPOTENCY_KEY_HEADER = "Idempotency-Key"
+CACHE_ALIAS = "default"
+
+tracer = trace.get_tracer(__name__)
+meter = metrics.get_meter(__name__)
+
+lookups = meter.create_counter(
+    "dns.idempotency.lookups",
+    unit="{request}",
+    description="Lookups of the stored outcome of a DNS record request, by whether it was "
+    "replayed.",
+)
+
+
+class IdempotencyKeyError(Exception):
+    """Exception raised when an idempotency key is reused for another DNS record."""
+
+
+def _digest(*parts: str) -> str:
+    """Hash strings together.
+
+    Args:
+        parts: the strings to hash.
+
+    Returns:
+        the hexadecimal SHA-256 digest of the strings.
+    """
+    return hashlib.sha256("\0".join(parts).encode("utf-8")).hexdigest()
+
+
+class IdempotentRequest:  # pylint: disable=too-few-public-methods
+    """Identity of a present or cleanup request, to recognize its retries.
+
+    Attributes:
+        fingerprint: the hash of the FQDN and value of the record.
+        key: the cache key of the outcome of the request, derived from the user, the action and
+            either the idempotency key sent by the client or the fingerprint.
+        record_key: the cache key of the outcome of the action on the record, derived from the
+            user, the action and the fingerprint. An outcome stored under an idempotency key is
+            only replayed while this one is kept too.
+        opposite_key: the cache key of the outcome of the opposite action on the same record,
+            which is no longer a valid answer once this request has been applied.
+    """
+
+    def __init__(
+        self, user_id: int, fqdn: str, value: str, action: str, idempotency_key: str | None
+    ):
+        """Initialize the request identity.
+
+        Args:
+            user_id: the identifier of the user sending the request.
+            fqdn: the FQDN of the record.
+            value: the ACME challenge of the record.
+            action: whether the record is added or removed.
+            idempotency_key: the idempotency key sent by the client, if any.
+        """
+        opposite = RecordAction.CLEANUP if action == RecordAction.PRESENT else RecordAction.PRESENT
+        self.fingerprint = _digest(fqdn, value)
+        self.record_key = f"api:idempotency:{_digest(str(user_id), action, self.fingerprint)}"
+        if idempotency_key:
+            self.key = f"api:idempotency:{_digest(str(user_id), action, 'key', idempotency_key)}"
+        else:
+            self.key = self.record_key
+        self.opposite_key = f"api:idempotency:{_digest(str(user_id), opposite, self.fingerprint)}"
+
+
+def _keys(request: IdempotentRequest) -> List[str]:
+    """Get the cache keys of the outcomes to look up for a request.
+
+    Args:
+        request: the request.
+
+    Returns:
+        the cache keys, without duplicates.
+    """
+    return list(dict.fromkeys((request.key, request.record_key)))
+
+
+def _check_outcome(
+    request: IdempotentRequest, outcomes: Dict[str, Dict[str, Any]]
+) -> Dict[str, Any] | None:
+    """Record a lookup and check that the stored outcome answers the request.
+
+    Args:
+        request: the request.
+        outcomes: the stored outcomes, by cache key.
+
+    Returns:
+        the outcome to replay, if any.
+
+    Raises:
+        IdempotencyKeyError: if the idempotency key was used for another record.
+    """
+    outcome = outcomes.get(request.key)
+    if outcome is not None and outcome["fingerprint"] != request.fingerprint:
+        raise IdempotencyKeyError("The idempotency key was already used for another record.")
+    if request.record_key not in outcomes:
+        # The opposite action was applied to the record since.
+        outcome = None
+    replayed = outcome is not None
+    lookups.add(1, {"dns.idempotency.replayed": replayed})
+    trace.get_current_span().set_attribute("dns.idempotency.replayed", replayed)
+    return outcome
+
+
+@tracer.start_as_current_span("lookup_outcome")
+def lookup_outcome(request: IdempotentRequest) -> Dict[str, Any] | None:
+    """Get the stored outcome of an earlier attempt of a request.
+
+    An IdempotencyKeyError is raised if the idempotency key was used for another record.
+
+    Args:
+        request: the request.
+
+    Returns:
+        the outcome, holding the identifier of its operation in asynchronous mode, or None if
+        there is none or the replay is disabled.
+    """
+    if DNS_IDEMPOTENCY_TTL <= 0:
+        return None
+    return _check_outcome(request, caches[CACHE_ALIAS].get_many(_keys(request)))
+
+
+async def alookup_outcome(request: IdempotentRequest) -> Dict[str, Any] | None:
+    """Get the stored outcome of an earlier attempt of a request, without blocking.
+
+    An IdempotencyKeyError is raised if the idempotency key was used for another record.
+
+    Args:
+        request: the request.
+
+    Returns:
+        the outcome, holding the identifier of its operation in asynchronous mode, or None if
+        there is none or the replay is disabled.
+    """
+    if DNS_IDEMPOTENCY_TTL <= 0:
+        return None
+    with tracer.start_as_current_span("alookup_outcome"):
+        return _check_outcome(request, await caches[CACHE_ALIAS].aget_many(_keys(request)))
+
+
+def _outcome(request: IdempotentRequest, operation_id: int | None) -> Dict[str, Any]:
+    """Build the outcome of a request to store.
+
+    Args:
+        request: the request.
+        operation_id: the identifier of the operation enqueued in asynchronous mode, if any.
+
+    Returns:
+        the outcome.
+    """
+    return {"fingerprint": request.fingerprint, "operation": operation_id}
+
+
+def store_outcome(request: IdempotentRequest, operation_id: int | None = None) -> None:
+    """Store the outcome of a request applied or accepted, for its retries to replay.
+
+    Args:
+        request: the request.
+        operation_id: the identifier of the operation enqueued in asynchronous mode, if any.
+    """
+    if DNS_IDEMPOTENCY_TTL <= 0:
+        return
+    cache = caches[CACHE_ALIAS]
+    cache.delete(request.opposite_key)
+    outcome = _outcome(request, operation_id)
+    cache.set_many(dict.fromkeys(_keys(request), outcome), timeout=DNS_IDEMPOTENCY_TTL)
+
+
+async def astore_outcome(request: IdempotentRequest, operation_id: int | None = None) -> None:
+    """Store the outcome of a request applied or accepted, without blocking.
+
+    Args:
+        request: the request.
+        operation_id: the identifier of the operation enqueued in asynchronous mode, if any.
+    """
+    if DNS_IDEMPOTENCY_TTL <= 0:
+        return
+    cache = caches[CACHE_ALIAS]
+    await cache.adelete(request.opposite_key)
+    outcome = _outcome(request, operation_id)
+    await cache.aset_many(dict.fromkeys(_keys(request), outcome), timeout=DNS_IDEMPOTENCY_TTL)
@@ -0,0 +1,88 @@
+# Copyright 2025 Canonical Ltd.
+# See LICENSE file for licensing details.
+"""Locks serializing zone file writes across workers and units."""
+
+import hashlib
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, Iterable, Iterator, List
+
+from django.db import connection
+from opentelemetry import trace
+
+tracer = trace.get_tracer(__name__)
+
+_local_locks: Dict[int, threading.Lock] = {}
+_local_locks_lock = threading.Lock()
+
+
+def lock_key(scope: str, filename: str) -> int:
+    """Get the advisory lock key for a zone file.
+
+    Args:
+        scope: the repository the zone file belongs to.
+        filename: the zone file name.
+
+    Returns:
+        a signed 64-bit key, as expected by the PostgreSQL advisory lock functions.
+    """
+    digest = hashlib.blake2b(f"{scope}:{filename}".encode("utf-8"), digest_size=8).digest()
+    return int.from_bytes(digest, "big", signed=True)
+
+
+def _acquire(key: int) -> None:
+    """Acquire the lock for a key, waiting until it is available.
+
+    Args:
+        key: the lock key.
+    """
+    if connection.vendor == "postgresql":
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT pg_advisory_lock(%s)", [key])
+        return
+    with _local_locks_lock:
+        lock = _local_locks.setdefault(key, threading.Lock())
+    lock.acquire()  # pylint: disable=consider-using-with
+
+
+def _release(key: int) -> None:
+    """Release the lock for a key.
+
+    Args:
+        key: the lock key.
+    """
+    if connection.vendor == "postgresql":
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT pg_advisory_unlock(%s)", [key])
+        return
+    _local_locks[key].release()
+
+
+@contextmanager
+def zone_file_locks(scope: str, filenames: Iterable[str]) -> Iterator[None]:
+    """Hold exclusive locks on zone files for the duration of the context.
+
+    On PostgreSQL, session-level advisory locks are used so that writers in every worker and
+    unit sharing the database queue up per zone file, while writes to different zone files
+    proceed in parallel. Other databases, as used in development, fall back to process-local
+    locks. Locks are always acquired in the same order to rule out deadlocks.
+
+    Args:
+        scope: the repository the zone files belong to.
+        filenames: the zone files to lock.
+    """
+    keys = sorted({lock_key(scope, filename) for filename in filenames})
+    acquired: List[int] = []
+    try:
+        with tracer.start_as_current_span("zone_file_locks.acquire") as span:
+            span.set_attribute("lock.count", len(keys))
+            start = time.monotonic()
+            for key in keys:
+                _acquire(key)
+                acquired.append(key)
+            span.set_attribute("lock.wait_seconds", time.monotonic() - start)
+        yield
+    finally:
+        for key in reversed(acquired):
+            _release(key)
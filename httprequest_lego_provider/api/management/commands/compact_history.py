@@ -0,0 +1,57 @@
+# Copyright 2025 Canonical Ltd.
+# See LICENSE file for licensing details.
+"""Compact history module."""
+
+from api.dns import DnsSourceUpdateError
+from api.history import compact_history
+from django.core.management.base import BaseCommand, CommandError
+
+
+class Command(BaseCommand):
+    """Command to squash the history of the DNS records repository behind a checkpoint.
+
+    Attrs:
+        help: help message to display.
+    """
+
+    help = "Squash the history of the DNS records repository, keeping the last commits."
+
+    def add_arguments(self, parser):
+        """Argument parser.
+
+        Args:
+            parser: the cmd line parser.
+        """
+        parser.add_argument("--keep", type=int, default=100)
+        parser.add_argument("--tag", type=str, default=None)
+        parser.add_argument("--repository", type=str, default=None)
+
+    def handle(self, *args, **options):
+        """Command handler.
+
+        Args:
+            args: args.
+            options: options.
+
+        Raises:
+            CommandError: if the command fails.
+        """
+        if options["keep"] < 0:
+            raise CommandError("--keep must not be negative")
+        try:
+            compaction = compact_history(options["keep"], options["tag"], options["repository"])
+        except DnsSourceUpdateError as exc:
+            raise CommandError(str(exc)) from exc
+        if compaction.tip is None:
+            self.stdout.write(
+                self.style.SUCCESS(
+                    f"Nothing to compact, the history has {compaction.kept} commits."
+                )
+            )
+            return
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Compacted the history up to {compaction.checkpoint}, kept {compaction.kept} "
+                f"commits. The previous history is kept in the {compaction.tag} tag."
+            )
+        )
@@ -0,0 +1,28 @@
+# Copyright 2025 Canonical Ltd.
+# See LICENSE file for licensing details.
+"""Drain outbox module."""
+
+from api.outbox import drain_outbox
+from django.core.management.base import BaseCommand
+
+
+class Command(BaseCommand):
+    """Command to apply the pending DNS record operations.
+
+    Attrs:
+        help: help message to display.
+    """
+
+    help = "Apply the DNS record operations pending in the outbox."
+
+    def handle(self, *args, **options):
+        """Command handler.
+
+        Args:
+            args: args.
+            options: options.
+        """
+        total = 0
+        while processed := drain_outbox():
+            total += processed
+        self.stdout.write(self.style.SUCCESS(f"Processed {total} DNS record operations."))
@@ -0,0 +1,38 @@
+# Generated by Django 6.0.7 on 2026-10-16 21:40
+
+from django.db import migrations, models
+
+BACKFILL_BATCH_SIZE = 1000
+
+
+def backfill_reversed_fqdn(apps, schema_editor):
+    Domain = apps.get_model("api", "Domain")
+    last_pk = 0
+    while True:
+        batch = list(Domain.objects.filter(pk__gt=last_pk).order_by("pk")[:BACKFILL_BATCH_SIZE])
+        if not batch:
+            return
+        for domain in batch:
+            domain.reversed_fqdn = ".".join(reversed(domain.fqdn.split(".")))
+        Domain.objects.bulk_update(batch, ["reversed_fqdn"])
+        last_pk = batch[-1].pk
+
+
+class Migration(migrations.Migration):
+    # Commit every batch of the backfill on its own, so that large tables are not locked for
+    # the whole migration.
+    atomic = False
+
+    dependencies = [
+        ("api", "0004_recordoperation"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="domain",
+            name="reversed_fqdn",
+            field=models.CharField(db_index=True, default="", editable=False, max_length=255),
+            preserve_default=False,
+        ),
+        migrations.RunPython(backfill_reversed_fqdn, migrations.RunPython.noop),
+    ]
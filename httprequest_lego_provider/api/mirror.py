@@ -0,0 +1,520 @@
+# Copyright 2025 Canonical Ltd.
+# See LICENSE file for licensing details.
+"""Long-lived local mirror of the DNS records repository."""
+
+import atexit
+import logging
+import shlex
+import shutil
+import subprocess  # nosec B404
+import threading
+import time
+from pathlib import Path
+from tempfile import mkdtemp
+from typing import Dict, Iterable, List, Set, Tuple
+from urllib.parse import urlsplit
+
+from git import GitCommandError, InvalidGitRepositoryError, NoSuchPathError, Repo
+from opentelemetry import metrics, trace
+
+from .settings import GIT_MIRROR_DIR, GIT_MIRROR_MAINTENANCE_INTERVAL, GIT_SSH_CONTROL_PERSIST
+
+logger = logging.getLogger(__name__)
+tracer = trace.get_tracer(__name__)
+meter = metrics.get_meter(__name__)
+
+refresh_duration = meter.create_histogram(
+    "dns.mirror.refresh.duration",
+    unit="s",
+    description="Duration of the clones and fetches bringing a repository mirror up to date.",
+)
+maintenance_duration = meter.create_histogram(
+    "dns.mirror.maintenance.duration",
+    unit="s",
+    description="Duration of the repacks and commit-graph writes on a repository mirror.",
+)
+ssh_connections = meter.create_counter(
+    "dns.mirror.ssh.connections",
+    description="SSH master connections established to the remote repositories.",
+)
+
+# Resolve ssh's absolute path once so subprocess calls don't rely on a partial path.
+SSH = shutil.which("ssh") or "ssh"
+SSH_SCHEMES = ("ssh", "git+ssh", "ssh+git")
+SSH_CONTROL_TIMEOUT = 30
+# Incremental tasks, whose cost does not grow with the age of the mirror.
+MAINTENANCE_TASKS = ("loose-objects", "incremental-repack", "commit-graph", "pack-refs")
+
+
+class SshMaster:
+    """Persistent SSH connection shared by the git operations on a remote repository.
+
+    git is given an ssh command multiplexing its sessions over a master connection through a
+    control socket, so clones, fetches and pushes reuse one authenticated channel instead of
+    each paying for a TCP and SSH handshake. The master is checked before every use and
+    established again if it has gone away, e.g. after a network failure or a restart of the
+    remote. Keepalives make an unresponsive master exit rather than stall the git operations.
+
+    Attributes:
+        destination: the user and host to connect to.
+        control_path: the path of the control socket, as a pattern expanded by ssh.
+        ssh_command: the ssh command for git to use.
+    """
+
+    def __init__(self, url: str, persist: int, options: Iterable[str] = ()):
+        """Initialize the master connection, without connecting yet.
+
+        Args:
+            url: the SSH URL of the remote repository.
+            persist: seconds the master connection is kept open once idle.
+            options: additional ssh options, e.g. an identity file.
+        """
+        parts = urlsplit(url)
+        self.destination = (
+            f"{parts.username}@{parts.hostname}" if parts.username else str(parts.hostname)
+        )
+        self._port_options = ["-p", str(parts.port)] if parts.port else []
+        # Outside of the mirror directory, as control socket paths are limited to ~100 bytes.
+        self._directory = Path(mkdtemp(prefix="dns-ssh-"))
+        self.control_path = str(self._directory / "%C")
+        self._options = [
+            "-o",
+            "ControlMaster=auto",
+            "-o",
+            f"ControlPath={self.control_path}",
+            "-o",
+            f"ControlPersist={persist}",
+            "-o",
+            "BatchMode=yes",
+            "-o",
+            "ServerAliveInterval=15",
+            "-o",
+            "ServerAliveCountMax=3",
+            *options,
+        ]
+        self.ssh_command = shlex.join([SSH, *self._options])
+        atexit.register(self.close)
+
+    def _run(self, *args: str) -> bool:
+        """Run ssh against the remote with the multiplexing options.
+
+        Args:
+            args: the ssh arguments preceding the destination.
+
+        Returns:
+            whether ssh succeeded.
+        """
+        try:
+            # No pipes, which a master going to the background would hold open.
+            process = subprocess.run(  # nosec B603
+                [SSH, *self._options, *self._port_options, *args, self.destination],
+                stdin=subprocess.DEVNULL,
+                stdout=subprocess.DEVNULL,
+                stderr=subprocess.DEVNULL,
+                timeout=SSH_CONTROL_TIMEOUT,
+                check=False,
+            )
+        except (OSError, subprocess.TimeoutExpired) as exc:
+            logger.warning("Failed to run ssh against %s: %s", self.destination, exc)
+            return False
+        return process.returncode == 0
+
+    @tracer.start_as_current_span("SshMaster.ensure")
+    def ensure(self) -> bool:
+        """Check the master connection, establishing it again if it is not running.
+
+        A master that cannot be established is not an error: git then connects on its own and
+        its first connection becomes the master.
+
+        Returns:
+            whether the master connection was already running.
+        """
+        span = trace.get_current_span()
+        alive = self._run("-O", "check")
+        span.set_attribute("git.ssh.master_reused", alive)
+        if not alive:
+            # Clean a stale control socket left behind by a master that died.
+            self._run("-O", "exit")
+            if self._run("-f", "-N"):
+                ssh_connections.add(1, {"git.ssh.destination": self.destination})
+            else:
+                logger.warning("Failed to establish an SSH master to %s", self.destination)
+        return alive
+
+    def close(self) -> None:
+        """Close the master connection and remove its control socket."""
+        self._run("-O", "exit")
+        shutil.rmtree(self._directory, ignore_errors=True)
+
+
+def _create_ssh_master(url: str) -> SshMaster | None:
+    """Create the master connection for a remote repository, if reached through SSH.
+
+    Args:
+        url: the URL of the remote repository.
+
+    Returns:
+        the master connection, or None if the remote is not reached through SSH or the
+        connection multiplexing is disabled.
+    """
+    if GIT_SSH_CONTROL_PERSIST <= 0 or urlsplit(url).scheme not in SSH_SCHEMES:
+        return None
+    return SshMaster(url, GIT_SSH_CONTROL_PERSIST)
+
+
+class RepositoryMirror:  # pylint: disable=too-few-public-methods,too-many-instance-attributes
+    """Process-wide working copy of a remote repository branch.
+
+    The working copy is cloned once and then brought up to date with an incremental shallow
+    fetch and a hard reset before every use, so local leftovers from failed writes never leak
+    into later ones. A working copy that can no longer be refreshed is discarded and cloned
+    again.
+
+    The clone is blobless and sparse: only the tree is fetched up front, and a zone file is
+    only downloaded and written to the working tree once it is edited, so the cost of a write
+    scales with the size of the zone files it touches rather than with the whole repository.
+
+    A background warmer can clone the repository as soon as the process starts and keep it up
+    to date, so that requests only pay for the commits pushed since its last refresh.
+
+    Remotes reached through SSH share a persistent master connection, checked before every
+    refresh, so that fetches and pushes skip the connection handshake.
+
+    Every fetch and write leaves objects behind. A background maintenance periodically packs
+    them and updates the commit-graph, so that git operations stay as fast as on a fresh
+    clone, instead of git collecting garbage in the middle of a write.
+
+    Attributes:
+        user: the user name used for the commits.
+        base_url: the URL of the remote repository.
+        branch: the branch to track, or None for the remote's default branch.
+        path: the directory holding the working copy.
+        lock: lock serializing the users of the working copy.
+        tracking_branch: the name of the remote branch, known once the repository is cloned.
+        metric_attributes: the attributes identifying the mirror in the metrics.
+        staleness: seconds since the last refresh, or None if never refreshed.
+        last_refresh_duration: seconds the last refresh took, or None if never refreshed.
+        object_counts: the numbers of objects and packs after the last maintenance, by kind.
+    """
+
+    def __init__(self, user: str, base_url: str, branch: str | None):
+        """Initialize the mirror.
+
+        Args:
+            user: the user name used for the commits.
+            base_url: the URL of the remote repository.
+            branch: the branch to track, or None for the remote's default branch.
+        """
+        self.user = user
+        self.base_url = base_url
+        self.branch = branch
+        self.path = Path(mkdtemp(prefix="dns-records-", dir=GIT_MIRROR_DIR or None))
+        self.lock = threading.RLock()
+        self._repo: Repo | None = None
+        self._tracking_branch: str | None = branch
+        self._checked_out: Set[str] = set()
+        self._refreshed_at: float | None = None
+        self.last_refresh_duration: float | None = None
+        self._warmer: threading.Thread | None = None
+        self._maintainer: threading.Thread | None = None
+        self.object_counts: Dict[str, int] = {}
+        self._ssh_master = _create_ssh_master(base_url)
+        atexit.register(shutil.rmtree, self.path, True)
+
+    @property
+    def _git_environment(self) -> Dict[str, str]:
+        """Get the environment of the git commands run on the repository.
+
+        Returns:
+            the environment variables to set.
+        """
+        if self._ssh_master is None:
+            return {}
+        return {"GIT_SSH_COMMAND": self._ssh_master.ssh_command}
+
+    @tracer.start_as_current_span("RepositoryMirror._clone")
+    def _clone(self) -> Repo:
+        """Clone the remote repository from scratch.
+
+        Returns:
+            the freshly cloned repository.
+        """
+        shutil.rmtree(self.path, ignore_errors=True)
+        with tracer.start_as_current_span("git.clone"):
+            repo = Repo.clone_from(
+                self.base_url,
+                self.path,
+                env=self._git_environment or None,
+                branch=self.branch,
+                depth=1,
+                filter="blob:none",
+                no_checkout=True,
+            )
+            repo.git.update_environment(**self._git_environment)
+            # Non-cone patterns, as cone mode always includes the files at the root of the tree.
+            repo.git.sparse_checkout("set", "--no-cone", "--stdin")
+            repo.git.reset("--hard")
+        config_writer = repo.config_writer()
+        config_writer.set_value("user", "name", self.user)
+        # Zone files only ever appear in the working tree through the sparse patterns, so git
+        # can skip scanning for them on every update.
+        config_writer.set_value("sparse", "expectFilesOutsideOfPatterns", "true")
+        if GIT_MIRROR_MAINTENANCE_INTERVAL > 0:
+            # Left to the background maintenance, rather than run by the writes themselves.
+            config_writer.set_value("gc", "auto", "0")
+            config_writer.set_value("maintenance", "auto", "false")
+        config_writer.release()
+        self._tracking_branch = self.branch or repo.active_branch.name
+        self._checked_out = set()
+        return repo
+
+    @property
+    def tracking_branch(self) -> str | None:
+        """Get the name of the remote branch, known once the repository has been cloned.
+
+        Returns:
+            the name of the remote branch.
+        """
+        return self._tracking_branch
+
+    @property
+    def staleness(self) -> float | None:
+        """Get the number of seconds since the working copy was last refreshed.
+
+        Returns:
+            the staleness of the working copy, or None if it has never been refreshed.
+        """
+        if self._refreshed_at is None:
+            return None
+        return time.monotonic() - self._refreshed_at
+
+    @tracer.start_as_current_span("RepositoryMirror._refresh")
+    def _refresh(self, repo: Repo, checkout: bool) -> None:
+        """Bring an existing working copy up to date with the remote branch.
+
+        Args:
+            repo: the repository to refresh.
+            checkout: whether to update the working tree too.
+        """
+        with tracer.start_as_current_span("git.fetch"):
+            repo.git.fetch("--depth=1", "origin", self._tracking_branch)
+        if checkout:
+            with tracer.start_as_current_span("git.reset"):
+                repo.git.reset("--hard", "FETCH_HEAD")
+                repo.git.clean("-fdx")
+
+    def _check_out(self, repo: Repo, filenames: Iterable[str]) -> None:
+        """Add files to the sparse working tree, downloading their content.
+
+        Args:
+            repo: the repository to update.
+            filenames: the files, relative to the root of the repository.
+        """
+        missing = sorted(set(filenames) - self._checked_out)
+        if missing:
+            with tracer.start_as_current_span("git.sparse_checkout"):
+                repo.git.sparse_checkout("add", *(f"/{filename}" for filename in missing))
+            self._checked_out.update(missing)
+
+    def sync(self, checkout: bool = True, filenames: Iterable[str] = ()) -> Repo:
+        """Get the working copy, matching the tip of the remote branch.
+
+        Callers are expected to hold the mirror lock for as long as they use the returned
+        repository.
+
+        Args:
+            checkout: whether to update the working tree too, or only the remote-tracking
+                branch for callers working directly on the object database.
+            filenames: the files to make available in the working tree, on top of the ones
+                already checked out.
+
+        Returns:
+            the up-to-date repository.
+        """
+        span = trace.get_current_span()
+        if self.staleness is not None:
+            span.set_attribute("git.mirror.staleness", self.staleness)
+        start = time.monotonic()
+        if self._ssh_master is not None:
+            self._ssh_master.ensure()
+        if self._repo is not None:
+            try:
+                self._refresh(self._repo, checkout)
+            except (GitCommandError, InvalidGitRepositoryError, NoSuchPathError, OSError) as exc:
+                logger.warning("Discarding unusable mirror at %s: %s", self.path, exc)
+                self._repo = None
+        if self._repo is None:
+            self._repo = self._clone()
+        if checkout:
+            self._check_out(self._repo, filenames)
+        self._refreshed_at = time.monotonic()
+        self.last_refresh_duration = self._refreshed_at - start
+        span.set_attribute("git.mirror.refresh_duration", self.last_refresh_duration)
+        refresh_duration.record(self.last_refresh_duration, self.metric_attributes)
+        return self._repo
+
+    @property
+    def metric_attributes(self) -> Dict[str, str]:
+        """Get the attributes identifying the mirror in the metrics.
+
+        Returns:
+            the metric attributes.
+        """
+        return {"git.mirror.url": self.base_url, "git.mirror.branch": self.branch or ""}
+
+    def _warm(self, interval: float, checkout: bool) -> None:
+        """Refresh the working copy forever.
+
+        Args:
+            interval: seconds between two refreshes.
+            checkout: whether to update the working tree too.
+        """
+        while True:
+            with tracer.start_as_current_span("RepositoryMirror.warm"), self.lock:
+                try:
+                    self.sync(checkout=checkout)
+                except (GitCommandError, OSError) as exc:
+                    logger.warning("Failed to refresh the mirror at %s: %s", self.path, exc)
+            time.sleep(interval)
+
+    def start_warmer(self, interval: float, checkout: bool = True) -> None:
+        """Clone the repository in the background, then refresh it periodically.
+
+        Args:
+            interval: seconds between two refreshes.
+            checkout: whether to update the working tree too, or only the remote-tracking
+                branch for writers working directly on the object database.
+        """
+        with _mirrors_lock:
+            if self._warmer is None or not self._warmer.is_alive():
+                self._warmer = threading.Thread(
+                    target=self._warm, args=(interval, checkout), name="dns-mirror", daemon=True
+                )
+                self._warmer.start()
+
+    @tracer.start_as_current_span("RepositoryMirror.maintain")
+    def maintain(self) -> None:
+        """Prune the stale refs and objects, repack and update the commit-graph.
+
+        Callers are expected to hold the mirror lock, so that no write runs at the same time.
+        Nothing is done until the repository has been cloned.
+        """
+        repo = self._repo
+        if repo is None:
+            return
+        span = trace.get_current_span()
+        start = time.monotonic()
+        with tracer.start_as_current_span("git.prune"):
+            repo.git.remote("prune", "origin")
+            # The reflog keeps the commits left behind by the hard resets reachable.
+            repo.git.reflog("expire", "--expire=now", "--all")
+            repo.git.prune("--expire=now")
+        with tracer.start_as_current_span("git.maintenance"):
+            repo.git.maintenance("run", *(f"--task={task}" for task in MAINTENANCE_TASKS))
+        counts = dict(line.split(": ", 1) for line in repo.git.count_objects("-v").splitlines())
+        self.object_counts = {
+            "loose": int(counts["count"]),
+            "packed": int(counts["in-pack"]),
+            "packs": int(counts["packs"]),
+        }
+        duration = time.monotonic() - start
+        for kind, count in self.object_counts.items():
+            span.set_attribute(f"git.objects.{kind}", count)
+        span.set_attribute("git.maintenance.duration", duration)
+        maintenance_duration.record(duration, self.metric_attributes)
+
+    def _maintain_periodically(self, interval: float) -> None:
+        """Maintain the working copy forever.
+
+        Args:
+            interval: seconds between two maintenances.
+        """
+        while True:
+            time.sleep(interval)
+            with tracer.start_as_current_span("RepositoryMirror.maintenance"), self.lock:
+                try:
+                    self.maintain()
+                except (GitCommandError, OSError) as exc:
+                    logger.warning("Failed to maintain the mirror at %s: %s", self.path, exc)
+
+    def start_maintenance(self, interval: float) -> None:
+        """Maintain the working copy in the background, periodically.
+
+        Args:
+            interval: seconds between two maintenances.
+        """
+        with _mirrors_lock:
+            if self._maintainer is None or not self._maintainer.is_alive():
+                self._maintainer = threading.Thread(
+                    target=self._maintain_periodically,
+                    args=(interval,),
+                    name="dns-mirror-maintenance",
+                    daemon=True,
+                )
+                self._maintainer.start()
+
+
+_mirrors: Dict[Tuple[str, str | None], RepositoryMirror] = {}
+_mirrors_lock = threading.Lock()
+
+
+def get_mirror(user: str, base_url: str, branch: str | None) -> RepositoryMirror:
+    """Get the process-wide mirror for a repository branch, creating it if needed.
+
+    Args:
+        user: the user name used for the commits.
+        base_url: the URL of the remote repository.
+        branch: the branch to track, or None for the remote's default branch.
+
+    Returns:
+        the mirror for the repository branch.
+    """
+    with _mirrors_lock:
+        mirror = _mirrors.get((base_url, branch))
+        if mirror is None:
+            mirror = RepositoryMirror(user, base_url, branch)
+            _mirrors[(base_url, branch)] = mirror
+        return mirror
+
+
+def _observe_staleness(_: metrics.CallbackOptions) -> List[metrics.Observation]:
+    """Report the staleness of every mirror.
+
+    Returns:
+        the staleness of the mirrors refreshed at least once.
+    """
+    with _mirrors_lock:
+        mirrors = list(_mirrors.values())
+    return [
+        metrics.Observation(staleness, mirror.metric_attributes)
+        for mirror in mirrors
+        if (staleness := mirror.staleness) is not None
+    ]
+
+
+def _observe_objects(_: metrics.CallbackOptions) -> List[metrics.Observation]:
+    """Report the numbers of objects and packs of every mirror.
+
+    Returns:
+        the numbers of objects and packs of the mirrors maintained at least once, by kind.
+    """
+    with _mirrors_lock:
+        mirrors = list(_mirrors.values())
+    return [
+        metrics.Observation(count, {**mirror.metric_attributes, "git.objects.kind": kind})
+        for mirror in mirrors
+        for kind, count in mirror.object_counts.items()
+    ]
+
+
+meter.create_observable_gauge(
+    "dns.mirror.objects",
+    callbacks=[_observe_objects],
+    description="Objects and packs of a repository mirror after its last maintenance.",
+)
+meter.create_observable_gauge(
+    "dns.mirror.staleness",
+    callbacks=[_observe_staleness],
+    unit="s",
+    description="Seconds since a repository mirror was last brought up to date.",
+)
@@ -7,11 +7,87 @@ from django.core.validators import RegexValidator
 from django.db import models
 
 
+def reverse_fqdn(fqdn: str) -> str:
+    """Get a FQDN with its labels in reverse order, e.g. com.example.site for site.example.com.
+
+    Args:
+        fqdn: the FQDN.
+
+    Returns:
+        the reversed FQDN.
+    """
+    return ".".join(reversed(fqdn.split(".")))
+
+
+class DomainQuerySet(models.QuerySet):
+    """QuerySet of the Domain objects, keeping their reversed FQDN in sync.
+
+    The reversed FQDN can't be a generated column, as databases have no function reversing the
+    labels of a name, so every bulk write of the FQDN goes through here instead.
+    """
+
+    def bulk_create(self, objs, *args, **kwargs):
+        """Create several domains at once.
+
+        Args:
+            objs: the domains to create.
+            args: passthrough to the default implementation.
+            kwargs: passthrough to the default implementation.
+
+        Returns:
+            the created domains.
+        """
+        objs = list(objs)
+        for domain in objs:
+            domain.reversed_fqdn = reverse_fqdn(domain.fqdn)
+        return super().bulk_create(objs, *args, **kwargs)
+
+    def bulk_update(self, objs, fields, *args, **kwargs):
+        """Update fields of several domains at once.
+
+        Args:
+            objs: the domains to update.
+            fields: the fields to update.
+            args: passthrough to the default implementation.
+            kwargs: passthrough to the default implementation.
+
+        Returns:
+            the number of updated rows.
+        """
+        if "fqdn" in fields:
+            objs = list(objs)
+            for domain in objs:
+                domain.reversed_fqdn = reverse_fqdn(domain.fqdn)
+            fields = {*fields, "reversed_fqdn"}
+        return super().bulk_update(objs, fields, *args, **kwargs)
+
+    def update(self, **kwargs):
+        """Update fields of the selected domains.
+
+        Args:
+            kwargs: the new values of the fields.
+
+        Returns:
+            the number of updated rows.
+
+        Raises:
+            ValueError: if the FQDN is set to an expression without the matching reversed FQDN.
+        """
+        if "fqdn" in kwargs and "reversed_fqdn" not in kwargs:
+            if not isinstance(kwargs["fqdn"], str):
+                raise ValueError("The FQDN of domains can only be updated to a plain value.")
+            kwargs["reversed_fqdn"] = reverse_fqdn(kwargs["fqdn"])
+        return super().update(**kwargs)
+
+
 class Domain(models.Model):
     """DNS domain.
 
     Attributes:
         fqdn: fully-qualified domain name.
+        reversed_fqdn: the FQDN with its labels in reverse order, so that a domain and the
+            domains below it can be looked up through the index.
+        objects: the default manager.
     """
 
     fqdn = models.CharField(
@@ -25,6 +101,22 @@ class Domain(models.Model):
             ),
         ],
     )
+    reversed_fqdn = models.CharField(max_length=255, db_index=True, editable=False)
+
+    objects = DomainQuerySet.as_manager()
+
+    def save(self, *args, **kwargs):
+        """Save the domain, updating its reversed FQDN.
+
+        Args:
+            args: passthrough to the default implementation.
+            kwargs: passthrough to the default implementation.
+        """
+        self.reversed_fqdn = reverse_fqdn(self.fqdn)
+        update_fields = kwargs.get("update_fields")
+        if update_fields is not None and "fqdn" in update_fields:
+            kwargs["update_fields"] = {*update_fields, "reversed_fqdn"}
+        super().save(*args, **kwargs)
 
 
 class AccessLevel(models.TextChoices):  # pylint:disable=too-many-ancestors
@@ -66,3 +158,57 @@ class DomainUserPermission(models.Model):
                 fields=["user", "domain", "access_level"], name="unique_user_domain_accesslevel"
             )
         ]
+
+
+class RecordAction(models.TextChoices):  # pylint:disable=too-many-ancestors
+    """Actions on a DNS record.
+
+    Attributes:
+        PRESENT: add the record.
+        CLEANUP: remove the record.
+    """
+
+    PRESENT = "present"
+    CLEANUP = "cleanup"
+
+
+class OperationStatus(models.TextChoices):  # pylint:disable=too-many-ancestors
+    """Statuses of a DNS record operation.
+
+    Attributes:
+        PENDING: waiting to be applied.
+        IN_PROGRESS: claimed by a worker applying it.
+        DONE: applied and pushed.
+        FAILED: could not be applied.
+    """
+
+    PENDING = "pending"
+    IN_PROGRESS = "in_progress"
+    DONE = "done"
+    FAILED = "failed"
+
+
+class RecordOperation(models.Model):
+    """DNS record change accepted by the API and waiting in the outbox to be applied.
+
+    Attributes:
+        user: user who requested the change.
+        fqdn: fully-qualified domain name of the record, including the ACME prefix.
+        value: ACME challenge of the record.
+        action: whether to add or remove the record.
+        status: progress of the operation.
+        error: details on why the operation failed.
+        created_at: creation time.
+        updated_at: last update time.
+    """
+
+    user = models.ForeignKey(auth.get_user_model(), on_delete=models.CASCADE)
+    fqdn = models.CharField(max_length=255)
+    value = models.TextField()
+    action = models.CharField(choices=RecordAction.choices)
+    status = models.CharField(
+        choices=OperationStatus.choices, default=OperationStatus.PENDING, db_index=True
+    )
+    error = models.TextField(null=True, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
@@ -0,0 +1,107 @@
+# Copyright 2025 Canonical Ltd.
+# See LICENSE file for licensing details.
+"""In-process reads and writes of the git object database of a repository."""
+
+import binascii
+import io
+import os
+import time
+from typing import Dict, Tuple
+
+from git import Actor, Commit, Repo, Tree
+from git.objects.fun import tree_to_stream
+from gitdb import IStream, LooseObjectDB
+
+TREE_MODE = 0o40000
+
+
+def _tree_entry_sort_key(entry: Tuple[bytes, int, str]) -> bytes:
+    """Get the key sorting tree entries in the order git expects.
+
+    Args:
+        entry: the tree entry, as a (binsha, mode, name) tuple.
+
+    Returns:
+        the sort key, where subtrees sort as if their name ended with a slash.
+    """
+    _, mode, name = entry
+    return name.encode("utf-8") + (b"/" if mode == TREE_MODE else b"")
+
+
+def read_blob(repo: Repo, binsha: bytes) -> str:
+    """Read a text blob from the object database, in process.
+
+    Args:
+        repo: the repository.
+        binsha: the binary SHA of the blob.
+
+    Returns:
+        the content of the blob, decoded.
+    """
+    return repo.odb.stream(binsha).read().decode("utf-8")
+
+
+def store_object(repo: Repo, object_type: str, data: bytes) -> bytes:
+    """Store an object as a loose object, in process.
+
+    Args:
+        repo: the repository.
+        object_type: the git object type.
+        data: the object content.
+
+    Returns:
+        the binary SHA of the stored object.
+    """
+    odb = LooseObjectDB(os.path.join(repo.common_dir, "objects"))
+    return odb.store(IStream(object_type, len(data), io.BytesIO(data))).binsha
+
+
+def serialize_commit(repo: Repo, tree: bytes, parent: str | None, message: str) -> bytes:
+    """Serialize a commit object authored now by the configured identity.
+
+    Args:
+        repo: the repository.
+        tree: the binary SHA of the commit tree.
+        parent: the hexadecimal SHA of the parent commit, or None for a root commit.
+        message: the commit message.
+
+    Returns:
+        the raw commit object.
+    """
+    config_reader = repo.config_reader()
+    timestamp = int(time.time())
+    author = Actor.author(config_reader)
+    committer = Actor.committer(config_reader)
+    return (
+        f"tree {binascii.hexlify(tree).decode('ascii')}\n"
+        + (f"parent {parent}\n" if parent else "")
+        + f"author {author.name} <{author.email}> {timestamp} +0000\n"
+        f"committer {committer.name} <{committer.email}> {timestamp} +0000\n"
+        f"\n{message}\n"
+    ).encode("utf-8")
+
+
+def store_tree_and_commit(
+    repo: Repo, entries: Dict[str, Tuple[bytes, int]], parent: str, message: str
+) -> bytes:
+    """Write the root tree holding some entries and a commit of it to the object database.
+
+    Args:
+        repo: the repository.
+        entries: the binary SHA and mode of each entry of the root tree, by name.
+        parent: the hexadecimal SHA of the parent commit.
+        message: the commit message.
+
+    Returns:
+        the binary SHA of the commit.
+    """
+    tree_data = io.BytesIO()
+    tree_to_stream(
+        sorted(
+            ((binsha, mode, name) for name, (binsha, mode) in entries.items()),
+            key=_tree_entry_sort_key,
+        ),
+        tree_data.write,
+    )
+    tree = store_object(repo, Tree.type, tree_data.getvalue())
+    return store_object(repo, Commit.type, serialize_commit(repo, tree, parent, message))
@@ -0,0 +1,218 @@
+# Copyright 2025 Canonical Ltd.
+# See LICENSE file for licensing details.
+"""Outbox of DNS record operations applied in the background."""
+
+import asyncio
+import datetime
+import logging
+import threading
+import time
+from typing import List
+
+from django.db import DatabaseError, connection, transaction
+from django.db.models import Q
+from django.utils import timezone
+from opentelemetry import trace
+
+from .dns import DnsSourceUpdateError, RecordChange, apply_record_changes
+from .models import OperationStatus, RecordAction, RecordOperation
+from .settings import (
+    DNS_OUTBOX_BATCH_SIZE,
+    DNS_OUTBOX_CLAIM_TIMEOUT,
+    DNS_OUTBOX_POLL_INTERVAL,
+)
+
+logger = logging.getLogger(__name__)
+tracer = trace.get_tracer(__name__)
+
+UNFINISHED_STATUSES = (OperationStatus.PENDING, OperationStatus.IN_PROGRESS)
+
+
+def _to_record_change(operation: RecordOperation) -> RecordChange:
+    """Get the DNS record change requested by an operation.
+
+    Args:
+        operation: the operation.
+
+    Returns:
+        the DNS record change.
+    """
+    if operation.action == RecordAction.PRESENT:
+        return RecordChange(operation.fqdn, operation.value, "Add")
+    return RecordChange(operation.fqdn, operation.value, "Remove")
+
+
+def _claim_operations(limit: int) -> List[RecordOperation]:
+    """Claim pending operations, and the ones whose claim has expired, in a short transaction.
+
+    The operations are locked, skipping the ones being claimed by other workers, only until
+    they are marked as in progress, so every unit can drain the same outbox without holding a
+    transaction open while the changes are pushed.
+
+    Args:
+        limit: maximum number of operations to claim.
+
+    Returns:
+        the claimed operations.
+    """
+    now = timezone.now()
+    expired = now - datetime.timedelta(seconds=DNS_OUTBOX_CLAIM_TIMEOUT)
+    with transaction.atomic():
+        operations = list(
+            RecordOperation.objects.select_for_update(skip_locked=True)
+            .filter(
+                Q(status=OperationStatus.PENDING)
+                | Q(status=OperationStatus.IN_PROGRESS, updated_at__lt=expired)
+            )
+            .order_by("id")[:limit]
+        )
+        for operation in operations:
+            operation.status = OperationStatus.IN_PROGRESS
+            operation.updated_at = now
+        RecordOperation.objects.bulk_update(operations, ["status", "updated_at"])
+    return operations
+
+
+@tracer.start_as_current_span("drain_outbox")
+def drain_outbox(limit: int = DNS_OUTBOX_BATCH_SIZE) -> int:
+    """Apply a group of pending operations in a single commit and record their outcome.
+
+    The operations are claimed first, then applied outside of any transaction, and their
+    outcome is recorded in a transaction of its own once the changes are pushed.
+
+    Args:
+        limit: maximum number of operations to apply.
+
+    Returns:
+        the number of operations processed.
+    """
+    operations = _claim_operations(limit)
+    if not operations:
+        return 0
+    trace.get_current_span().set_attribute("dns.batch_size", len(operations))
+    changes = [_to_record_change(operation) for operation in operations]
+    try:
+        apply_record_changes(changes)
+    except DnsSourceUpdateError:
+        logger.warning("Some DNS record operations failed to apply")
+    now = timezone.now()
+    for operation, change in zip(operations, changes):
+        operation.status = OperationStatus.FAILED if change.error else OperationStatus.DONE
+        operation.error = str(change.error) if change.error else None
+        operation.updated_at = now
+    with transaction.atomic():
+        RecordOperation.objects.bulk_update(operations, ["status", "error", "updated_at"])
+    return len(operations)
+
+
+class OutboxWorker:  # pylint: disable=too-few-public-methods
+    """Background thread draining the outbox.
+
+    The thread is started on demand, drains the outbox whenever it is woken up and polls it
+    periodically to pick up operations left behind by other workers.
+    """
+
+    def __init__(self):
+        """Initialize the worker."""
+        self._wakeup = threading.Event()
+        self._lock = threading.Lock()
+        self._thread: threading.Thread | None = None
+
+    def _run(self) -> None:
+        """Drain the outbox forever."""
+        try:
+            while True:
+                self._wakeup.clear()
+                try:
+                    while drain_outbox():
+                        pass
+                except DatabaseError:
+                    logger.exception("Failed to drain the DNS record operations outbox")
+                self._wakeup.wait(DNS_OUTBOX_POLL_INTERVAL)
+        finally:
+            connection.close()
+
+    def wake(self) -> None:
+        """Make the worker drain the outbox, starting it if needed."""
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name="dns-outbox", daemon=True)
+                self._thread.start()
+        self._wakeup.set()
+
+
+worker = OutboxWorker()
+
+
+def enqueue(user, fqdn: str, value: str, action: str) -> RecordOperation:
+    """Store an operation in the outbox for the worker to apply.
+
+    Args:
+        user: the user requesting the operation.
+        fqdn: the FQDN of the record, including the ACME prefix.
+        value: the ACME challenge of the record.
+        action: whether to add or remove the record.
+
+    Returns:
+        the stored operation.
+    """
+    operation = RecordOperation.objects.create(user=user, fqdn=fqdn, value=value, action=action)
+    transaction.on_commit(worker.wake)
+    return operation
+
+
+@tracer.start_as_current_span("wait_for_operation")
+def wait_for_operation(operation: RecordOperation, timeout: float) -> RecordOperation:
+    """Wait for an operation to be applied.
+
+    Args:
+        operation: the operation to wait for.
+        timeout: maximum number of seconds to wait.
+
+    Returns:
+        the operation, refreshed from the database.
+    """
+    deadline = time.monotonic() + timeout
+    while operation.status in UNFINISHED_STATUSES and time.monotonic() < deadline:
+        time.sleep(0.1)
+        operation.refresh_from_db(fields=["status", "error", "updated_at"])
+    return operation
+
+
+async def aenqueue(user, fqdn: str, value: str, action: str) -> RecordOperation:
+    """Store an operation in the outbox with the async ORM for the worker to apply.
+
+    The async views run in autocommit mode, so the operation is committed once created.
+
+    Args:
+        user: the user requesting the operation.
+        fqdn: the FQDN of the record, including the ACME prefix.
+        value: the ACME challenge of the record.
+        action: whether to add or remove the record.
+
+    Returns:
+        the stored operation.
+    """
+    operation = await RecordOperation.objects.acreate(
+        user=user, fqdn=fqdn, value=value, action=action
+    )
+    worker.wake()
+    return operation
+
+
+async def await_operation(operation: RecordOperation, timeout: float) -> RecordOperation:
+    """Wait for an operation to be applied without blocking the event loop.
+
+    Args:
+        operation: the operation to wait for.
+        timeout: maximum number of seconds to wait.
+
+    Returns:
+        the operation, refreshed from the database.
+    """
+    with tracer.start_as_current_span("await_operation"):
+        deadline = time.monotonic() + timeout
+        while operation.status in UNFINISHED_STATUSES and time.monotonic() < deadline:
+            await asyncio.sleep(0.1)
+            await operation.arefresh_from_db(fields=["status", "error", "updated_at"])
+        return operation
@@ -0,0 +1,325 @@
+# Copyright 2025 Canonical Ltd.
+# See LICENSE file for licensing details.
+"""Resolution of the FQDNs a user has been granted access to."""
+
+import secrets
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, Iterable, List, Set, Tuple
+
+from asgiref.sync import sync_to_async
+from django.contrib.auth.models import AbstractBaseUser
+from django.core.cache import caches
+from django.db.models import Q, QuerySet
+from opentelemetry import trace
+
+from .models import AccessLevel, DomainUserPermission, reverse_fqdn
+from .settings import (
+    DNS_PERMISSION_CACHE_SHARED,
+    DNS_PERMISSION_CACHE_SIZE,
+    DNS_PERMISSION_CACHE_TTL,
+)
+
+tracer = trace.get_tracer(__name__)
+
+
+class _Node:  # pylint: disable=too-few-public-methods
+    """Node of the permission trie, standing for a domain.
+
+    Attributes:
+        children: the nodes of the domains one label below, by label.
+        access_levels: the access levels granted on the domain.
+    """
+
+    __slots__ = ("children", "access_levels")
+
+    def __init__(self):
+        """Initialize the node."""
+        self.children: Dict[str, "_Node"] = {}
+        self.access_levels: Set[str] = set()
+
+
+class PermissionTrie:
+    """Grants of a user, indexed by domain labels from the top-level domain down.
+
+    Checking a FQDN walks its labels once, so the cost depends on the number of labels rather
+    than on the number of grants.
+    """
+
+    def __init__(self, grants: Iterable[Tuple[str, str]] = ()):
+        """Initialize the trie.
+
+        Args:
+            grants: the granted (domain FQDN, access level) pairs.
+        """
+        self._root = _Node()
+        for fqdn, access_level in grants:
+            self.add(fqdn, access_level)
+
+    def add(self, fqdn: str, access_level: str) -> None:
+        """Grant an access level on a domain.
+
+        Args:
+            fqdn: the FQDN of the domain.
+            access_level: the access level granted.
+        """
+        node = self._root
+        for label in reversed(fqdn.split(".")):
+            node = node.children.setdefault(label, _Node())
+        node.access_levels.add(access_level)
+
+    def allows(self, fqdn: str) -> bool:
+        """Check if the grants cover a FQDN.
+
+        A domain access level covers the domain itself and a subdomain access level covers
+        any FQDN below the domain.
+
+        Args:
+            fqdn: the FQDN to check.
+
+        Returns:
+            whether the FQDN is covered.
+        """
+        labels = fqdn.split(".")
+        node = self._root
+        for remaining in range(len(labels) - 1, -1, -1):
+            child = node.children.get(labels[remaining])
+            if child is None:
+                return False
+            node = child
+            if remaining and AccessLevel.SUBDOMAIN in node.access_levels:
+                return True
+        return AccessLevel.DOMAIN in node.access_levels
+
+
+@tracer.start_as_current_span("load_permissions")
+def load_permissions(user: AbstractBaseUser) -> PermissionTrie:
+    """Load all the grants of a user in a single query.
+
+    Args:
+        user: the user.
+
+    Returns:
+        the grants of the user.
+    """
+    return PermissionTrie(
+        DomainUserPermission.objects.filter(user=user).values_list("domain__fqdn", "access_level")
+    )
+
+
+def _permission_query(user: AbstractBaseUser, fqdn: str) -> QuerySet:
+    """Get the grants of a user covering a FQDN.
+
+    Args:
+        user: the user.
+        fqdn: the FQDN, without the ACME challenge prefix.
+
+    Returns:
+        the query for the grants.
+    """
+    reversed_fqdn = reverse_fqdn(fqdn)
+    labels = reversed_fqdn.split(".")
+    parents = [".".join(labels[:length]) for length in range(1, len(labels))]
+    return DomainUserPermission.objects.filter(
+        Q(access_level=AccessLevel.DOMAIN, domain__reversed_fqdn=reversed_fqdn)
+        | Q(access_level=AccessLevel.SUBDOMAIN, domain__reversed_fqdn__in=parents),
+        user=user,
+    )
+
+
+@tracer.start_as_current_span("query_permission")
+def query_permission(user: AbstractBaseUser, fqdn: str) -> bool:
+    """Check in the database, in a single indexed query, if the user can manage a FQDN.
+
+    The FQDN is matched against the reversed FQDN of the domains: exactly for domain grants,
+    and against each of its parent domains for subdomain grants, so the cost depends on the
+    number of labels rather than on the number of grants.
+
+    Args:
+        user: the user.
+        fqdn: the FQDN, without the ACME challenge prefix.
+
+    Returns:
+        whether the user can manage the records for the FQDN.
+    """
+    return _permission_query(user, fqdn).exists()
+
+
+async def aquery_permission(user: AbstractBaseUser, fqdn: str) -> bool:
+    """Check in the database, with the async ORM, if the user can manage a FQDN.
+
+    Args:
+        user: the user.
+        fqdn: the FQDN, without the ACME challenge prefix.
+
+    Returns:
+        whether the user can manage the records for the FQDN.
+    """
+    with tracer.start_as_current_span("aquery_permission"):
+        return await _permission_query(user, fqdn).aexists()
+
+
+class PermissionCache:
+    """Bounded cache of the compiled grants of each user, expiring them after a TTL.
+
+    The least recently used users are evicted once the cache is full. Entries are dropped when
+    the grants of their user change in this process. When a shared cache is configured, each
+    invalidation also stores a new version token for the user there, so that the other workers
+    and units drop their stale entries on their next check. Otherwise, changes made elsewhere,
+    e.g. from a management command, are picked up once the entries expire.
+    """
+
+    def __init__(self, size: int, ttl: float, shared_alias: str | None):
+        """Initialize the cache.
+
+        Args:
+            size: maximum number of users cached, or 0 to disable the cache.
+            ttl: seconds a cached entry stays valid.
+            shared_alias: alias of the Django cache sharing the version tokens, if any.
+        """
+        self._size = size
+        self._ttl = ttl
+        self._shared_alias = shared_alias
+        self._entries: OrderedDict[int, Tuple[float, str | None, PermissionTrie]] = OrderedDict()
+        self._lock = threading.Lock()
+        self._epoch = 0
+
+    @staticmethod
+    def _version_key(user_id: int) -> str:
+        """Get the shared cache key holding the version token of a user's grants.
+
+        Args:
+            user_id: the user identifier.
+
+        Returns:
+            the cache key.
+        """
+        return f"api:permissions:{user_id}"
+
+    def _shared_version(self, user_id: int) -> str | None:
+        """Get the version token of a user's grants from the shared cache.
+
+        Args:
+            user_id: the user identifier.
+
+        Returns:
+            the version token, or None if there is none or no shared cache.
+        """
+        if self._shared_alias is None:
+            return None
+        return caches[self._shared_alias].get(self._version_key(user_id))
+
+    def get(self, user: AbstractBaseUser) -> PermissionTrie:
+        """Get the grants of a user, loading them if they are not cached.
+
+        Args:
+            user: the user.
+
+        Returns:
+            the grants of the user.
+        """
+        if self._size <= 0:
+            return load_permissions(user)
+        version = self._shared_version(user.pk)
+        with self._lock:
+            entry = self._entries.get(user.pk)
+            if entry is not None and entry[0] > time.monotonic() and entry[1] == version:
+                self._entries.move_to_end(user.pk)
+                return entry[2]
+            epoch = self._epoch
+        permissions = load_permissions(user)
+        with self._lock:
+            # Grants changed while loading them may not be part of the result.
+            if epoch == self._epoch:
+                self._entries[user.pk] = (time.monotonic() + self._ttl, version, permissions)
+                self._entries.move_to_end(user.pk)
+                while len(self._entries) > self._size:
+                    self._entries.popitem(last=False)
+        return permissions
+
+    def invalidate(self, user_ids: Iterable[int]) -> None:
+        """Drop the cached grants of users, in every worker sharing the cache.
+
+        Args:
+            user_ids: the user identifiers.
+        """
+        user_ids = set(user_ids)
+        with self._lock:
+            self._epoch += 1
+            for user_id in user_ids:
+                self._entries.pop(user_id, None)
+        if self._shared_alias is not None and user_ids:
+            caches[self._shared_alias].set_many(
+                {self._version_key(user_id): secrets.token_hex(8) for user_id in user_ids},
+                timeout=None,
+            )
+
+    def clear(self) -> None:
+        """Drop all the grants cached in this process."""
+        with self._lock:
+            self._epoch += 1
+            self._entries.clear()
+
+
+permission_cache = PermissionCache(
+    DNS_PERMISSION_CACHE_SIZE,
+    DNS_PERMISSION_CACHE_TTL,
+    "default" if DNS_PERMISSION_CACHE_SHARED else None,
+)
+
+
+def user_can_manage(user: AbstractBaseUser, fqdn: str) -> bool:
+    """Check if the user has been granted access to a FQDN.
+
+    The check is answered from the permission cache, or straight from the database when the
+    cache is disabled.
+
+    Args:
+        user: the user.
+        fqdn: the FQDN, without the ACME challenge prefix.
+
+    Returns:
+        whether the user can manage the records for the FQDN.
+    """
+    if DNS_PERMISSION_CACHE_SIZE <= 0:
+        return query_permission(user, fqdn)
+    return permission_cache.get(user).allows(fqdn)
+
+
+async def auser_can_manage(user: AbstractBaseUser, fqdn: str) -> bool:
+    """Check if the user has been granted access to a FQDN, without blocking the event loop.
+
+    Args:
+        user: the user.
+        fqdn: the FQDN, without the ACME challenge prefix.
+
+    Returns:
+        whether the user can manage the records for the FQDN.
+    """
+    if DNS_PERMISSION_CACHE_SIZE <= 0:
+        return await aquery_permission(user, fqdn)
+    # A cold or outdated entry loads the grants, and checking a shared version hits Redis.
+    permissions = await sync_to_async(permission_cache.get)(user)
+    return permissions.allows(fqdn)
+
+
+@tracer.start_as_current_span("user_can_manage_all")
+def user_can_manage_all(user: AbstractBaseUser, fqdns: Iterable[str]) -> List[bool]:
+    """Check in one pass if the user has been granted access to each of several FQDNs.
+
+    The grants of the user are loaded once, from the permission cache or in a single query
+    when the cache is disabled, and every FQDN is checked against them.
+
+    Args:
+        user: the user.
+        fqdns: the FQDNs, without the ACME challenge prefix.
+
+    Returns:
+        whether the user can manage the records for each FQDN, in order.
+    """
+    if DNS_PERMISSION_CACHE_SIZE <= 0:
+        permissions = load_permissions(user)
+    else:
+        permissions = permission_cache.get(user)
+    return [permissions.allows(fqdn) for fqdn in fqdns]
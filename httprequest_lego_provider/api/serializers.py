@@ -9,7 +9,7 @@ from django.contrib.auth.hashers import make_password
 from django.contrib.auth.models import User
 from rest_framework import serializers
 
-from .models import Domain, DomainUserPermission
+from .models import Domain, DomainUserPermission, RecordOperation
 
 
 class DomainSerializer(serializers.ModelSerializer):
@@ -20,11 +20,11 @@ class DomainSerializer(serializers.ModelSerializer):
 
         Attributes:
             model: the model to serialize.
-            fields: fields to serialize.
+            exclude: fields not to serialize.
         """
 
         model = Domain
-        fields = "__all__"
+        exclude = ["reversed_fqdn"]
 
 
 class DomainUserPermissionSerializer(serializers.ModelSerializer):
@@ -42,6 +42,21 @@ class DomainUserPermissionSerializer(serializers.ModelSerializer):
         fields = "__all__"
 
 
+class RecordOperationSerializer(serializers.ModelSerializer):
+    """Serializer for the RecordOperation objects."""
+
+    class Meta:
+        """Serializer configuration.
+
+        Attributes:
+            model: the model to serialize.
+            fields: fields to serialize.
+        """
+
+        model = RecordOperation
+        fields = ["id", "fqdn", "action", "status", "error", "created_at", "updated_at"]
+
+
 class UserSerializer(serializers.ModelSerializer):
     """Serializer for the User objects."""
 
@@ -71,3 +86,17 @@ class UserSerializer(serializers.ModelSerializer):
         """
         validated_data["password"] = make_password(validated_data["password"])
         return super().create(validated_data)
+
+    def update(self, instance, validated_data):
+        """Override default ModelSerializer update call to hash the password.
+
+        Arguments:
+            instance: User object to update
+            validated_data: Serializer validated data
+
+        Returns:
+            The updated User object.
+        """
+        if "password" in validated_data:
+            validated_data["password"] = make_password(validated_data["password"])
+        return super().update(instance, validated_data)
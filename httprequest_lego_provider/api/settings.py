@@ -6,4 +6,45 @@ import os
 
 GIT_REPO_URL = os.getenv("DJANGO_GIT_REPO", default="")
 GIT_SSH_KEY = os.getenv("DJANGO_GIT_SSH_KEY", default="")
+GIT_MIRROR_DIR = os.getenv("DJANGO_GIT_MIRROR_DIR", default="")
+# Seconds between the background refreshes of the repository mirror, or 0 to only refresh it
+# when serving requests.
+GIT_MIRROR_REFRESH_INTERVAL = float(os.getenv("DJANGO_GIT_MIRROR_REFRESH_INTERVAL", default="60"))
+# Seconds between the background repacks of the repository mirror, or 0 to leave them to git.
+GIT_MIRROR_MAINTENANCE_INTERVAL = float(
+    os.getenv("DJANGO_GIT_MIRROR_MAINTENANCE_INTERVAL", default="3600")
+)
+# Seconds an idle SSH master connection to the repository is kept open for the next git
+# operations to reuse, or 0 to connect for every git operation.
+GIT_SSH_CONTROL_PERSIST = int(os.getenv("DJANGO_GIT_SSH_CONTROL_PERSIST", default="300"))
+DNS_BACKEND = os.getenv("DJANGO_DNS_BACKEND", default="git")
+DNS_ZONE_DIR = os.getenv("DJANGO_DNS_ZONE_DIR", default="")
+# Domains whose zone files are held by other repositories or branches than GIT_REPO_URL, as
+# "example.com,example.org=git+ssh://user@repository@branch" entries separated by semicolons.
+DNS_SHARDS = os.getenv("DJANGO_DNS_SHARDS", default="")
+DNS_BATCH_WINDOW = float(os.getenv("DJANGO_DNS_BATCH_WINDOW", default="0"))
+DNS_BATCH_MAX_RECORDS = int(os.getenv("DJANGO_DNS_BATCH_MAX_RECORDS", default="100"))
+DNS_PUSH_RETRIES = int(os.getenv("DJANGO_DNS_PUSH_RETRIES", default="5"))
+DNS_PUSH_BACKOFF = float(os.getenv("DJANGO_DNS_PUSH_BACKOFF", default="0.1"))
+DNS_GIT_WRITER = os.getenv("DJANGO_DNS_GIT_WRITER", default="worktree")
+# Number of parsed zone files kept in memory between requests, or 0 to parse them every time.
+DNS_ZONE_INDEX_CACHE_SIZE = int(os.getenv("DJANGO_DNS_ZONE_INDEX_CACHE_SIZE", default="64"))
+DNS_ASYNC_MODE = os.getenv("DJANGO_DNS_ASYNC_MODE", default="").lower() == "true"
+# Set when served over ASGI, to answer present and cleanup requests from the event loop.
+DNS_ASGI_VIEWS = os.getenv("DJANGO_DNS_ASGI_VIEWS", default="").lower() == "true"
+DNS_ASYNC_MAX_WAIT = float(os.getenv("DJANGO_DNS_ASYNC_MAX_WAIT", default="60"))
+# Seconds the outcome of a present or cleanup request is kept to answer its retries, or 0 to
+# apply every retry again.
+DNS_IDEMPOTENCY_TTL = float(os.getenv("DJANGO_DNS_IDEMPOTENCY_TTL", default="600"))
+DNS_OUTBOX_BATCH_SIZE = int(os.getenv("DJANGO_DNS_OUTBOX_BATCH_SIZE", default="100"))
+DNS_OUTBOX_POLL_INTERVAL = float(os.getenv("DJANGO_DNS_OUTBOX_POLL_INTERVAL", default="5"))
+# Seconds after which an operation claimed by a worker which never recorded its outcome, e.g.
+# because it crashed, is claimed again.
+DNS_OUTBOX_CLAIM_TIMEOUT = float(os.getenv("DJANGO_DNS_OUTBOX_CLAIM_TIMEOUT", default="300"))
+DNS_PERMISSION_CACHE_SIZE = int(os.getenv("DJANGO_DNS_PERMISSION_CACHE_SIZE", default="1024"))
+DNS_PERMISSION_CACHE_TTL = float(os.getenv("DJANGO_DNS_PERMISSION_CACHE_TTL", default="300"))
+# Set by the charm when related to Redis, to share invalidations across workers and units.
+DNS_PERMISSION_CACHE_SHARED = bool(os.getenv("REDIS_DB_CONNECT_STRING"))
+DNS_AUTH_CACHE_SIZE = int(os.getenv("DJANGO_DNS_AUTH_CACHE_SIZE", default="1024"))
+DNS_AUTH_CACHE_TTL = float(os.getenv("DJANGO_DNS_AUTH_CACHE_TTL", default="60"))
 LOGIN_REDIRECT_URL = "/"
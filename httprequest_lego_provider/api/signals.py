@@ -0,0 +1,68 @@
+# Copyright 2025 Canonical Ltd.
+# See LICENSE file for licensing details.
+"""Signal receivers."""
+
+# imported-auth-user has to be disable as the conflicting import is needed for typing
+# pylint:disable=imported-auth-user
+
+from typing import Iterable
+
+from django.contrib.auth.models import User
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from .authentication import credential_cache
+from .models import Domain, DomainUserPermission
+from .permissions import permission_cache
+
+
+def _invalidate_permissions(user_ids: Iterable[int]) -> None:
+    """Drop the cached grants of users now and once the current transaction is committed.
+
+    Invalidating again on commit drops grants cached by concurrent requests that read them
+    before the change was committed.
+
+    Args:
+        user_ids: the user identifiers.
+    """
+    user_ids = set(user_ids)
+    permission_cache.invalidate(user_ids)
+    transaction.on_commit(lambda: permission_cache.invalidate(user_ids))
+
+
+@receiver(post_save, sender=DomainUserPermission)
+@receiver(post_delete, sender=DomainUserPermission)
+def domain_user_permission_changed(instance: DomainUserPermission, **_) -> None:
+    """Invalidate the cached grants of a user whose permission changed.
+
+    Args:
+        instance: the permission.
+    """
+    _invalidate_permissions([instance.user_id])
+
+
+@receiver(post_save, sender=Domain)
+@receiver(post_delete, sender=Domain)
+def domain_changed(instance: Domain, **_) -> None:
+    """Invalidate the cached grants of the users with a permission on a changed domain.
+
+    Args:
+        instance: the domain.
+    """
+    _invalidate_permissions(
+        DomainUserPermission.objects.filter(domain_id=instance.pk).values_list(
+            "user_id", flat=True
+        )
+    )
+
+
+@receiver(post_save, sender=User)
+@receiver(post_delete, sender=User)
+def user_changed(instance: User, **_) -> None:
+    """Drop the cached credentials of a user that changed, e.g. on a password change.
+
+    Args:
+        instance: the user.
+    """
+    credential_cache.invalidate([instance.pk])
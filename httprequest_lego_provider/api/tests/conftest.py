@@ -6,11 +6,62 @@
 # pylint:disable=unused-argument
 
 import base64
+import os
 import secrets
+from pathlib import Path
 
 import pytest
+from api import dns, mirror, zones
+from api.authentication import credential_cache
 from api.models import AccessLevel, Domain, DomainUserPermission
+from api.permissions import permission_cache
 from django.contrib.auth.models import User
+from django.core.cache import cache
+from git import Repo
+
+ZONE_FILE_CONTENT = "site1 600 IN TXT \042sometoken\042\n"
+
+
+@pytest.fixture(autouse=True)
+def isolated_mirrors_fixture(monkeypatch: pytest.MonkeyPatch, tmp_path: Path) -> None:
+    """Give every test its own set of repository mirrors and writers."""
+    monkeypatch.setattr(mirror, "_mirrors", {})
+    monkeypatch.setattr(dns, "_writers", {})
+    monkeypatch.setattr(mirror, "GIT_MIRROR_DIR", str(tmp_path))
+    monkeypatch.setattr(mirror, "GIT_SSH_CONTROL_PERSIST", 0)
+
+
+@pytest.fixture(autouse=True)
+def isolated_permission_cache_fixture() -> None:
+    """Start every test with empty permission, credential, outcome and zone index caches."""
+    cache.clear()
+    permission_cache.clear()
+    credential_cache.clear()
+    zones.zone_indexes.clear()
+
+
+@pytest.fixture(name="git_environment")
+def git_environment_fixture(monkeypatch: pytest.MonkeyPatch) -> None:
+    """Isolate git from the host configuration and provide a commit identity."""
+    monkeypatch.setenv("GIT_CONFIG_GLOBAL", os.devnull)
+    monkeypatch.setenv("GIT_CONFIG_SYSTEM", os.devnull)
+    for variable in ("GIT_AUTHOR", "GIT_COMMITTER"):
+        monkeypatch.setenv(f"{variable}_NAME", "test")
+        monkeypatch.setenv(f"{variable}_EMAIL", "test@example.com")
+
+
+@pytest.fixture(name="remote_repository")
+def remote_repository_fixture(tmp_path: Path, git_environment: None) -> Path:
+    """Provide a bare repository, allowing partial clones, holding an example.com zone file."""
+    remote = tmp_path / "remote.git"
+    remote_repo = Repo.init(remote, bare=True, initial_branch="main")
+    remote_repo.config_writer().set_value("uploadpack", "allowFilter", "true").release()
+    seed = Repo.clone_from(f"file://{remote}", tmp_path / "seed")
+    (tmp_path / "seed" / "example.com.domain").write_text(ZONE_FILE_CONTENT, encoding="utf-8")
+    seed.index.add(["example.com.domain"])
+    seed.index.commit("Seed zone files")
+    seed.git.push("origin", "HEAD:main")
+    return remote
 
 
 @pytest.fixture(scope="module", name="username")
@@ -0,0 +1,133 @@
+# Copyright 2025 Canonical Ltd.
+# See LICENSE file for licensing details.
+"""Unit tests for the compact_history module."""
+
+from io import StringIO
+from pathlib import Path
+from unittest.mock import patch
+
+import pytest
+from api import history
+from api.mirror import get_mirror
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from git import Repo
+
+
+def _push_commits(tmp_path: Path, remote: Path, count: int) -> Repo:
+    """Push commits each adding a record to the example.com zone file of the remote.
+
+    Args:
+        tmp_path: temporary directory for the intermediate clone.
+        remote: the remote repository.
+        count: the number of commits to push.
+
+    Returns:
+        the clone the commits were pushed from.
+    """
+    writer = Repo.clone_from(f"file://{remote}", tmp_path / "writer")
+    zone_file = tmp_path / "writer" / "example.com.domain"
+    for i in range(count):
+        with zone_file.open("a", encoding="utf-8") as file:
+            file.write(f"site{i} 600 IN TXT \042token{i}\042\n")
+        writer.index.add(["example.com.domain"])
+        writer.index.commit(f"Add site{i}")
+    writer.git.push("origin", "HEAD:main")
+    return writer
+
+
+def test_compact_history(tmp_path: Path, remote_repository: Path):
+    """
+    arrange: push a long history to the remote.
+    act: call the compact_history command keeping the last 3 commits.
+    assert: the branch holds the same content behind a new root commit and the last 3 commits,
+        the previous history is tagged and existing mirrors follow the compacted branch.
+    """
+    writer = _push_commits(tmp_path, remote_repository, 10)
+    previous_tip = writer.head.commit
+    mirror = get_mirror("user", f"file://{remote_repository}", "main")
+    mirror.sync()
+    out = StringIO()
+
+    with patch("api.history.GIT_REPO_URL", f"file://{remote_repository}"):
+        call_command("compact_history", "--keep", "3", "--tag", "archive/test", stdout=out)
+
+    remote = Repo(remote_repository)
+    tip = remote.commit("main")
+    history = list(tip.iter_items(remote, "main"))
+    assert [commit.message for commit in history[:3]] == ["Add site9", "Add site8", "Add site7"]
+    assert len(history) == 4
+    checkpoint = list(writer.iter_commits("HEAD", max_count=4))[3]
+    assert str(history[3].message).startswith(f"Compact the history up to {checkpoint}")
+    assert not history[3].parents
+    assert tip.tree == previous_tip.tree
+    assert [commit.author.name for commit in history[:3]] == ["test"] * 3
+    assert remote.commit("archive/test") == previous_tip
+    assert "kept 3 commits" in out.getvalue()
+    assert mirror.sync().head.commit == tip
+
+
+def test_compact_history_short_history(remote_repository: Path):
+    """
+    arrange: do nothing, the remote holding a single commit.
+    act: call the compact_history command.
+    assert: the branch is left untouched.
+    """
+    tip = Repo(remote_repository).commit("main")
+    out = StringIO()
+
+    with patch("api.history.GIT_REPO_URL", f"file://{remote_repository}"):
+        call_command("compact_history", stdout=out)
+
+    assert Repo(remote_repository).commit("main") == tip
+    assert "Nothing to compact" in out.getvalue()
+
+
+def test_compact_history_shard(tmp_path: Path, remote_repository: Path):
+    """
+    arrange: push a long history to the remote.
+    act: call the compact_history command for the remote, configured as a shard.
+    assert: the history of the remote is compacted.
+    """
+    _push_commits(tmp_path, remote_repository, 3)
+
+    with patch("api.history.GIT_REPO_URL", "git+ssh://user@git.server/repo_name"):
+        call_command(
+            "compact_history", "--keep", "0", "--repository", f"file://{remote_repository}"
+        )
+
+    assert not Repo(remote_repository).commit("main").parents
+
+
+def test_compact_history_branch_moved(tmp_path: Path, remote_repository: Path):
+    """
+    arrange: push a history to the remote, then another commit while it is compacted.
+    act: call the compact_history command.
+    assert: the compaction is refused and the concurrent commit is kept.
+    """
+    writer = _push_commits(tmp_path, remote_repository, 5)
+    serialize_commit = history.serialize_commit
+
+    def serialize_after_concurrent_change(*args):
+        """Push a concurrent change before serializing the compacted root commit.
+
+        Args:
+            args: the arguments of the serialization.
+
+        Returns:
+            the serialized commit.
+        """
+        (tmp_path / "writer" / "example.com.domain").write_text("", encoding="utf-8")
+        writer.index.add(["example.com.domain"])
+        writer.index.commit("Concurrent change")
+        writer.git.push("origin", "HEAD:main")
+        return serialize_commit(*args)
+
+    with (
+        patch("api.history.GIT_REPO_URL", f"file://{remote_repository}"),
+        patch.object(history, "serialize_commit", serialize_after_concurrent_change),
+        pytest.raises(CommandError, match="changed during the compaction"),
+    ):
+        call_command("compact_history", "--keep", "1")
+
+    assert Repo(remote_repository).commit("main") == writer.head.commit
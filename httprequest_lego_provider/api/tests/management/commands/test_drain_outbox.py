@@ -0,0 +1,34 @@
+# Copyright 2025 Canonical Ltd.
+# See LICENSE file for licensing details.
+"""Unit tests for the drain_outbox module."""
+
+# imported-auth-user has to be disable as the conflicting import is needed for typing
+# pylint:disable=imported-auth-user
+
+from io import StringIO
+from unittest.mock import patch
+
+import pytest
+from api.models import OperationStatus, RecordAction, RecordOperation
+from django.contrib.auth.models import User
+from django.core.management import call_command
+
+
+@pytest.mark.django_db
+def test_drain_outbox(user: User):
+    """
+    arrange: store pending operations in the outbox.
+    act: call the drain_outbox command.
+    assert: all operations are applied and the count is returned in the stdout.
+    """
+    for action in (RecordAction.PRESENT, RecordAction.CLEANUP):
+        RecordOperation.objects.create(
+            user=user, fqdn="_acme-challenge.example.com", value="token", action=action
+        )
+    out = StringIO()
+
+    with patch("api.outbox.apply_record_changes"):
+        call_command("drain_outbox", stdout=out)
+
+    assert "Processed 2 DNS record operations." in out.getvalue()
+    assert not RecordOperation.objects.filter(status=OperationStatus.PENDING).exists()
@@ -0,0 +1,141 @@
+# Copyright 2025 Canonical Ltd.
+# See LICENSE file for licensing details.
+"""Unit tests for the authentication module."""
+
+# imported-auth-user has to be disable as the conflicting import is needed for typing
+# pylint:disable=imported-auth-user
+
+from unittest.mock import patch
+
+import pytest
+from api.authentication import CachedBasicAuthentication, CredentialCache
+from api.serializers import UserSerializer
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from rest_framework.exceptions import AuthenticationFailed
+
+
+@pytest.mark.django_db
+def test_cached_basic_authentication_skips_password_hash(
+    user: User, username: str, user_password: str
+):
+    """
+    arrange: authenticate the user once.
+    act: authenticate the user again with the same credentials.
+    assert: the user is authenticated without checking the password again.
+    """
+    authentication = CachedBasicAuthentication()
+    authentication.authenticate_credentials(username, user_password)
+
+    with patch("django.contrib.auth.models.User.check_password") as check_password:
+        authenticated, _ = authentication.authenticate_credentials(username, user_password)
+
+    assert authenticated == user
+    check_password.assert_not_called()
+
+
+@pytest.mark.django_db
+def test_cached_basic_authentication_rejects_other_password(
+    user: User, username: str, user_password: str
+):
+    """
+    arrange: authenticate the user once.
+    act: authenticate the user with a wrong password.
+    assert: the credentials are rejected.
+    """
+    authentication = CachedBasicAuthentication()
+    authentication.authenticate_credentials(username, user_password)
+
+    with pytest.raises(AuthenticationFailed):
+        authentication.authenticate_credentials(username, f"{user_password}wrong")
+
+
+@pytest.mark.django_db
+def test_cached_basic_authentication_follows_password_change(
+    user: User, username: str, user_password: str
+):
+    """
+    arrange: authenticate the user once.
+    act: change the password of the user through the serializer.
+    assert: the previous password is rejected and the new one accepted.
+    """
+    authentication = CachedBasicAuthentication()
+    authentication.authenticate_credentials(username, user_password)
+
+    serializer = UserSerializer(user, data={"password": "new-password"}, partial=True)
+    assert serializer.is_valid()
+    serializer.save()
+
+    with pytest.raises(AuthenticationFailed):
+        authentication.authenticate_credentials(username, user_password)
+    authenticated, _ = authentication.authenticate_credentials(username, "new-password")
+    assert authenticated == user
+
+
+@pytest.mark.django_db
+def test_cached_basic_authentication_rejects_inactive_user(
+    user: User, username: str, user_password: str
+):
+    """
+    arrange: authenticate the user once.
+    act: deactivate the user without saving it through the ORM.
+    assert: the credentials are rejected.
+    """
+    authentication = CachedBasicAuthentication()
+    authentication.authenticate_credentials(username, user_password)
+
+    User.objects.filter(pk=user.pk).update(is_active=False)
+
+    with pytest.raises(AuthenticationFailed):
+        authentication.authenticate_credentials(username, user_password)
+
+
+@pytest.mark.django_db
+def test_credential_cache_ignores_entries_for_changed_password(
+    user: User, username: str, user_password: str
+):
+    """
+    arrange: cache the credentials of the user.
+    act: change the password of the user without emitting signals, as another worker would.
+    assert: the cached credentials are not used anymore.
+    """
+    credential_cache = CredentialCache(10, 60)
+    credential_cache.add(username, user_password, user)
+    assert credential_cache.get(username, user_password) == user
+
+    user.set_password("new-password")
+    User.objects.filter(pk=user.pk).update(password=user.password)
+
+    assert credential_cache.get(username, user_password) is None
+
+
+@pytest.mark.django_db
+def test_credential_cache_expires_entries(user: User, username: str, user_password: str):
+    """
+    arrange: create a credential cache whose entries expire immediately.
+    act: cache the credentials of the user.
+    assert: the credentials are not cached.
+    """
+    credential_cache = CredentialCache(10, 0)
+    credential_cache.add(username, user_password, user)
+
+    assert credential_cache.get(username, user_password) is None
+
+
+@pytest.mark.django_db
+def test_create_user_invalidates_credentials(user: User, username: str, user_password: str):
+    """
+    arrange: authenticate the user once.
+    act: run the create_user command for the user.
+    assert: the cached credentials of the user have been dropped.
+    """
+    authentication = CachedBasicAuthentication()
+    authentication.authenticate_credentials(username, user_password)
+
+    call_command("create_user", username, "new-password")
+
+    with patch(
+        "django.contrib.auth.models.User.check_password", return_value=True
+    ) as check_password:
+        authentication.authenticate_credentials(username, user_password)
+    check_password.assert_called_once()
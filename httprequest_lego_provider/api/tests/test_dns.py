@@ -2,18 +2,28 @@
 # See LICENSE file for licensing details.
 """Unit tests for the dns module."""
 
+import asyncio
+import contextvars
 import secrets
+import threading
 from pathlib import Path
 from unittest.mock import ANY, MagicMock, Mock, patch
 
 import pytest
+from api import dns
 from api.dns import (
     DnsSourceUpdateError,
+    GitRecordBackend,
+    LocalRecordBackend,
+    RecordChange,
+    RecordWriter,
     parse_repository_url,
     remove_dns_record,
     write_dns_record,
 )
-from git import GitCommandError, Repo
+from api.mirror import get_mirror
+from api.zones import ZoneIndex
+from git import Git, GitCommandError, PushInfo, Repo
 
 
 @patch.object(Path, "write_text")
@@ -42,41 +52,42 @@ def test_write_dns_record_raises_exception(repo_patch: Mock, _):
         ("some.other.site.example.com", "some.other.site 600 IN TXT \042{token}\042\n"),
     ],
 )
-@patch.object(Path, "write_text")
-@patch.object(Path, "read_text")
 @patch.object(Repo, "clone_from")
 @patch("api.dns.GIT_REPO_URL", "git+ssh://user@git.server/repo_name@lego")
-def test_write_dns_record(
-    repo_patch: Mock, read_patch: Mock, write_patch: Mock, fqdn: str, record: str
-):
+def test_write_dns_record(repo_patch: Mock, tmp_path: Path, fqdn: str, record: str):
     """
-    arrange: mock the repo.
+    arrange: mock the repo, with a working tree holding the file matching the record.
     act: attempt to write a new DNS record.
     assert: a new file with filename matching the record is committed and pushed to the repository.
     """
     repo_mock = MagicMock(spec=Repo)
+    repo_mock.working_tree_dir = str(tmp_path)
     repo_patch.return_value = repo_mock
     token = secrets.token_hex()
-    read_patch.return_value = (
+    (tmp_path / "example.com.domain").write_text(
         "site2 600 IN TXT \042sometoken\042\n"
         "sïte1 600 IN TXT \042sometoken\042\n"
-        "site3 600 IN TXT \042sometoken\042\n"
+        "site3 600 IN TXT \042sometoken\042\n",
+        encoding="utf-8",
     )
     write_dns_record(fqdn, token)
 
     repo_patch.assert_called_once_with(
-        "git+ssh://user@git.server/repo_name", ANY, branch="lego", depth=1
-    )
-    repo_mock.config_writer().set_value.assert_called_once_with("user", "name", "user")
-    write_patch.assert_called_once_with(
-        (
-            "site2 600 IN TXT \042sometoken\042\n"
-            "sïte1 600 IN TXT \042sometoken\042\n"
-            "site3 600 IN TXT \042sometoken\042\n" + record
-        ).format(token=token),
-        encoding="utf-8",
+        "git+ssh://user@git.server/repo_name",
+        ANY,
+        env=None,
+        branch="lego",
+        depth=1,
+        filter="blob:none",
+        no_checkout=True,
     )
-    repo_mock.index.add.assert_called_with(["example.com.domain"])
+    repo_mock.config_writer().set_value.assert_any_call("user", "name", "user")
+    assert (tmp_path / "example.com.domain").read_text(encoding="utf-8") == (
+        "site2 600 IN TXT \042sometoken\042\n"
+        "sïte1 600 IN TXT \042sometoken\042\n"
+        "site3 600 IN TXT \042sometoken\042\n" + record
+    ).format(token=token)
+    repo_mock.git.add.assert_called_with("example.com.domain")
     repo_mock.git.commit.assert_called_once()
     repo_mock.remote(name="origin").push.assert_called_once()
 
@@ -107,35 +118,46 @@ def test_remove_dns_record_raises_exception(repo_patch: Mock, _):
         ("some.other.site.example.com", "some.other.site 600 IN TXT \042{token}\042\n"),
     ],
 )
-@patch.object(Path, "write_text")
-@patch.object(Path, "read_text")
 @patch.object(Repo, "clone_from")
 @patch("api.dns.GIT_REPO_URL", "git+ssh://user@git.server/repo_name")
-def test_remove_dns_record(
-    repo_patch: Mock, read_patch: Mock, write_patch: Mock, fqdn: str, record: str
-):
+def test_remove_dns_record(repo_patch: Mock, tmp_path: Path, fqdn: str, record: str):
     """
-    arrange: mock the repo and filesystem so that the file matching a DNS exists.
-    act: attempt to delete a new DNS record.
-    assert: the file with filename matching the record is emptied and pushed to the repository.
+    arrange: mock the repo, with a working tree holding the file matching the record, along
+        with another value for the same FQDN.
+    act: attempt to delete the DNS record.
+    assert: only the record holding the value is removed from the file, which is pushed to the
+        repository.
     """
     repo_mock = MagicMock(spec=Repo)
+    repo_mock.working_tree_dir = str(tmp_path)
     repo_patch.return_value = repo_mock
-    read_patch.return_value = (
-        "site1 600 IN TXT \042sometoken\042\n" + record + "site3 600 IN TXT \042sometoken\042\n"
+    token = secrets.token_hex()
+    (tmp_path / "example.com.domain").write_text(
+        "site1 600 IN TXT \042sometoken\042\n"
+        + record.format(token=token)
+        + record.format(token="other")
+        + "site3 600 IN TXT \042sometoken\042\n",
+        encoding="utf-8",
     )
 
-    remove_dns_record(fqdn)
+    remove_dns_record(fqdn, token)
 
     repo_patch.assert_called_once_with(
-        "git+ssh://user@git.server/repo_name", ANY, branch=None, depth=1
+        "git+ssh://user@git.server/repo_name",
+        ANY,
+        env=None,
+        branch=None,
+        depth=1,
+        filter="blob:none",
+        no_checkout=True,
     )
-    repo_mock.config_writer().set_value.assert_called_once_with("user", "name", "user")
-    write_patch.assert_called_once_with(
-        "site1 600 IN TXT \042sometoken\042\nsite3 600 IN TXT \042sometoken\042\n",
-        encoding="utf-8",
+    repo_mock.config_writer().set_value.assert_any_call("user", "name", "user")
+    assert (tmp_path / "example.com.domain").read_text(encoding="utf-8") == (
+        "site1 600 IN TXT \042sometoken\042\n"
+        + record.format(token="other")
+        + "site3 600 IN TXT \042sometoken\042\n"
     )
-    repo_mock.index.add.assert_called_with(["example.com.domain"])
+    repo_mock.git.add.assert_called_with("example.com.domain")
     repo_mock.git.commit.assert_called_once()
     repo_mock.remote(name="origin").push.assert_called_once()
 
@@ -144,16 +166,15 @@ def test_remove_dns_record(
     "action",
     [write_dns_record, remove_dns_record],
 )
-@patch.object(Path, "read_text", side_effect=FileNotFoundError)
 @patch.object(Repo, "clone_from")
 @patch("api.dns.GIT_REPO_URL", "git+ssh://user@git.server/repo_name")
-def test_dns_record_missing_domain_file_raises(repo_patch: Mock, _, action):
+def test_dns_record_missing_domain_file_raises(repo_patch: Mock, tmp_path: Path, action):
     """
-    arrange: mock the repo and make reading the domain file raise FileNotFoundError.
+    arrange: mock the repo, with a working tree missing the domain file.
     act: attempt to write or remove a DNS record for an unconfigured site.
     assert: a DnsSourceUpdateError exception is raised.
     """
-    repo_patch.return_value = MagicMock(spec=Repo)
+    repo_patch.return_value = MagicMock(spec=Repo, working_tree_dir=str(tmp_path))
 
     fqdn = "site.example.com"
 
@@ -178,3 +199,766 @@ def test_parse_repository_url():
     assert user == "user1"
     assert url == "git+ssh://user1@git.server:8080/repo_name"
     assert branch == "main"
+
+
+def test_dns_records_reuse_mirror(remote_repository: Path):
+    """
+    arrange: point the provider to a local remote repository.
+    act: write and then remove a DNS record.
+    assert: both changes are pushed to the remote from a single working copy.
+    """
+    token = secrets.token_hex()
+    remote = Repo(remote_repository)
+    with (
+        patch("api.dns.GIT_REPO_URL", f"file://{remote_repository}"),
+        patch.object(Repo, "clone_from", wraps=Repo.clone_from) as clone_patch,
+    ):
+        write_dns_record("site.example.com", token)
+        written = remote.head.commit.tree["example.com.domain"]
+        remove_dns_record("site.example.com")
+        removed = remote.head.commit.tree["example.com.domain"]
+
+    clone_patch.assert_called_once()
+    assert f"site 600 IN TXT \042{token}\042\n" in written.data_stream.read().decode("utf-8")
+    assert "site " not in removed.data_stream.read().decode("utf-8")
+
+
+def _create_shard_repository(tmp_path: Path, domain: str) -> Path:
+    """Create a bare repository holding an empty zone file, for a shard.
+
+    Args:
+        tmp_path: temporary directory to create the repository in.
+        domain: the domain of the zone file.
+
+    Returns:
+        the path of the repository.
+    """
+    remote = tmp_path / f"{domain}.git"
+    Repo.init(remote, bare=True, initial_branch="main")
+    seed = Repo.clone_from(f"file://{remote}", tmp_path / f"{domain}-seed")
+    (tmp_path / f"{domain}-seed" / f"{domain}.domain").write_text("", encoding="utf-8")
+    seed.index.add([f"{domain}.domain"])
+    seed.index.commit("Seed zone file")
+    seed.git.push("origin", "HEAD:main")
+    return remote
+
+
+def test_parse_shards():
+    """
+    arrange: do nothing.
+    act: parse shards configurations.
+    assert: every domain maps to the repository of its shard, and malformed configurations
+        are refused.
+    """
+    assert dns.parse_shards(
+        "example.com, Example.org=git+ssh://user@git.server/repo@a;\n"
+        "example.net=git+ssh://user@git.server/other\n"
+    ) == {
+        "example.com": "git+ssh://user@git.server/repo@a",
+        "example.org": "git+ssh://user@git.server/repo@a",
+        "example.net": "git+ssh://user@git.server/other",
+    }
+    assert not dns.parse_shards("")
+    with pytest.raises(ValueError):
+        dns.parse_shards("example.com")
+    with pytest.raises(ValueError):
+        dns.parse_shards("example.com=git+ssh://user@a/repo;example.com=git+ssh://user@b/repo")
+
+
+def test_sharded_records(tmp_path: Path, remote_repository: Path):
+    """
+    arrange: point the provider to a local remote repository, holding example.org in a shard.
+    act: write records of both domains at once, then remove them without blocking the event
+        loop.
+    assert: each record is committed to the repository of its domain, and the database
+        connection of every thread applying the changes of a shard is closed.
+    """
+    shard = _create_shard_repository(tmp_path, "example.org")
+    changes = [
+        RecordChange("site.example.com", "token1", "Add"),
+        RecordChange("site.example.org", "token2", "Add"),
+    ]
+    with (
+        patch("api.dns.GIT_REPO_URL", f"file://{remote_repository}"),
+        patch("api.dns.DNS_SHARDS", f"example.org=file://{shard}"),
+        patch("api.dns.connection") as connection_patch,
+    ):
+        dns.apply_record_changes(changes)
+        written = Repo(remote_repository).head.commit
+        shard_written = Repo(shard).head.commit
+        asyncio.run(
+            dns.aapply_record_changes(
+                [
+                    RecordChange("site.example.com", "token1", "Remove"),
+                    RecordChange("site.example.org", "token2", "Remove"),
+                ]
+            )
+        )
+
+    assert written.message == "Add site.example.com record\n"
+    assert "token1" in written.tree["example.com.domain"].data_stream.read().decode("utf-8")
+    assert shard_written.message == "Add site.example.org record\n"
+    assert shard_written.tree["example.org.domain"].data_stream.read().decode("utf-8") == (
+        "site 600 IN TXT \042token2\042\n"
+    )
+    assert Repo(remote_repository).head.commit.message == "Remove site.example.com record\n"
+    assert not Repo(shard).head.commit.tree["example.org.domain"].data_stream.read()
+    assert all(change.done and change.error is None for change in changes)
+    assert connection_patch.close.call_count == 4
+
+
+def test_sharded_records_error(tmp_path: Path, remote_repository: Path):
+    """
+    arrange: point the provider to a local remote repository, holding example.org in a shard
+        lacking the zone file of example.net.
+    act: write records of the three domains at once.
+    assert: an error is raised for the missing zone file only, the others being committed.
+    """
+    shard = _create_shard_repository(tmp_path, "example.org")
+    changes = [
+        RecordChange("site.example.com", "token1", "Add"),
+        RecordChange("site.example.org", "token2", "Add"),
+        RecordChange("site.example.net", "token3", "Add"),
+    ]
+    with (
+        patch("api.dns.GIT_REPO_URL", f"file://{remote_repository}"),
+        patch("api.dns.DNS_SHARDS", f"example.org,example.net=file://{shard}"),
+        pytest.raises(DnsSourceUpdateError),
+    ):
+        dns.apply_record_changes(changes)
+
+    assert [change.error is None for change in changes] == [True, True, False]
+    assert Repo(shard).head.commit.message == "Add site.example.org record\n"
+
+
+@pytest.mark.parametrize(
+    "backend,repo_url,interval,git_writer,expected",
+    [
+        pytest.param("git", "git+ssh://user@git.server/repo_name@main", 60, "worktree", True),
+        pytest.param("git", "git+ssh://user@git.server/repo_name@main", 60, "objectdb", False),
+        pytest.param("git", "git+ssh://user@git.server/repo_name@main", 0, "worktree", None),
+        pytest.param("git", "", 60, "worktree", None),
+        pytest.param("local", "git+ssh://user@git.server/repo_name@main", 60, "worktree", None),
+    ],
+)
+def test_start_mirror_warmer(
+    backend: str, repo_url: str, interval: float, git_writer: str, expected: bool | None
+):
+    """
+    arrange: configure the backend, the repository, the refresh interval and the git writer.
+    act: start the mirror warmer.
+    assert: the mirror of the configured repository is warmed, checking the working tree out
+        for the working tree writer only, unless the background refresh does not apply.
+    """
+    with (
+        patch("api.dns.DNS_BACKEND", backend),
+        patch("api.dns.GIT_REPO_URL", repo_url),
+        patch("api.dns.GIT_MIRROR_REFRESH_INTERVAL", interval),
+        patch("api.dns.DNS_GIT_WRITER", git_writer),
+        patch("api.dns.get_mirror") as mirror_patch,
+    ):
+        dns.start_mirror_warmer()
+
+    if expected is None:
+        mirror_patch.assert_not_called()
+    else:
+        mirror_patch.assert_called_once_with("user", "git+ssh://user@git.server/repo_name", "main")
+        mirror_patch.return_value.start_warmer.assert_called_once_with(60, checkout=expected)
+
+
+@pytest.mark.parametrize(
+    "backend,repo_url,interval,expected",
+    [
+        pytest.param("git", "git+ssh://user@git.server/repo_name@main", 3600, True),
+        pytest.param("git", "git+ssh://user@git.server/repo_name@main", 0, False),
+        pytest.param("git", "", 3600, False),
+        pytest.param("local", "git+ssh://user@git.server/repo_name@main", 3600, False),
+    ],
+)
+def test_start_mirror_maintenance(backend: str, repo_url: str, interval: float, expected: bool):
+    """
+    arrange: configure the backend, the repository and the maintenance interval.
+    act: start the mirror maintenance.
+    assert: the mirror of the configured repository is maintained, unless the background
+        maintenance does not apply.
+    """
+    with (
+        patch("api.dns.DNS_BACKEND", backend),
+        patch("api.dns.GIT_REPO_URL", repo_url),
+        patch("api.dns.GIT_MIRROR_MAINTENANCE_INTERVAL", interval),
+        patch("api.dns.get_mirror") as mirror_patch,
+    ):
+        dns.start_mirror_maintenance()
+
+    if expected:
+        mirror_patch.assert_called_once_with("user", "git+ssh://user@git.server/repo_name", "main")
+        mirror_patch.return_value.start_maintenance.assert_called_once_with(3600)
+    else:
+        mirror_patch.assert_not_called()
+
+
+def test_start_mirror_warmer_shards():
+    """
+    arrange: configure a repository and two shards sharing another repository.
+    act: start the mirror warmer and maintenance.
+    assert: the mirrors of both repositories are warmed and maintained.
+    """
+    with (
+        patch("api.dns.GIT_REPO_URL", "git+ssh://user@git.server/repo_name@main"),
+        patch(
+            "api.dns.DNS_SHARDS",
+            "example.org=git+ssh://user@git.server/repo_name@org;"
+            "example.net=git+ssh://user@git.server/repo_name@org",
+        ),
+        patch("api.dns.get_mirror") as mirror_patch,
+    ):
+        dns.start_mirror_warmer()
+        dns.start_mirror_maintenance()
+
+    assert [call.args for call in mirror_patch.call_args_list] == [
+        ("user", "git+ssh://user@git.server/repo_name", branch)
+        for branch in ("main", "org", "main", "org")
+    ]
+    assert mirror_patch.return_value.start_warmer.call_count == 2
+    assert mirror_patch.return_value.start_maintenance.call_count == 2
+
+
+def _submit_concurrently(writer: RecordWriter, changes: list[RecordChange]) -> dict:
+    """Submit each change from its own thread and wait for all of them.
+
+    Args:
+        writer: the writer to submit the changes to.
+        changes: the changes to submit.
+
+    Returns:
+        the error raised for each FQDN, or None if its change succeeded.
+    """
+    errors: dict = {}
+
+    def submit(change: RecordChange) -> None:
+        """Submit a change and record its outcome.
+
+        Args:
+            change: the change to submit.
+        """
+        try:
+            writer.submit([change])
+            errors[change.fqdn] = None
+        except DnsSourceUpdateError as exc:
+            errors[change.fqdn] = exc
+
+    threads = [threading.Thread(target=submit, args=(change,)) for change in changes]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return errors
+
+
+def test_record_writer_groups_concurrent_changes(remote_repository: Path):
+    """
+    arrange: create a writer with a batching window for a local remote repository.
+    act: submit changes for several FQDNs concurrently, one of them for an unknown domain.
+    assert: the valid changes are pushed in a single commit and only the invalid one fails.
+    """
+    remote = Repo(remote_repository)
+    initial_commits = len(list(remote.iter_commits()))
+    writer = RecordWriter(
+        GitRecordBackend(get_mirror("user", f"file://{remote_repository}", None)), 0.2
+    )
+    changes = [RecordChange(f"site{i}.example.com", f"token{i}", "Add") for i in range(3)]
+    changes.append(RecordChange("site.unknown.com", "token", "Add"))
+
+    errors = _submit_concurrently(writer, changes)
+
+    assert [fqdn for fqdn, error in errors.items() if error] == ["site.unknown.com"]
+    assert len(list(remote.iter_commits())) == initial_commits + 1
+    content = remote.head.commit.tree["example.com.domain"].data_stream.read().decode("utf-8")
+    for i in range(3):
+        assert f"site{i} 600 IN TXT \042token{i}\042\n" in content
+
+
+@patch.object(Repo, "clone_from")
+def test_record_writer_push_failure_fails_all_changes(repo_patch: Mock):
+    """
+    arrange: mock the repo so that the push fails.
+    act: submit changes for several FQDNs concurrently.
+    assert: every change fails with a DnsSourceUpdateError.
+    """
+    repo_mock = MagicMock(spec=Repo)
+    repo_mock.working_tree_dir = "/nonexistent"
+    repo_mock.remote(name="origin").push.side_effect = GitCommandError("push")
+    repo_patch.return_value = repo_mock
+    writer = RecordWriter(
+        GitRecordBackend(get_mirror("user", "git+ssh://user@git.server/repo_name", None)), 0.1
+    )
+    changes = [RecordChange(f"site{i}.example.com", "token", "Add") for i in range(3)]
+
+    with patch("api.dns._write_record_file", return_value=True):
+        errors = _submit_concurrently(writer, changes)
+
+    assert all(isinstance(error, DnsSourceUpdateError) for error in errors.values())
+
+
+@patch("api.dns.DNS_PUSH_BACKOFF", 0)
+def test_record_writer_retries_rejected_push(tmp_path: Path, remote_repository: Path):
+    """
+    arrange: create a writer for a local remote repository and make another writer push a
+        conflicting commit right before the writer's first push.
+    act: submit a change.
+    assert: the change is applied on top of the other writer's commit and pushed.
+    """
+    writer = RecordWriter(
+        GitRecordBackend(get_mirror("user", f"file://{remote_repository}", None)), 0
+    )
+    competitor = Repo.clone_from(f"file://{remote_repository}", tmp_path / "competitor")
+    write_record_file = dns._write_record_file
+    competitor_pushed: list[bool] = []
+
+    def write_after_competitor(repo, filename, changes):
+        """Let the competing writer push first, then edit the zone file.
+
+        Args:
+            repo: the repository to update.
+            filename: the relative filename of the DNS record file.
+            changes: the changes to the records of the file.
+
+        Returns:
+            whether the file has been updated.
+        """
+        if not competitor_pushed:
+            competitor_pushed.append(True)
+            write_record_file(
+                competitor,
+                filename,
+                [RecordChange("other.example.com", "other", "Add")],
+            )
+            competitor.index.add([filename])
+            competitor.index.commit("Add other.example.com record")
+            competitor.git.push("origin", "HEAD")
+        return write_record_file(repo, filename, changes)
+
+    with patch("api.dns._write_record_file", side_effect=write_after_competitor) as write_patch:
+        writer.submit([RecordChange("site.example.com", "token", "Add")])
+
+    assert write_patch.call_count == 2
+    remote = Repo(remote_repository)
+    content = remote.head.commit.tree["example.com.domain"].data_stream.read().decode("utf-8")
+    assert "other 600 IN TXT \042other\042\n" in content
+    assert "site 600 IN TXT \042token\042\n" in content
+
+
+@patch("api.dns.DNS_GIT_WRITER", "objectdb")
+def test_object_database_writer_retries_rejected_push(tmp_path: Path, remote_repository: Path):
+    """
+    arrange: select the object database writer for a local remote repository and make another
+        writer push a conflicting commit right before the writer's first commit is stored.
+    act: submit a change.
+    assert: the rejected push is retried with the change applied on top of the other writer's
+        commit.
+    """
+    writer = RecordWriter(
+        GitRecordBackend(get_mirror("user", f"file://{remote_repository}", None)), 0
+    )
+    competitor = Repo.clone_from(f"file://{remote_repository}", tmp_path / "competitor")
+    store_tree_and_commit = dns.store_tree_and_commit
+    competitor_pushed: list[bool] = []
+
+    def store_after_competitor(*args):
+        """Let the competing writer push first, then store the commit.
+
+        Args:
+            args: the arguments of the commit storage.
+
+        Returns:
+            the binary SHA of the stored commit.
+        """
+        if not competitor_pushed:
+            competitor_pushed.append(True)
+            dns._write_record_file(
+                competitor,
+                "example.com.domain",
+                [RecordChange("other.example.com", "other", "Add")],
+            )
+            competitor.index.add(["example.com.domain"])
+            competitor.index.commit("Add other.example.com record")
+            competitor.git.push("origin", "HEAD")
+        return store_tree_and_commit(*args)
+
+    with patch("api.dns.store_tree_and_commit", side_effect=store_after_competitor) as store_patch:
+        writer.submit([RecordChange("site.example.com", "token", "Add")])
+
+    assert store_patch.call_count == 2
+    remote = Repo(remote_repository)
+    assert remote.head.commit.parents[0].message == "Add other.example.com record"
+    content = remote.head.commit.tree["example.com.domain"].data_stream.read().decode("utf-8")
+    assert "other 600 IN TXT \042other\042\n" in content
+    assert "site 600 IN TXT \042token\042\n" in content
+
+
+@patch("api.dns.DNS_PUSH_BACKOFF", 0)
+@patch("api.dns.DNS_PUSH_RETRIES", 2)
+@patch.object(Repo, "clone_from")
+def test_record_writer_gives_up_after_retries(repo_patch: Mock):
+    """
+    arrange: mock the repo so that every push is rejected by the remote.
+    act: submit a change.
+    assert: a DnsSourceUpdateError is raised once the retries are exhausted.
+    """
+    repo_mock = MagicMock(spec=Repo)
+    rejected = MagicMock(spec=PushInfo, flags=PushInfo.REJECTED | PushInfo.ERROR)
+    repo_mock.remote(name="origin").push.return_value = [rejected]
+    repo_patch.return_value = repo_mock
+    writer = RecordWriter(
+        GitRecordBackend(get_mirror("user", "git+ssh://user@git.server/repo_name", None)), 0
+    )
+
+    with (
+        patch("api.dns._write_record_file", return_value=True),
+        pytest.raises(DnsSourceUpdateError, match="after 2 retries"),
+    ):
+        writer.submit([RecordChange("site.example.com", "token", "Add")])
+
+    assert repo_mock.remote(name="origin").push.call_count == 3
+
+
+@patch("api.dns.DNS_GIT_WRITER", "objectdb")
+def test_object_database_writer(remote_repository: Path):
+    """
+    arrange: select the object database writer and apply a first change through it.
+    act: submit changes for two FQDNs, one of them for an unknown domain.
+    assert: the valid change is pushed on top of the remote tip, spawning git only to fetch
+        and push, and the invalid one fails.
+    """
+    remote = Repo(remote_repository)
+    writer = RecordWriter(
+        GitRecordBackend(get_mirror("user", f"file://{remote_repository}", None)), 0
+    )
+    writer.submit([RecordChange("other.example.com", "other", "Add")])
+    parent = remote.head.commit
+    changes = [
+        RecordChange("site.example.com", "token", "Add"),
+        RecordChange("site.unknown.com", "token", "Add"),
+    ]
+
+    with (
+        patch.object(Git, "execute", autospec=True, side_effect=Git.execute) as execute_patch,
+        pytest.raises(DnsSourceUpdateError, match="unknown.com.domain file not found"),
+    ):
+        writer.submit(changes)
+
+    assert [call.args[1][1] for call in execute_patch.call_args_list] == ["fetch", "push"]
+    assert remote.head.commit.parents == (parent,)
+    assert remote.head.commit.message == "Add site.example.com record\n"
+    content = remote.head.commit.tree["example.com.domain"].data_stream.read().decode("utf-8")
+    assert content == (
+        "site1 600 IN TXT \042sometoken\042\n"
+        "other 600 IN TXT \042other\042\n"
+        "site 600 IN TXT \042token\042\n"
+    )
+    assert changes[0].error is None
+
+
+def test_local_backend_dns_records(tmp_path: Path):
+    """
+    arrange: select the local backend on a directory holding a read-only example.com zone file.
+    act: write and then remove DNS records.
+    assert: the zone file is rewritten in place, keeping its mode and leaving no temporary file.
+    """
+    zone_file = tmp_path / "example.com.domain"
+    zone_file.write_text("site1 600 IN TXT \042sometoken\042\n", encoding="utf-8")
+    zone_file.chmod(0o644)
+    with (
+        patch("api.dns.DNS_BACKEND", "local"),
+        patch("api.dns.DNS_ZONE_DIR", str(tmp_path)),
+        patch.object(Repo, "clone_from") as clone_patch,
+    ):
+        write_dns_record("site.example.com", "token")
+        write_dns_record("other.example.com", "other")
+        remove_dns_record("site.example.com")
+
+    clone_patch.assert_not_called()
+    assert zone_file.read_text(encoding="utf-8") == (
+        "site1 600 IN TXT \042sometoken\042\nother 600 IN TXT \042other\042\n"
+    )
+    assert zone_file.stat().st_mode & 0o777 == 0o644
+    assert [path.name for path in tmp_path.iterdir()] == ["example.com.domain"]
+
+
+def test_local_backend_applies_batch(tmp_path: Path):
+    """
+    arrange: create a local backend on a directory holding an example.com zone file.
+    act: apply changes for two FQDNs of the zone and one of an unknown domain.
+    assert: the zone file is rewritten with both changes and the unknown domain fails alone.
+    """
+    (tmp_path / "example.com.domain").write_text(
+        "site1 600 IN TXT \042sometoken\042\n", encoding="utf-8"
+    )
+    changes = [
+        RecordChange("site.example.com", "token", "Add"),
+        RecordChange("site1.example.com", None, "Remove"),
+        RecordChange("site.unknown.com", "token", "Add"),
+    ]
+
+    LocalRecordBackend(tmp_path).apply(changes)
+
+    assert (tmp_path / "example.com.domain").read_text(encoding="utf-8") == (
+        "site 600 IN TXT \042token\042\n"
+    )
+    assert changes[0].error is None
+    assert changes[1].error is None
+    assert "unknown.com.domain file not found" in str(changes[2].error)
+
+
+def test_record_writer_groups_async_submissions(tmp_path: Path):
+    """
+    arrange: create a writer with a batching window for a local zone directory.
+    act: submit changes for several FQDNs concurrently from one event loop, one of them for an
+        unknown domain.
+    assert: the changes are applied in a single batch and only the invalid one fails.
+    """
+    (tmp_path / "example.com.domain").write_text("", encoding="utf-8")
+    backend = LocalRecordBackend(tmp_path)
+    batches = []
+
+    def apply(changes: list[RecordChange]) -> None:
+        """Record the applied batch before applying it.
+
+        Args:
+            changes: the changes to apply.
+        """
+        batches.append(len(changes))
+        LocalRecordBackend.apply(backend, changes)
+
+    writer = RecordWriter(backend, 0.2)
+    changes = [RecordChange(f"site{i}.example.com", f"token{i}", "Add") for i in range(10)]
+    changes.append(RecordChange("site.unknown.com", "token", "Add"))
+
+    async def submit_all() -> list:
+        """Submit each change from its own task.
+
+        Returns:
+            the outcome of each submission.
+        """
+        return await asyncio.gather(
+            *(writer.asubmit([change]) for change in changes), return_exceptions=True
+        )
+
+    with patch.object(backend, "apply", side_effect=apply):
+        outcomes = asyncio.run(submit_all())
+
+    assert batches == [len(changes)]
+    assert outcomes[:-1] == [None] * 10
+    assert isinstance(outcomes[-1], DnsSourceUpdateError)
+    content = (tmp_path / "example.com.domain").read_text(encoding="utf-8")
+    for i in range(10):
+        assert f"site{i} 600 IN TXT \042token{i}\042\n" in content
+
+
+def test_record_writer_async_leader_closes_connection(tmp_path: Path):
+    """
+    arrange: create a writer for a local zone directory.
+    act: submit a change from an event loop.
+    assert: the change is applied and the database connection of the executor thread applying
+        it is closed.
+    """
+    (tmp_path / "example.com.domain").write_text("", encoding="utf-8")
+    writer = RecordWriter(LocalRecordBackend(tmp_path), 0)
+
+    with patch("api.dns.connection") as connection_patch:
+        asyncio.run(writer.asubmit([RecordChange("site.example.com", "token", "Add")]))
+
+    connection_patch.close.assert_called_once_with()
+    assert (tmp_path / "example.com.domain").read_text(encoding="utf-8") == (
+        "site 600 IN TXT \042token\042\n"
+    )
+
+
+def test_record_writer_async_leader_keeps_context(tmp_path: Path):
+    """
+    arrange: create a writer for a local zone directory and set a context variable.
+    act: submit a change from an event loop.
+    assert: the backend applies the change in the context of the submitter.
+    """
+    request_id: contextvars.ContextVar[str] = contextvars.ContextVar("request_id")
+    backend = LocalRecordBackend(tmp_path)
+    writer = RecordWriter(backend, 0)
+    seen = []
+
+    async def submit():
+        """Submit a change in the context of a request."""
+        request_id.set("request")
+        await writer.asubmit([RecordChange("site.example.com", "token", "Add")])
+
+    with patch.object(backend, "apply", side_effect=lambda _: seen.append(request_id.get(None))):
+        asyncio.run(submit())
+
+    assert seen == ["request"]
+
+
+def test_record_writer_coalesces_changes(remote_repository: Path):
+    """
+    arrange: create a writer for a local remote repository.
+    act: submit a present cancelled by a cleanup of its value, then two presents for the
+        same FQDN along with the first one again, then the last one again.
+    assert: both values are pushed, in a single commit, and every change succeeds.
+    """
+    remote = Repo(remote_repository)
+    initial_commits = len(list(remote.iter_commits()))
+    writer = RecordWriter(
+        GitRecordBackend(get_mirror("user", f"file://{remote_repository}", None)), 0
+    )
+
+    writer.submit(
+        [
+            RecordChange("site.example.com", "token", "Add"),
+            RecordChange("site.example.com", "token", "Remove"),
+        ]
+    )
+    assert len(list(remote.iter_commits())) == initial_commits
+
+    writer.submit(
+        [
+            RecordChange("site.example.com", "token", "Add"),
+            RecordChange("site.example.com", "other", "Add"),
+            RecordChange("site.example.com", "token", "Add"),
+        ]
+    )
+    writer.submit([RecordChange("site.example.com", "other", "Add")])
+
+    assert len(list(remote.iter_commits())) == initial_commits + 1
+    assert str(remote.head.commit.message).startswith("Update 2 records\n")
+    content = remote.head.commit.tree["example.com.domain"].data_stream.read().decode("utf-8")
+    assert content == (
+        "site1 600 IN TXT \042sometoken\042\n"
+        "site 600 IN TXT \042other\042\n"
+        "site 600 IN TXT \042token\042\n"
+    )
+
+
+def test_record_writer_follows_in_flight_change():
+    """
+    arrange: create a writer whose backend blocks while applying a change.
+    act: submit a change, then an identical one while the first one is being applied.
+    assert: the change is applied once and both submitters get its outcome.
+    """
+    applying = threading.Event()
+    release = threading.Event()
+    batches = []
+
+    def apply(changes: list[RecordChange]) -> None:
+        """Record the applied batch and wait to be released.
+
+        Args:
+            changes: the changes to apply.
+        """
+        batches.append([(change.fqdn, change.value) for change in changes])
+        applying.set()
+        release.wait(5)
+
+    backend = MagicMock(spec=LocalRecordBackend)
+    backend.apply.side_effect = apply
+    writer = RecordWriter(backend, 0)
+    first = threading.Thread(
+        target=writer.submit, args=([RecordChange("site.example.com", "token", "Add")],)
+    )
+    first.start()
+    assert applying.wait(5)
+    second = threading.Thread(
+        target=writer.submit, args=([RecordChange("site.example.com", "token", "Add")],)
+    )
+    second.start()
+    release.set()
+    first.join(5)
+    second.join(5)
+
+    assert not first.is_alive() and not second.is_alive()
+    assert batches == [[("site.example.com", "token")]]
+
+
+def test_local_backend_skips_unchanged_files(tmp_path: Path):
+    """
+    arrange: create a local backend on a directory holding an example.com zone file.
+    act: apply a change the zone file already reflects.
+    assert: the zone file is not rewritten.
+    """
+    zone_file = tmp_path / "example.com.domain"
+    zone_file.write_text("site1 600 IN TXT \042sometoken\042\n", encoding="utf-8")
+    inode = zone_file.stat().st_ino
+    changes = [RecordChange("site1.example.com", "sometoken", "Add")]
+
+    LocalRecordBackend(tmp_path).apply(changes)
+
+    assert zone_file.stat().st_ino == inode
+    assert [path.name for path in tmp_path.iterdir()] == ["example.com.domain"]
+    assert changes[0].error is None
+
+
+def test_local_backend_multiple_values(tmp_path: Path):
+    """
+    arrange: select the local backend on a directory holding an example.com zone file.
+    act: present two challenges for the same FQDN, as for a domain and its wildcard, then
+        clean the first one up.
+    assert: both records are written and the cleanup only removes its own value.
+    """
+    zone_file = tmp_path / "example.com.domain"
+    zone_file.write_text("site1 600 IN TXT \042sometoken\042\n", encoding="utf-8")
+    with (
+        patch("api.dns.DNS_BACKEND", "local"),
+        patch("api.dns.DNS_ZONE_DIR", str(tmp_path)),
+    ):
+        write_dns_record("_acme-challenge.example.com", "apex")
+        write_dns_record("_acme-challenge.example.com", "wildcard")
+        written = zone_file.read_text(encoding="utf-8")
+        remove_dns_record("_acme-challenge.example.com", "apex")
+
+    assert written == (
+        "site1 600 IN TXT \042sometoken\042\n"
+        "_acme-challenge 600 IN TXT \042apex\042\n"
+        "_acme-challenge 600 IN TXT \042wildcard\042\n"
+    )
+    assert zone_file.read_text(encoding="utf-8") == (
+        "site1 600 IN TXT \042sometoken\042\n_acme-challenge 600 IN TXT \042wildcard\042\n"
+    )
+
+
+@pytest.mark.parametrize("git_writer", ["worktree", "objectdb"])
+def test_zone_index_cached_between_writes(
+    tmp_path: Path, remote_repository: Path, git_writer: str
+):
+    """
+    arrange: select a git writer and write a first DNS record through it.
+    act: write a second record, then a third one after another writer pushed to the zone file.
+    assert: the zone file is only parsed again once its content changed on the remote, and
+        the records of all the writes are pushed.
+    """
+    remote = Repo(remote_repository)
+    writer = RecordWriter(
+        GitRecordBackend(get_mirror("user", f"file://{remote_repository}", None)), 0
+    )
+    with patch("api.dns.DNS_GIT_WRITER", git_writer):
+        writer.submit([RecordChange("site.example.com", "token", "Add")])
+
+        with patch("api.zones.ZoneIndex", wraps=ZoneIndex) as index_patch:
+            writer.submit([RecordChange("other.example.com", "other", "Add")])
+            index_patch.assert_not_called()
+
+            competitor = Repo.clone_from(f"file://{remote_repository}", tmp_path / "competitor")
+            with (tmp_path / "competitor" / "example.com.domain").open(
+                "a", encoding="utf-8"
+            ) as zone_file:
+                zone_file.write("manual 600 IN TXT \042manual\042\n")
+            competitor.index.add(["example.com.domain"])
+            competitor.index.commit("Add manual.example.com record")
+            competitor.git.push("origin", "HEAD")
+            writer.submit([RecordChange("last.example.com", "last", "Add")])
+            index_patch.assert_called_once()
+
+    content = remote.head.commit.tree["example.com.domain"].data_stream.read().decode("utf-8")
+    assert content == (
+        "site1 600 IN TXT \042sometoken\042\n"
+        "site 600 IN TXT \042token\042\n"
+        "other 600 IN TXT \042other\042\n"
+        "manual 600 IN TXT \042manual\042\n"
+        "last 600 IN TXT \042last\042\n"
+    )
@@ -0,0 +1,101 @@
+# Copyright 2025 Canonical Ltd.
+# See LICENSE file for licensing details.
+"""Unit tests for the locks module."""
+
+import threading
+import time
+from unittest.mock import MagicMock, call, patch
+
+from api.dns import GitRecordBackend, RecordChange, RecordWriter
+from api.locks import lock_key, zone_file_locks
+from api.mirror import get_mirror
+
+
+def test_lock_key_is_signed_64_bit():
+    """
+    arrange: do nothing.
+    act: compute the lock keys for zone files in two repositories.
+    assert: keys are stable, fit a PostgreSQL bigint and differ across repositories.
+    """
+    key = lock_key("git+ssh://user@git.server/repo_name@", "example.com.domain")
+
+    assert key == lock_key("git+ssh://user@git.server/repo_name@", "example.com.domain")
+    assert -(2**63) <= key < 2**63
+    assert key != lock_key("git+ssh://user@git.server/other@", "example.com.domain")
+
+
+def test_zone_file_locks_use_postgresql_advisory_locks():
+    """
+    arrange: mock a PostgreSQL database connection.
+    act: hold the locks for two zone files, one of them given twice.
+    assert: one advisory lock per zone file is acquired in key order and released in reverse.
+    """
+    connection_mock = MagicMock(vendor="postgresql")
+    cursor = connection_mock.cursor.return_value.__enter__.return_value
+    keys = sorted(lock_key("repo", filename) for filename in ("a.domain", "b.domain"))
+
+    with patch("api.locks.connection", connection_mock):
+        with zone_file_locks("repo", ["b.domain", "a.domain", "b.domain"]):
+            assert cursor.execute.call_args_list == [
+                call("SELECT pg_advisory_lock(%s)", [keys[0]]),
+                call("SELECT pg_advisory_lock(%s)", [keys[1]]),
+            ]
+
+    assert cursor.execute.call_args_list[2:] == [
+        call("SELECT pg_advisory_unlock(%s)", [keys[1]]),
+        call("SELECT pg_advisory_unlock(%s)", [keys[0]]),
+    ]
+
+
+def test_zone_file_locks_serialize_same_file():
+    """
+    arrange: hold the lock for a zone file.
+    act: try to lock the same zone file and another one from other threads.
+    assert: only the other zone file can be locked until the first lock is released.
+    """
+    entered = []
+
+    def lock(filename: str) -> None:
+        """Lock a zone file and record it.
+
+        Args:
+            filename: the zone file to lock.
+        """
+        with zone_file_locks("repo", [filename]):
+            entered.append(filename)
+
+    with zone_file_locks("repo", ["a.domain"]):
+        same = threading.Thread(target=lock, args=("a.domain",))
+        other = threading.Thread(target=lock, args=("b.domain",))
+        same.start()
+        other.start()
+        other.join()
+        time.sleep(0.1)
+        assert entered == ["b.domain"]
+    same.join()
+
+    assert entered == ["b.domain", "a.domain"]
+
+
+@patch("api.dns._write_record_file", return_value=True)
+@patch("api.dns.zone_file_locks")
+def test_record_writer_locks_zone_files(locks_patch: MagicMock, _):
+    """
+    arrange: mock the repository mirror and the zone file locks.
+    act: submit changes for FQDNs in two domains.
+    assert: the zone files of both domains are locked for the update.
+    """
+    mirror = get_mirror("user", "git+ssh://user@git.server/repo_name", "main")
+    mirror.sync = MagicMock()
+    writer = RecordWriter(GitRecordBackend(mirror), 0)
+
+    writer.submit(
+        [
+            RecordChange("site.example.com", "token", "Add"),
+            RecordChange("site.example.org", "token", "Add"),
+        ]
+    )
+
+    locks_patch.assert_called_once_with(
+        "git+ssh://user@git.server/repo_name@main", ["example.com.domain", "example.org.domain"]
+    )
@@ -0,0 +1,297 @@
+# Copyright 2025 Canonical Ltd.
+# See LICENSE file for licensing details.
+"""Unit tests for the mirror module."""
+
+import shutil
+import time
+from pathlib import Path
+from unittest.mock import MagicMock, Mock, patch
+
+import pytest
+from api import mirror as mirror_module
+from api.mirror import get_mirror
+from git import GitCommandError, Repo
+
+
+def _push_to_remote(tmp_path: Path, remote: Path, content: str) -> str:
+    """Commit a new version of the example.com zone file to the remote repository.
+
+    Args:
+        tmp_path: temporary directory for the intermediate clone.
+        remote: the remote repository.
+        content: the new zone file content.
+
+    Returns:
+        the hexsha of the pushed commit.
+    """
+    clone_dir = tmp_path / "writer"
+    shutil.rmtree(clone_dir, ignore_errors=True)
+    writer = Repo.clone_from(f"file://{remote}", clone_dir)
+    (clone_dir / "example.com.domain").write_text(content, encoding="utf-8")
+    writer.index.add(["example.com.domain"])
+    commit = writer.index.commit("Update zone file")
+    writer.git.push("origin", "HEAD:main")
+    return commit.hexsha
+
+
+@patch.object(Repo, "clone_from")
+def test_sync_reuses_working_copy(clone_patch: Mock):
+    """
+    arrange: mock the repository clone.
+    act: sync the same mirror twice.
+    assert: the repository is cloned once and refreshed with a shallow fetch afterwards.
+    """
+    repo_mock = MagicMock(spec=Repo)
+    clone_patch.return_value = repo_mock
+    mirror = get_mirror("user", "git+ssh://user@git.server/repo_name", "main")
+
+    assert mirror.sync() is repo_mock
+    assert mirror.sync() is repo_mock
+
+    clone_patch.assert_called_once()
+    repo_mock.git.fetch.assert_called_once_with("--depth=1", "origin", "main")
+    repo_mock.git.reset.assert_called_with("--hard", "FETCH_HEAD")
+    assert repo_mock.git.reset.call_count == 2
+
+
+def test_get_mirror_returns_same_instance():
+    """
+    arrange: do nothing.
+    act: get the mirror for the same repository and branch twice, and for another branch.
+    assert: the same branch shares one mirror and the other branch gets its own.
+    """
+    mirror = get_mirror("user", "git+ssh://user@git.server/repo_name", "main")
+
+    assert get_mirror("user", "git+ssh://user@git.server/repo_name", "main") is mirror
+    assert get_mirror("user", "git+ssh://user@git.server/repo_name", "other") is not mirror
+
+
+def test_sync_fetches_remote_changes(tmp_path: Path, remote_repository: Path):
+    """
+    arrange: sync a mirror of the remote and push a new commit to the remote afterwards.
+    act: sync the mirror again.
+    assert: the working copy matches the new remote tip.
+    """
+    mirror = get_mirror("user", f"file://{remote_repository}", "main")
+    mirror.sync()
+    tip = _push_to_remote(tmp_path, remote_repository, "site2 600 IN TXT \042new\042\n")
+
+    repo = mirror.sync(filenames=["example.com.domain"])
+
+    assert repo.head.commit.hexsha == tip
+    assert (mirror.path / "example.com.domain").read_text(encoding="utf-8") == (
+        "site2 600 IN TXT \042new\042\n"
+    )
+
+
+def test_sync_discards_diverged_changes(remote_repository: Path):
+    """
+    arrange: sync a mirror of the remote and leave an unpushed commit and stray files in it.
+    act: sync the mirror again.
+    assert: the working copy matches the remote tip again.
+    """
+    mirror = get_mirror("user", f"file://{remote_repository}", "main")
+    repo = mirror.sync()
+    remote_tip = repo.head.commit.hexsha
+    (mirror.path / "example.com.domain").write_text("diverged\n", encoding="utf-8")
+    repo.index.add(["example.com.domain"])
+    repo.index.commit("Unpushed change")
+    (mirror.path / "stray.domain").write_text("stray\n", encoding="utf-8")
+
+    repo = mirror.sync()
+
+    assert repo.head.commit.hexsha == remote_tip
+    assert not (mirror.path / "stray.domain").exists()
+
+
+def test_sync_recovers_from_corrupted_clone(remote_repository: Path):
+    """
+    arrange: sync a mirror of the remote and delete its git metadata.
+    act: sync the mirror again.
+    assert: the mirror is cloned again and matches the remote.
+    """
+    mirror = get_mirror("user", f"file://{remote_repository}", "main")
+    remote_tip = mirror.sync().head.commit.hexsha
+    shutil.rmtree(mirror.path / ".git")
+
+    repo = mirror.sync()
+
+    assert repo.head.commit.hexsha == remote_tip
+    assert repo.config_reader().get_value("user", "name") == "user"
+
+
+@patch.object(Repo, "clone_from")
+def test_sync_reclones_when_refresh_fails(clone_patch: Mock):
+    """
+    arrange: mock the repository clone so that refreshing the first clone fails.
+    act: sync the mirror twice.
+    assert: the repository is cloned again.
+    """
+    broken_repo = MagicMock(spec=Repo)
+    broken_repo.git.fetch.side_effect = GitCommandError("fetch")
+    clone_patch.side_effect = [broken_repo, MagicMock(spec=Repo)]
+    mirror = get_mirror("user", "git+ssh://user@git.server/repo_name", None)
+
+    mirror.sync()
+    mirror.sync()
+
+    assert clone_patch.call_count == 2
+
+
+def test_sync_checks_out_touched_files_only(tmp_path: Path, remote_repository: Path):
+    """
+    arrange: push a second zone file to the remote.
+    act: sync a mirror of the remote for one of the zone files.
+    assert: only that zone file is downloaded and written to the working tree.
+    """
+    _push_to_remote(tmp_path, remote_repository, "site2 600 IN TXT \042new\042\n")
+    writer = Repo(tmp_path / "writer")
+    (tmp_path / "writer" / "example.org.domain").write_text("", encoding="utf-8")
+    writer.index.add(["example.org.domain"])
+    writer.index.commit("Add example.org zone file")
+    writer.git.push("origin", "HEAD:main")
+    mirror = get_mirror("user", f"file://{remote_repository}", "main")
+
+    repo = mirror.sync(filenames=["example.org.domain"])
+
+    assert [path.name for path in mirror.path.iterdir() if path.name != ".git"] == [
+        "example.org.domain"
+    ]
+    missing = repo.git.rev_list("--objects", "--missing=print", "HEAD").splitlines()
+    assert f"?{repo.head.commit.tree['example.com.domain'].hexsha}" in missing
+    assert not repo.git.status("--porcelain")
+
+
+@patch.object(Repo, "clone_from")
+def test_sync_reports_refresh(clone_patch: Mock):
+    """
+    arrange: mock the repository clone and the refresh duration metric.
+    act: sync a mirror.
+    assert: the refresh duration is recorded and the mirror staleness is reported.
+    """
+    clone_patch.return_value = MagicMock(spec=Repo)
+    mirror = get_mirror("user", "git+ssh://user@git.server/repo_name", "main")
+    assert mirror.staleness is None
+
+    with patch.object(mirror_module, "refresh_duration") as duration_patch:
+        mirror.sync()
+
+    attributes = {
+        "git.mirror.url": "git+ssh://user@git.server/repo_name",
+        "git.mirror.branch": "main",
+    }
+    duration_patch.record.assert_called_once_with(mirror.last_refresh_duration, attributes)
+    [observation] = mirror_module._observe_staleness(None)
+    assert 0 <= observation.value <= mirror.staleness
+    assert observation.attributes == attributes
+
+
+def test_warmer_clones_in_background(remote_repository: Path):
+    """
+    arrange: get a mirror of the remote.
+    act: start the mirror warmer.
+    assert: the repository is cloned in the background, so syncing it later only fetches.
+    """
+    mirror = get_mirror("user", f"file://{remote_repository}", "main")
+
+    mirror.start_warmer(3600)
+    deadline = time.monotonic() + 30
+    while mirror.staleness is None and time.monotonic() < deadline:
+        time.sleep(0.05)
+
+    assert mirror.staleness is not None
+    with mirror.lock, patch.object(Repo, "clone_from") as clone_patch:
+        mirror.sync()
+    clone_patch.assert_not_called()
+
+
+@patch.object(mirror_module.subprocess, "run")
+def test_ssh_master_reestablished_when_down(run_patch: Mock):
+    """
+    arrange: mock ssh so that the master connection is first down, then running.
+    act: ensure the master connection is running twice.
+    assert: the stale master is cleaned and established again the first time only.
+    """
+    run_patch.side_effect = [Mock(returncode=code) for code in (255, 255, 0, 0)]
+    master = mirror_module.SshMaster("git+ssh://user@git.server:2222/repo_name", 300)
+
+    assert not master.ensure()
+    assert master.ensure()
+
+    commands = [call.args[0] for call in run_patch.call_args_list]
+    assert [command[-3:] for command in commands] == [
+        ["-O", "check", "user@git.server"],
+        ["-O", "exit", "user@git.server"],
+        ["-f", "-N", "user@git.server"],
+        ["-O", "check", "user@git.server"],
+    ]
+    assert all(["-p", "2222"] == command[-5:-3] for command in commands[:2])
+    assert f"ControlPath={master.control_path}" in commands[0]
+    assert "ControlPersist=300" in master.ssh_command
+
+
+@patch.object(mirror_module.SshMaster, "ensure")
+@patch.object(Repo, "clone_from")
+def test_sync_multiplexes_ssh(
+    clone_patch: Mock, ensure_patch: Mock, monkeypatch: pytest.MonkeyPatch
+):
+    """
+    arrange: enable the SSH connection multiplexing and mock the repository clone.
+    act: sync a mirror of an SSH remote and of a local remote twice.
+    assert: git uses the master connection of the SSH remote, checked before every sync.
+    """
+    monkeypatch.setattr(mirror_module, "GIT_SSH_CONTROL_PERSIST", 300)
+    repo_mock = MagicMock(spec=Repo)
+    clone_patch.return_value = repo_mock
+    mirror = get_mirror("user", "git+ssh://user@git.server/repo_name", "main")
+
+    mirror.sync()
+    mirror.sync()
+
+    ssh_command = clone_patch.call_args.kwargs["env"]["GIT_SSH_COMMAND"]
+    assert "ControlMaster=auto" in ssh_command
+    repo_mock.git.update_environment.assert_called_once_with(GIT_SSH_COMMAND=ssh_command)
+    assert ensure_patch.call_count == 2
+
+    get_mirror("user", "file:///srv/repo_name", "main").sync()
+
+    assert clone_patch.call_args.kwargs["env"] is None
+    assert ensure_patch.call_count == 2
+
+
+def test_maintain_packs_objects(tmp_path: Path, remote_repository: Path):
+    """
+    arrange: sync a mirror of the remote several times and leave an unpushed commit in it.
+    act: maintain the mirror.
+    assert: the objects are packed, the unpushed commit is pruned and the mirror still syncs.
+    """
+    mirror = get_mirror("user", f"file://{remote_repository}", "main")
+    repo = mirror.sync(filenames=["example.com.domain"])
+    for i in range(3):
+        _push_to_remote(tmp_path, remote_repository, f"site{i} 600 IN TXT \042token\042\n")
+        repo = mirror.sync(filenames=["example.com.domain"])
+    (mirror.path / "example.com.domain").write_text("diverged\n", encoding="utf-8")
+    repo.index.add(["example.com.domain"])
+    unpushed = repo.index.commit("Unpushed change").hexsha
+    repo = mirror.sync()
+
+    with mirror.lock, patch.object(mirror_module, "maintenance_duration") as duration_patch:
+        mirror.maintain()
+
+    assert mirror.object_counts["loose"] == 0
+    assert mirror.object_counts["packed"] > 0
+    with pytest.raises(GitCommandError):
+        repo.git.cat_file("-e", unpushed)
+    duration_patch.record.assert_called_once()
+    [observation] = [
+        observation
+        for observation in mirror_module._observe_objects(None)
+        if observation.attributes["git.objects.kind"] == "loose"
+    ]
+    assert observation.value == 0
+    assert repo.config_reader().get_value("gc", "auto") == 0
+    tip = _push_to_remote(tmp_path, remote_repository, "site4 600 IN TXT \042token\042\n")
+    assert mirror.sync(filenames=["example.com.domain"]).head.commit.hexsha == tip
+    assert (mirror.path / "example.com.domain").read_text(encoding="utf-8") == (
+        "site4 600 IN TXT \042token\042\n"
+    )
@@ -0,0 +1,157 @@
+# Copyright 2025 Canonical Ltd.
+# See LICENSE file for licensing details.
+"""Unit tests for the outbox module."""
+
+# imported-auth-user has to be disable as the conflicting import is needed for typing
+# pylint:disable=imported-auth-user
+
+import datetime
+from unittest.mock import patch
+
+import pytest
+from api.dns import DnsSourceUpdateError, RecordChange
+from api.models import OperationStatus, RecordAction, RecordOperation
+from api.outbox import drain_outbox, enqueue, wait_for_operation
+from api.settings import DNS_OUTBOX_CLAIM_TIMEOUT
+from django.contrib.auth.models import User
+from django.db import connection
+from django.utils import timezone
+
+FQDN = "_acme-challenge.example.com"
+
+
+@pytest.mark.django_db
+def test_enqueue_wakes_worker(user: User, django_capture_on_commit_callbacks):
+    """
+    arrange: mock the outbox worker.
+    act: enqueue an operation.
+    assert: the operation is stored as pending and the worker is woken up once it is committed.
+    """
+    with (
+        patch("api.outbox.worker.wake") as wake_patch,
+        django_capture_on_commit_callbacks(execute=True),
+    ):
+        operation = enqueue(user, FQDN, "token", RecordAction.PRESENT)
+
+    assert RecordOperation.objects.get(pk=operation.pk).status == OperationStatus.PENDING
+    wake_patch.assert_called_once_with()
+
+
+@pytest.mark.django_db
+def test_drain_outbox_records_outcomes(user: User):
+    """
+    arrange: store pending present and cleanup operations, and mock the record changes so that
+        the cleanup fails.
+    act: drain the outbox.
+    assert: both operations are applied in one group and get their own outcome.
+    """
+    present = RecordOperation.objects.create(
+        user=user, fqdn=FQDN, value="token", action=RecordAction.PRESENT
+    )
+    cleanup = RecordOperation.objects.create(
+        user=user, fqdn=FQDN, value="token", action=RecordAction.CLEANUP
+    )
+
+    def fail_cleanup(changes: list[RecordChange]) -> None:
+        """Fail the record removals.
+
+        Args:
+            changes: the changes to apply.
+
+        Raises:
+            DnsSourceUpdateError: always.
+        """
+        for change in changes:
+            if not change.add:
+                change.error = DnsSourceUpdateError("push failed")
+        raise DnsSourceUpdateError("push failed")
+
+    with patch("api.outbox.apply_record_changes", side_effect=fail_cleanup) as apply_patch:
+        assert drain_outbox() == 2
+        assert drain_outbox() == 0
+
+    apply_patch.assert_called_once()
+    [changes] = apply_patch.call_args.args
+    assert [(change.fqdn, change.value, change.add) for change in changes] == [
+        (FQDN, "token", True),
+        (FQDN, "token", False),
+    ]
+    present.refresh_from_db()
+    cleanup.refresh_from_db()
+    assert (present.status, present.error) == (OperationStatus.DONE, None)
+    assert (cleanup.status, cleanup.error) == (OperationStatus.FAILED, "push failed")
+
+
+@pytest.mark.django_db
+def test_drain_outbox_applies_outside_transaction(user: User):
+    """
+    arrange: store a pending operation.
+    act: drain the outbox.
+    assert: the operation is claimed as in progress before its change is applied, outside of
+        the transaction claiming it.
+    """
+    operation = RecordOperation.objects.create(
+        user=user, fqdn=FQDN, value="token", action=RecordAction.PRESENT
+    )
+    atomic_blocks = len(connection.atomic_blocks)
+    during_apply = []
+
+    def apply(_: list[RecordChange]) -> None:
+        """Record the state of the operation and of the transactions."""
+        during_apply.append(
+            (
+                RecordOperation.objects.get(pk=operation.pk).status,
+                len(connection.atomic_blocks),
+            )
+        )
+
+    with patch("api.outbox.apply_record_changes", side_effect=apply):
+        assert drain_outbox() == 1
+
+    assert during_apply == [(OperationStatus.IN_PROGRESS, atomic_blocks)]
+    operation.refresh_from_db()
+    assert operation.status == OperationStatus.DONE
+
+
+@pytest.mark.django_db
+def test_drain_outbox_claims_expired_operations(user: User):
+    """
+    arrange: store an operation claimed a while ago and another one claimed just now.
+    act: drain the outbox.
+    assert: only the operation whose claim expired is applied.
+    """
+    expired, claimed = (
+        RecordOperation.objects.create(
+            user=user,
+            fqdn=FQDN,
+            value=value,
+            action=RecordAction.PRESENT,
+            status=OperationStatus.IN_PROGRESS,
+        )
+        for value in ("expired", "claimed")
+    )
+    RecordOperation.objects.filter(pk=expired.pk).update(
+        updated_at=timezone.now() - datetime.timedelta(seconds=DNS_OUTBOX_CLAIM_TIMEOUT + 1)
+    )
+
+    with patch("api.outbox.apply_record_changes") as apply_patch:
+        assert drain_outbox() == 1
+
+    [changes] = apply_patch.call_args.args
+    assert [change.value for change in changes] == ["expired"]
+    claimed.refresh_from_db()
+    assert claimed.status == OperationStatus.IN_PROGRESS
+
+
+@pytest.mark.django_db
+def test_wait_for_operation_times_out(user: User):
+    """
+    arrange: store a pending operation.
+    act: wait for the operation to be applied with a short timeout.
+    assert: the operation is returned still pending.
+    """
+    operation = RecordOperation.objects.create(
+        user=user, fqdn=FQDN, value="token", action=RecordAction.PRESENT
+    )
+
+    assert wait_for_operation(operation, 0.2).status == OperationStatus.PENDING
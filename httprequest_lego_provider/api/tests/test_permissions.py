@@ -0,0 +1,242 @@
+# Copyright 2025 Canonical Ltd.
+# See LICENSE file for licensing details.
+"""Unit tests for the permissions module."""
+
+# imported-auth-user has to be disable as the conflicting import is needed for typing
+# pylint:disable=imported-auth-user
+
+from unittest.mock import patch
+
+import pytest
+from api.models import AccessLevel, Domain, DomainUserPermission
+from api.permissions import (
+    PermissionCache,
+    PermissionTrie,
+    query_permission,
+    user_can_manage,
+    user_can_manage_all,
+)
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.db.models import Value
+from django.db.models.functions import Concat
+
+GRANTS = [
+    ("example.com", AccessLevel.DOMAIN),
+    ("example.org", AccessLevel.SUBDOMAIN),
+    ("b.example.net", AccessLevel.DOMAIN),
+    ("b.example.net", AccessLevel.SUBDOMAIN),
+]
+CHECKS = [
+    ("example.com", True),
+    ("site.example.com", False),
+    ("example.org", False),
+    ("site.example.org", True),
+    ("deep.site.example.org", True),
+    ("other.site.example.org", True),
+    ("badexample.org", False),
+    ("org", False),
+    ("example.net", False),
+    ("site.example.net", False),
+    ("a.b.example.net", True),
+    ("b.example.net", True),
+]
+
+
+@pytest.mark.parametrize("fqdn,allowed", CHECKS)
+def test_permission_trie_allows(fqdn: str, allowed: bool):
+    """
+    arrange: grant domain access to example.com, subdomain access to example.org and both to
+        b.example.net.
+    act: check whether the grants cover a FQDN.
+    assert: domain access covers the domain only and subdomain access covers what is below.
+    """
+    trie = PermissionTrie(GRANTS)
+
+    assert trie.allows(fqdn) is allowed
+
+
+@pytest.mark.parametrize("fqdn,allowed", CHECKS)
+@pytest.mark.django_db
+def test_query_permission(
+    user: User, other_user: User, fqdn: str, allowed: bool, django_assert_num_queries
+):
+    """
+    arrange: grant the user domain access to example.com, subdomain access to example.org and
+        both to b.example.net, and grant another user access to the FQDN.
+    act: check in the database whether the user can manage the FQDN.
+    assert: the grants of the user are applied in a single query.
+    """
+    for domain_fqdn, access_level in GRANTS:
+        domain, _ = Domain.objects.get_or_create(fqdn=domain_fqdn)
+        DomainUserPermission.objects.create(domain=domain, user=user, access_level=access_level)
+    domain, _ = Domain.objects.get_or_create(fqdn=fqdn)
+    DomainUserPermission.objects.create(
+        domain=domain, user=other_user, access_level=AccessLevel.DOMAIN
+    )
+
+    with django_assert_num_queries(1):
+        assert query_permission(user, fqdn) is allowed
+
+
+@pytest.mark.django_db
+def test_domain_reversed_fqdn():
+    """
+    arrange: do nothing.
+    act: create a domain, rename it, create other domains in bulk and rename them in bulk, then
+        rename a domain to an expression.
+    assert: the reversed FQDN of every domain follows its FQDN and the rename to an expression
+        is rejected.
+    """
+    domain = Domain.objects.create(fqdn="site.example.com")
+    domain.fqdn = "other.example.org"
+    domain.save(update_fields=["fqdn"])
+    created = Domain.objects.bulk_create([Domain(fqdn="example.net"), Domain(fqdn="example.io")])
+    Domain.objects.filter(fqdn="example.net").update(fqdn="b.example.net")
+    created[1].fqdn = "c.example.io"
+    Domain.objects.bulk_update([created[1]], ["fqdn"])
+
+    assert dict(Domain.objects.values_list("fqdn", "reversed_fqdn")) == {
+        "other.example.org": "org.example.other",
+        "b.example.net": "net.example.b",
+        "c.example.io": "io.example.c",
+    }
+    with pytest.raises(ValueError):
+        Domain.objects.update(fqdn=Concat(Value("www."), "fqdn"))
+
+
+@pytest.mark.django_db
+@patch("api.permissions.DNS_PERMISSION_CACHE_SIZE", 0)
+def test_user_can_manage_without_cache(user: User, domain: Domain, django_assert_num_queries):
+    """
+    arrange: disable the permission cache and grant the user subdomain access to a domain.
+    act: check twice whether the user can manage a FQDN below the domain.
+    assert: each check is answered by a single query.
+    """
+    DomainUserPermission.objects.create(
+        domain=domain, user=user, access_level=AccessLevel.SUBDOMAIN
+    )
+
+    for _ in range(2):
+        with django_assert_num_queries(1):
+            assert user_can_manage(user, f"site.{domain.fqdn}")
+
+
+@pytest.mark.django_db
+@pytest.mark.parametrize(
+    "cache_size", [pytest.param(0, id="no cache"), pytest.param(10, id="cache")]
+)
+def test_user_can_manage_all_runs_one_query(
+    user: User, domain: Domain, cache_size: int, django_assert_num_queries
+):
+    """
+    arrange: grant the user domain access to a domain, with and without permission cache.
+    act: check in one call whether the user can manage the domain, a subdomain and another FQDN.
+    assert: the outcome of every FQDN is returned, loading the grants in a single query.
+    """
+    DomainUserPermission.objects.create(domain=domain, user=user, access_level=AccessLevel.DOMAIN)
+
+    with (
+        patch("api.permissions.DNS_PERMISSION_CACHE_SIZE", cache_size),
+        django_assert_num_queries(1),
+    ):
+        allowed = user_can_manage_all(
+            user, [domain.fqdn, f"site.{domain.fqdn}", "unknown.example.org"]
+        )
+
+    assert allowed == [True, False, False]
+
+
+@pytest.mark.django_db
+def test_user_can_manage_runs_one_query(user: User, django_assert_num_queries):
+    """
+    arrange: grant the user subdomain access to many domains.
+    act: check whether the user can manage FQDNs below the last domain and an unknown one.
+    assert: each check runs a single query.
+    """
+    domains = Domain.objects.bulk_create(Domain(fqdn=f"example{i}.com") for i in range(50))
+    DomainUserPermission.objects.bulk_create(
+        DomainUserPermission(domain=domain, user=user, access_level=AccessLevel.SUBDOMAIN)
+        for domain in domains
+    )
+
+    with django_assert_num_queries(1):
+        assert user_can_manage(user, "site.example49.com")
+    with django_assert_num_queries(0):
+        assert not user_can_manage(user, "site.example.com")
+
+
+@pytest.mark.django_db
+def test_user_can_manage_follows_grant_changes(user: User, domain: Domain):
+    """
+    arrange: cache the grants of a user without permissions.
+    act: grant, rename the domain and revoke it, checking the user permission after each change.
+    assert: every change is reflected by the next check.
+    """
+    assert not user_can_manage(user, domain.fqdn)
+
+    permission = DomainUserPermission.objects.create(
+        domain=domain, user=user, access_level=AccessLevel.DOMAIN
+    )
+    assert user_can_manage(user, domain.fqdn)
+
+    domain.fqdn = "renamed.com"
+    domain.save()
+    assert user_can_manage(user, "renamed.com")
+
+    permission.delete()
+    assert not user_can_manage(user, "renamed.com")
+
+
+@pytest.mark.django_db
+def test_permission_cache_evicts_least_recently_used(
+    user: User, other_user: User, django_assert_num_queries
+):
+    """
+    arrange: create a permission cache holding a single user.
+    act: get the grants of a user, then of another user and of the first user again.
+    assert: the grants of the first user have been evicted and are loaded again.
+    """
+    permission_cache = PermissionCache(1, 300, None)
+    permission_cache.get(user)
+    permission_cache.get(other_user)
+
+    with django_assert_num_queries(1):
+        permission_cache.get(user)
+    with django_assert_num_queries(0):
+        permission_cache.get(user)
+
+
+@pytest.mark.django_db
+def test_permission_cache_expires_entries(user: User, django_assert_num_queries):
+    """
+    arrange: create a permission cache whose entries expire immediately.
+    act: get the grants of a user twice.
+    assert: the grants are loaded every time.
+    """
+    permission_cache = PermissionCache(10, 0, None)
+    permission_cache.get(user)
+
+    with django_assert_num_queries(1):
+        permission_cache.get(user)
+
+
+@pytest.mark.django_db
+def test_permission_cache_shares_invalidations(user: User, django_assert_num_queries):
+    """
+    arrange: create two permission caches sharing a Django cache, as in two workers, and load
+        the grants of a user in the first one.
+    act: invalidate the grants of the user in the second one.
+    assert: the first cache loads the grants of the user again on the next check only.
+    """
+    cache.clear()
+    worker = PermissionCache(10, 300, "default")
+    other_worker = PermissionCache(10, 300, "default")
+    worker.get(user)
+
+    other_worker.invalidate([user.pk])
+
+    with django_assert_num_queries(1):
+        worker.get(user)
+    with django_assert_num_queries(0):
+        worker.get(user)
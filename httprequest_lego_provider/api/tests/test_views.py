@@ -8,15 +8,24 @@
 import base64
 import json
 import secrets
-from unittest.mock import patch
+from unittest.mock import AsyncMock, patch
 
 import pytest
 from api.dns import DnsSourceUpdateError
 from api.forms import FQDN_PREFIX
-from api.models import AccessLevel, Domain, DomainUserPermission
+from api.models import (
+    AccessLevel,
+    Domain,
+    DomainUserPermission,
+    OperationStatus,
+    RecordAction,
+    RecordOperation,
+)
+from api.views import ahandle_cleanup, ahandle_present
+from asgiref.sync import async_to_sync
 from django.contrib.auth.hashers import check_password
 from django.contrib.auth.models import User
-from django.test import Client
+from django.test import AsyncRequestFactory, Client
 
 
 @pytest.mark.django_db
@@ -271,7 +280,7 @@ def test_post_cleanup_when_logged_in_and_permission_access_level_domain(
             format="json",
             headers={"AUTHORIZATION": f"Basic {user_auth_token}"},
         )
-        mocked_dns_remove.assert_called_once_with(fqdn)
+        mocked_dns_remove.assert_called_once_with(fqdn, value)
 
         assert response.status_code == 204
 
@@ -294,7 +303,7 @@ def test_post_cleanup_when_logged_in_and_permission_access_level_subdomain(
             format="json",
             headers={"AUTHORIZATION": f"Basic {user_auth_token}"},
         )
-        mocked_dns_remove.assert_called_once_with(subdomain_fqdn)
+        mocked_dns_remove.assert_called_once_with(subdomain_fqdn, value)
 
         assert response.status_code == 204
 
@@ -320,7 +329,7 @@ def test_post_cleanup_when_logged_in_and_permission_with_trailing_dot(
             format="json",
             headers={"AUTHORIZATION": f"Basic {user_auth_token}"},
         )
-        mocked_dns_remove.assert_called_once_with(fqdn)
+        mocked_dns_remove.assert_called_once_with(fqdn, value)
 
         assert response.status_code == 204
 
@@ -830,10 +839,10 @@ def test_post_user_when_logged_in_as_admin_user_and_user_invalid(
 
 @pytest.mark.django_db
 @pytest.mark.parametrize(
-    "endpoint,mock_target,needs_value",
+    "endpoint,mock_target",
     [
-        pytest.param("/present", "api.views.write_dns_record", True, id="Test '/present'"),
-        pytest.param("/cleanup", "api.views.remove_dns_record", False, id="Test '/cleanup'"),
+        pytest.param("/present", "api.views.write_dns_record", id="Test '/present'"),
+        pytest.param("/cleanup", "api.views.remove_dns_record", id="Test '/cleanup'"),
     ],
 )
 def test_post_when_write_dns_fails(
@@ -842,7 +851,6 @@ def test_post_when_write_dns_fails(
     domain_user_permission_domain: DomainUserPermission,
     endpoint,
     mock_target,
-    needs_value,
 ):
     """
     assert: mock target to raise DnsSourceUpdateError method, log in a user and give him
@@ -870,13 +878,586 @@ def test_post_when_write_dns_fails(
             headers={"AUTHORIZATION": f"Basic {user_auth_token}"},
         )
 
-        if needs_value:
-            mocked_dns_func.assert_called_once_with(fqdn, value)
-        else:
-            mocked_dns_func.assert_called_once_with(fqdn)
+        mocked_dns_func.assert_called_once_with(fqdn, value)
 
         assert response.status_code == 500
         assert (
             response.content.decode("utf-8")
             == f"{exception_msg} Check httprequest-lego-provider for more details."
         )
+
+
+@pytest.mark.django_db
+@pytest.mark.parametrize(
+    "endpoint,action",
+    [
+        pytest.param("/present", RecordAction.PRESENT, id="Test '/present'"),
+        pytest.param("/cleanup", RecordAction.CLEANUP, id="Test '/cleanup'"),
+    ],
+)
+@patch("api.views.DNS_ASYNC_MODE", True)
+def test_post_in_async_mode_enqueues_operation(
+    client: Client,
+    user_auth_token: str,
+    domain_user_permission_domain: DomainUserPermission,
+    endpoint: str,
+    action: RecordAction,
+):
+    """
+    arrange: enable the asynchronous mode, log in a user and give them permissions on a FQDN.
+    act: submit a POST request for the required endpoint containing the fqdn above.
+    assert: a 202 pointing to the pending operation is returned without touching git.
+    """
+    fqdn = f"{FQDN_PREFIX}{domain_user_permission_domain.domain.fqdn}"
+    with (
+        patch("api.outbox.worker.wake"),
+        patch("api.views.write_dns_record") as write_patch,
+        patch("api.views.remove_dns_record") as remove_patch,
+    ):
+        response = client.post(
+            endpoint,
+            data={"fqdn": fqdn, "value": "token"},
+            format="json",
+            headers={"AUTHORIZATION": f"Basic {user_auth_token}"},
+        )
+
+    operation = RecordOperation.objects.get()
+    assert response.status_code == 202
+    assert response["Location"] == f"/operations/{operation.pk}"
+    assert response.json()["status"] == OperationStatus.PENDING
+    assert (operation.fqdn, operation.value, operation.action) == (fqdn, "token", action)
+    write_patch.assert_not_called()
+    remove_patch.assert_not_called()
+
+
+@pytest.mark.django_db
+@pytest.mark.parametrize(
+    "status,error,expected_status",
+    [
+        pytest.param(OperationStatus.DONE, None, 204, id="done"),
+        pytest.param(OperationStatus.FAILED, "push failed", 500, id="failed"),
+    ],
+)
+@patch("api.views.DNS_ASYNC_MODE", True)
+def test_post_present_in_async_mode_waits_for_operation(
+    client: Client,
+    user_auth_token: str,
+    domain_user_permission_domain: DomainUserPermission,
+    status: OperationStatus,
+    error: str | None,
+    expected_status: int,
+):
+    """
+    arrange: enable the asynchronous mode, log in a user and give them permissions on a FQDN.
+    act: submit a POST request for the present URL asking to wait for the operation.
+    assert: the response reflects the outcome of the operation.
+    """
+
+    def apply(operation: RecordOperation, timeout: float) -> RecordOperation:
+        """Mark the operation as processed.
+
+        Args:
+            operation: the operation to wait for.
+            timeout: maximum number of seconds to wait.
+
+        Returns:
+            the processed operation.
+        """
+        assert timeout == 30
+        operation.status = status
+        operation.error = error
+        return operation
+
+    with (
+        patch("api.outbox.worker.wake"),
+        patch("api.views.wait_for_operation", side_effect=apply),
+    ):
+        response = client.post(
+            "/present?wait=30",
+            data={
+                "fqdn": f"{FQDN_PREFIX}{domain_user_permission_domain.domain.fqdn}",
+                "value": "v",
+            },
+            format="json",
+            headers={"AUTHORIZATION": f"Basic {user_auth_token}"},
+        )
+
+    assert response.status_code == expected_status
+
+
+@pytest.mark.django_db
+def test_get_operation(client: Client, user_auth_token: str, user: User, other_user: User):
+    """
+    arrange: store operations for the logged in user and for another user.
+    act: submit GET requests for the status of both operations.
+    assert: the status of the user's operation is returned and the other one is not found.
+    """
+    own = RecordOperation.objects.create(
+        user=user, fqdn=f"{FQDN_PREFIX}example.com", value="v", action=RecordAction.PRESENT
+    )
+    other = RecordOperation.objects.create(
+        user=other_user, fqdn=f"{FQDN_PREFIX}example.com", value="v", action=RecordAction.PRESENT
+    )
+    headers = {"AUTHORIZATION": f"Basic {user_auth_token}"}
+
+    response = client.get(f"/operations/{own.pk}", headers=headers)
+
+    assert response.status_code == 200
+    assert response.json()["status"] == OperationStatus.PENDING
+    assert client.get(f"/operations/{other.pk}", headers=headers).status_code == 404
+
+
+@pytest.mark.django_db
+@pytest.mark.parametrize(
+    "endpoint,action",
+    [
+        pytest.param("/present/batch", "Add", id="Test '/present/batch'"),
+        pytest.param("/cleanup/batch", "Remove", id="Test '/cleanup/batch'"),
+    ],
+)
+def test_post_batch_applies_changes_together(
+    client: Client,
+    user_auth_token: str,
+    domain_user_permission_subdomain: DomainUserPermission,
+    endpoint: str,
+    action: str,
+):
+    """
+    arrange: log in a user and give them subdomain permissions on a domain.
+    act: submit a batch holding valid, invalid, unauthorized and failing records.
+    assert: the authorized records are applied together and each one gets its own outcome.
+    """
+    domain = domain_user_permission_subdomain.domain.fqdn
+    fqdns = [f"{FQDN_PREFIX}site{i}.{domain}" for i in range(3)]
+
+    def apply(changes):
+        """Fail the last change.
+
+        Args:
+            changes: the changes to apply.
+
+        Raises:
+            DnsSourceUpdateError: for the last change.
+        """
+        changes[-1].error = DnsSourceUpdateError("push failed")
+        raise DnsSourceUpdateError("push failed")
+
+    with patch("api.views.apply_record_changes", side_effect=apply) as apply_patch:
+        response = client.post(
+            endpoint,
+            data=json.dumps(
+                [{"fqdn": f"{fqdn}.", "value": "token"} for fqdn in fqdns]
+                + [
+                    {"fqdn": "invalid", "value": "token"},
+                    {"fqdn": f"{FQDN_PREFIX}unknown.example.org", "value": "token"},
+                ]
+            ),
+            content_type="application/json",
+            headers={"AUTHORIZATION": f"Basic {user_auth_token}"},
+        )
+
+    apply_patch.assert_called_once()
+    changes = apply_patch.call_args.args[0]
+    assert [(change.fqdn, change.value, change.commit_action) for change in changes] == [
+        (fqdn, "token", action) for fqdn in fqdns
+    ]
+    assert response.status_code == 200
+    results = response.json()["results"]
+    assert [result["status"] for result in results] == [204, 204, 500, 400, 403]
+    assert [result.get("fqdn") for result in results[:3]] == fqdns
+    assert results[2]["detail"] == "push failed Check httprequest-lego-provider for more details."
+    assert "fqdn" in results[3]["errors"]
+
+
+@pytest.mark.django_db
+@pytest.mark.parametrize(
+    "data",
+    [
+        pytest.param([], id="empty"),
+        pytest.param({"fqdn": f"{FQDN_PREFIX}example.com", "value": "token"}, id="not a list"),
+        pytest.param(
+            [{"fqdn": f"{FQDN_PREFIX}example.com", "value": "token"}] * 101, id="too large"
+        ),
+    ],
+)
+def test_post_present_batch_when_body_invalid(client: Client, user_auth_token: str, data):
+    """
+    arrange: log in a user.
+    act: submit an invalid batch for the present batch URL.
+    assert: a 400 is returned without applying any change.
+    """
+    with patch("api.views.apply_record_changes") as apply_patch:
+        response = client.post(
+            "/present/batch",
+            data=json.dumps(data),
+            content_type="application/json",
+            headers={"AUTHORIZATION": f"Basic {user_auth_token}"},
+        )
+
+    assert response.status_code == 400
+    apply_patch.assert_not_called()
+
+
+@pytest.mark.django_db
+@patch("api.views.DNS_ASYNC_MODE", True)
+def test_post_present_batch_in_async_mode_enqueues_operations(
+    client: Client,
+    user_auth_token: str,
+    domain_user_permission_subdomain: DomainUserPermission,
+):
+    """
+    arrange: enable the asynchronous mode, log in a user and give them permissions on a domain.
+    act: submit a batch for the present batch URL.
+    assert: an operation is enqueued for every record and reported as pending.
+    """
+    domain = domain_user_permission_subdomain.domain.fqdn
+    fqdns = [f"{FQDN_PREFIX}site{i}.{domain}" for i in range(2)]
+    with (
+        patch("api.outbox.worker.wake"),
+        patch("api.views.apply_record_changes") as apply_patch,
+    ):
+        response = client.post(
+            "/present/batch",
+            data=json.dumps([{"fqdn": fqdn, "value": "token"} for fqdn in fqdns]),
+            content_type="application/json",
+            headers={"AUTHORIZATION": f"Basic {user_auth_token}"},
+        )
+
+    operations = list(RecordOperation.objects.order_by("id"))
+    assert response.status_code == 200
+    assert response.json()["results"] == [
+        {
+            "fqdn": operation.fqdn,
+            "status": 202,
+            "operation": operation.pk,
+            "location": f"/operations/{operation.pk}",
+        }
+        for operation in operations
+    ]
+    assert [(operation.fqdn, operation.action) for operation in operations] == [
+        (fqdn, RecordAction.PRESENT) for fqdn in fqdns
+    ]
+    apply_patch.assert_not_called()
+
+
+@pytest.mark.django_db
+@pytest.mark.parametrize(
+    "view,mock_target",
+    [
+        pytest.param(ahandle_present, "api.views.awrite_dns_record", id="present"),
+        pytest.param(ahandle_cleanup, "api.views.aremove_dns_record", id="cleanup"),
+    ],
+)
+def test_async_view_updates_record(
+    user_auth_token: str,
+    domain_user_permission_domain: DomainUserPermission,
+    view,
+    mock_target: str,
+):
+    """
+    arrange: log in a user and give them permissions on a FQDN.
+    act: submit a POST request for the FQDN to the native async view.
+    assert: the record is updated without blocking and a 204 is returned.
+    """
+    fqdn = f"{FQDN_PREFIX}{domain_user_permission_domain.domain.fqdn}"
+    request = AsyncRequestFactory().post(
+        "/present",
+        data={"fqdn": f"{fqdn}.", "value": "token"},
+        headers={"AUTHORIZATION": f"Basic {user_auth_token}"},
+    )
+
+    with patch(mock_target, new_callable=AsyncMock) as dns_patch:
+        response = async_to_sync(view)(request)
+
+    assert response.status_code == 204
+    dns_patch.assert_awaited_once_with(fqdn, "token")
+
+
+@pytest.mark.django_db
+def test_async_view_rejects_requests(
+    user_auth_token: str, domain_user_permission_domain: DomainUserPermission
+):
+    """
+    arrange: log in a user and give them permissions on a FQDN.
+    act: submit to the native async view a request without credentials, a GET request, a
+        request for a FQDN the user cannot manage and a request failing to update the record.
+    assert: the same status codes as the DRF view are returned.
+    """
+    factory = AsyncRequestFactory()
+    headers = {"AUTHORIZATION": f"Basic {user_auth_token}"}
+    domain = domain_user_permission_domain.domain
+    fqdn = f"{FQDN_PREFIX}{domain.fqdn}"
+
+    unauthenticated = async_to_sync(ahandle_present)(
+        factory.post("/present", data={"fqdn": fqdn, "value": "token"})
+    )
+    not_allowed = async_to_sync(ahandle_present)(factory.get("/present", headers=headers))
+    forbidden = async_to_sync(ahandle_present)(
+        factory.post(
+            "/present",
+            data={"fqdn": f"{FQDN_PREFIX}sub.{domain.fqdn}", "value": "token"},
+            headers=headers,
+        )
+    )
+    with patch(
+        "api.views.awrite_dns_record",
+        new_callable=AsyncMock,
+        side_effect=DnsSourceUpdateError("push failed"),
+    ):
+        failed = async_to_sync(ahandle_present)(
+            factory.post("/present", data={"fqdn": fqdn, "value": "token"}, headers=headers)
+        )
+
+    assert unauthenticated.status_code == 401
+    assert unauthenticated["WWW-Authenticate"].startswith("Basic")
+    assert not_allowed.status_code == 405
+    assert forbidden.status_code == 403
+    assert failed.status_code == 500
+    assert failed.content.decode("utf-8") == (
+        "push failed Check httprequest-lego-provider for more details."
+    )
+
+
+@pytest.mark.django_db
+@patch("api.views.DNS_ASYNC_MODE", True)
+def test_async_view_in_async_mode_enqueues_operation(
+    user_auth_token: str, domain_user_permission_domain: DomainUserPermission
+):
+    """
+    arrange: enable the asynchronous mode, log in a user and give them permissions on a FQDN.
+    act: submit a POST request for the FQDN to the native async cleanup view.
+    assert: a 202 pointing to the pending operation is returned.
+    """
+    fqdn = f"{FQDN_PREFIX}{domain_user_permission_domain.domain.fqdn}"
+    request = AsyncRequestFactory().post(
+        "/cleanup",
+        data={"fqdn": fqdn, "value": "token"},
+        headers={"AUTHORIZATION": f"Basic {user_auth_token}"},
+    )
+
+    with patch("api.outbox.worker.wake"):
+        response = async_to_sync(ahandle_cleanup)(request)
+
+    operation = RecordOperation.objects.get()
+    assert response.status_code == 202
+    assert response["Location"] == f"/operations/{operation.pk}"
+    assert (operation.fqdn, operation.action) == (fqdn, RecordAction.CLEANUP)
+
+
+@pytest.mark.django_db
+@pytest.mark.parametrize(
+    "endpoint,mock_target",
+    [
+        pytest.param("/present", "api.views.write_dns_record", id="Test '/present'"),
+        pytest.param("/cleanup", "api.views.remove_dns_record", id="Test '/cleanup'"),
+    ],
+)
+def test_post_retry_replays_outcome(
+    client: Client,
+    user_auth_token: str,
+    domain_user_permission_domain: DomainUserPermission,
+    endpoint: str,
+    mock_target: str,
+):
+    """
+    arrange: log in a user and give them permissions on a FQDN.
+    act: submit the same POST request for the required endpoint twice.
+    assert: the retry is answered with a 204 without touching git again.
+    """
+    fqdn = f"{FQDN_PREFIX}{domain_user_permission_domain.domain.fqdn}"
+    with patch(mock_target) as dns_patch:
+        responses = [
+            client.post(
+                endpoint,
+                data={"fqdn": fqdn, "value": "token"},
+                format="json",
+                headers={"AUTHORIZATION": f"Basic {user_auth_token}"},
+            )
+            for _ in range(2)
+        ]
+
+    assert [response.status_code for response in responses] == [204, 204]
+    dns_patch.assert_called_once_with(fqdn, "token")
+
+
+@pytest.mark.django_db
+def test_post_retry_applies_again(
+    client: Client, user_auth_token: str, domain_user_permission_domain: DomainUserPermission
+):
+    """
+    arrange: log in a user and give them permissions on a FQDN.
+    act: submit a present request failing to update the record, retry it, clean the record up
+        and submit the present request again.
+    assert: the retry of the failed request and the present request following the cleanup are
+        applied again.
+    """
+    fqdn = f"{FQDN_PREFIX}{domain_user_permission_domain.domain.fqdn}"
+    headers = {"AUTHORIZATION": f"Basic {user_auth_token}"}
+    data = {"fqdn": fqdn, "value": "token"}
+    with (
+        patch(
+            "api.views.write_dns_record", side_effect=[DnsSourceUpdateError("push failed"), None]
+        ) as write_patch,
+        patch("api.views.remove_dns_record") as remove_patch,
+    ):
+        failed = client.post("/present", data=data, format="json", headers=headers)
+        retried = client.post("/present", data=data, format="json", headers=headers)
+        client.post("/cleanup", data=data, format="json", headers=headers)
+        write_patch.side_effect = None
+        present = client.post("/present", data=data, format="json", headers=headers)
+
+    assert [failed.status_code, retried.status_code, present.status_code] == [500, 204, 204]
+    assert write_patch.call_count == 3
+    remove_patch.assert_called_once_with(fqdn, "token")
+
+
+@pytest.mark.django_db
+def test_post_retry_with_idempotency_key(
+    client: Client, user_auth_token: str, domain_user_permission_subdomain: DomainUserPermission
+):
+    """
+    arrange: log in a user and give them permissions on the subdomains of a domain.
+    act: submit a present request with an idempotency key, retry it with the same key and
+        reuse the key for another record.
+    assert: the retry is replayed and the request for another record is rejected with a 422.
+    """
+    domain = domain_user_permission_subdomain.domain.fqdn
+    headers = {"AUTHORIZATION": f"Basic {user_auth_token}", "Idempotency-Key": "request-1"}
+    with patch("api.views.write_dns_record") as write_patch:
+        responses = [
+            client.post(
+                "/present",
+                data={"fqdn": f"{FQDN_PREFIX}{subdomain}.{domain}", "value": "token"},
+                format="json",
+                headers=headers,
+            )
+            for subdomain in ("site1", "site1", "site2")
+        ]
+
+    assert [response.status_code for response in responses] == [204, 204, 422]
+    write_patch.assert_called_once_with(f"{FQDN_PREFIX}site1.{domain}", "token")
+
+
+@pytest.mark.django_db
+def test_post_retry_with_idempotency_key_after_cleanup(
+    client: Client, user_auth_token: str, domain_user_permission_domain: DomainUserPermission
+):
+    """
+    arrange: log in a user and give them permissions on a FQDN.
+    act: submit a present request with an idempotency key, clean the record up and retry the
+        present request with the same key.
+    assert: the retry following the cleanup is applied again.
+    """
+    fqdn = f"{FQDN_PREFIX}{domain_user_permission_domain.domain.fqdn}"
+    headers = {"AUTHORIZATION": f"Basic {user_auth_token}"}
+    data = {"fqdn": fqdn, "value": "token"}
+    with (
+        patch("api.views.write_dns_record") as write_patch,
+        patch("api.views.remove_dns_record") as remove_patch,
+    ):
+        present = client.post(
+            "/present",
+            data=data,
+            format="json",
+            headers={**headers, "Idempotency-Key": "request-1"},
+        )
+        cleanup = client.post("/cleanup", data=data, format="json", headers=headers)
+        retried = client.post(
+            "/present",
+            data=data,
+            format="json",
+            headers={**headers, "Idempotency-Key": "request-1"},
+        )
+
+    assert [present.status_code, cleanup.status_code, retried.status_code] == [204, 204, 204]
+    assert write_patch.call_count == 2
+    remove_patch.assert_called_once_with(fqdn, "token")
+
+
+@pytest.mark.django_db
+@patch("api.idempotency.DNS_IDEMPOTENCY_TTL", 0)
+def test_post_retry_when_replay_disabled(
+    client: Client, user_auth_token: str, domain_user_permission_domain: DomainUserPermission
+):
+    """
+    arrange: disable the replay, log in a user and give them permissions on a FQDN.
+    act: submit the same present request twice.
+    assert: both requests update the record.
+    """
+    fqdn = f"{FQDN_PREFIX}{domain_user_permission_domain.domain.fqdn}"
+    with patch("api.views.write_dns_record") as write_patch:
+        for _ in range(2):
+            client.post(
+                "/present",
+                data={"fqdn": fqdn, "value": "token"},
+                format="json",
+                headers={"AUTHORIZATION": f"Basic {user_auth_token}"},
+            )
+
+    assert write_patch.call_count == 2
+
+
+@pytest.mark.django_db
+@patch("api.views.DNS_ASYNC_MODE", True)
+def test_post_retry_in_async_mode_replays_operation(
+    client: Client, user_auth_token: str, domain_user_permission_domain: DomainUserPermission
+):
+    """
+    arrange: enable the asynchronous mode, log in a user and give them permissions on a FQDN.
+    act: submit the same present request twice, then again once the operation failed.
+    assert: the retry points to the pending operation and a new operation is enqueued once it
+        failed.
+    """
+    fqdn = f"{FQDN_PREFIX}{domain_user_permission_domain.domain.fqdn}"
+    with patch("api.outbox.worker.wake"):
+        responses = [
+            client.post(
+                "/present",
+                data={"fqdn": fqdn, "value": "token"},
+                format="json",
+                headers={"AUTHORIZATION": f"Basic {user_auth_token}"},
+            )
+            for _ in range(2)
+        ]
+        RecordOperation.objects.update(status=OperationStatus.FAILED)
+        after_failure = client.post(
+            "/present",
+            data={"fqdn": fqdn, "value": "token"},
+            format="json",
+            headers={"AUTHORIZATION": f"Basic {user_auth_token}"},
+        )
+
+    first, retry = responses
+    assert (first.status_code, retry.status_code) == (202, 202)
+    assert retry["Location"] == first["Location"]
+    assert after_failure.status_code == 202
+    assert after_failure["Location"] != first["Location"]
+    assert RecordOperation.objects.count() == 2
+
+
+@pytest.mark.django_db
+def test_async_view_retry_replays_outcome(
+    user_auth_token: str, domain_user_permission_domain: DomainUserPermission
+):
+    """
+    arrange: log in a user and give them permissions on a FQDN.
+    act: submit the same POST request twice to the native async present view.
+    assert: the retry is answered with a 204 without touching git again.
+    """
+    fqdn = f"{FQDN_PREFIX}{domain_user_permission_domain.domain.fqdn}"
+    factory = AsyncRequestFactory()
+
+    with patch("api.views.awrite_dns_record", new_callable=AsyncMock) as dns_patch:
+        responses = [
+            async_to_sync(ahandle_present)(
+                factory.post(
+                    "/present",
+                    data={"fqdn": fqdn, "value": "token"},
+                    headers={"AUTHORIZATION": f"Basic {user_auth_token}"},
+                )
+            )
+            for _ in range(2)
+        ]
+
+    assert [response.status_code for response in responses] == [204, 204]
+    dns_patch.assert_awaited_once_with(fqdn, "token")
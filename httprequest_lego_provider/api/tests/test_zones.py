@@ -0,0 +1,90 @@
+# Copyright 2025 Canonical Ltd.
+# See LICENSE file for licensing details.
+"""Unit tests for the zones module."""
+
+import pytest
+from api.zones import ZoneIndex, edit_zone_lines
+
+ZONE_LINES = [
+    "; site1 600 IN TXT \042comment\042\n",
+    "site1 600 IN TXT \042sometoken\042\n",
+    "site2 600 IN TXT \042sometoken\042\n",
+    "site1 600 IN TXT \042other\042\n",
+]
+ZONE_EDITS = [
+    pytest.param(
+        {("site1", None): False, ("site", "token"): True},
+        "; site1 600 IN TXT \042comment\042\n"
+        "site2 600 IN TXT \042sometoken\042\n"
+        "site 600 IN TXT \042token\042\n",
+        True,
+        id="remove all values and add",
+    ),
+    pytest.param(
+        {("site2", "sometoken"): True},
+        "".join(ZONE_LINES),
+        False,
+        id="record already present",
+    ),
+    pytest.param(
+        {("site2", "other"): True},
+        "".join(ZONE_LINES) + "site2 600 IN TXT \042other\042\n",
+        True,
+        id="add a value",
+    ),
+    pytest.param(
+        {("site1", "sometoken"): False},
+        "; site1 600 IN TXT \042comment\042\n"
+        "site2 600 IN TXT \042sometoken\042\n"
+        "site1 600 IN TXT \042other\042\n",
+        True,
+        id="remove a value",
+    ),
+    pytest.param(
+        {("site1", None): False, ("site1", "other"): True},
+        "; site1 600 IN TXT \042comment\042\n"
+        "site2 600 IN TXT \042sometoken\042\n"
+        "site1 600 IN TXT \042other\042\n",
+        True,
+        id="remove all values but one",
+    ),
+    pytest.param(
+        {("site", "token"): True, ("site", None): False},
+        "".join(ZONE_LINES),
+        False,
+        id="add cancelled by a later removal",
+    ),
+]
+
+
+@pytest.mark.parametrize("edits, expected, changed", ZONE_EDITS)
+def test_edit_zone_lines(edits: dict, expected: str, changed: bool):
+    """
+    arrange: a zone file with a commented record and the records of two subdomains, one of
+        them holding two values.
+    act: add and remove records in a single pass.
+    assert: the commented record is kept, only the records of the values removed are dropped,
+        the records added are appended unless already present and whether the content changed
+        is reported.
+    """
+    written: list[str] = []
+
+    assert edit_zone_lines(ZONE_LINES, edits, written.append) is changed
+    assert "".join(written) == expected
+
+
+@pytest.mark.parametrize("edits, expected, changed", ZONE_EDITS)
+def test_zone_index_edit(edits: dict, expected: str, changed: bool):
+    """
+    arrange: index a zone file with a commented record and the records of two subdomains, one
+        of them holding two values.
+    act: add and remove records through the index, twice.
+    assert: the index edits the zone file as the streaming editor does, the second edit
+        leaving it unchanged.
+    """
+    index = ZoneIndex(ZONE_LINES)
+
+    assert index.edit(edits) is changed
+    assert index.content() == expected.encode("utf-8")
+    assert not index.edit(edits)
+    assert index.content() == expected.encode("utf-8")
@@ -6,6 +6,7 @@ from django.urls import include, path
 from rest_framework.routers import DefaultRouter
 
 from . import views
+from .settings import DNS_ASGI_VIEWS
 
 router = DefaultRouter()
 router.register("domains", views.DomainViewSet)
@@ -13,8 +14,19 @@ router.register("domain-user-permissions", views.DomainUserPermissionViewSet)
 router.register("users", views.UserViewSet)
 
 urlpatterns = [
-    path("cleanup", views.handle_cleanup, name="cleanup"),
-    path("present", views.handle_present, name="present"),
+    path(
+        "cleanup",
+        views.ahandle_cleanup if DNS_ASGI_VIEWS else views.handle_cleanup,
+        name="cleanup",
+    ),
+    path("cleanup/batch", views.handle_cleanup_batch, name="cleanup-batch"),
+    path(
+        "present",
+        views.ahandle_present if DNS_ASGI_VIEWS else views.handle_present,
+        name="present",
+    ),
+    path("present/batch", views.handle_present_batch, name="present-batch"),
+    path("operations/<int:operation_id>", views.handle_operation, name="operation"),
     path("api/v1/accounts/", include("django.contrib.auth.urls")),
     path("api/v1/", include(router.urls)),
 ]
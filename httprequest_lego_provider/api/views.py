@@ -5,29 +5,184 @@
 # Disable too-many-ancestors rule since we can't control inheritance for the ViewSets.
 # pylint:disable=too-many-ancestors
 
-from typing import Optional
+import time
+from typing import Any, Dict, List, Optional, Tuple, Type
+
+from asgiref.sync import sync_to_async
 
 # imported-auth-user has to be disabled as the import is needed for UserViewSet
 # pylint:disable=imported-auth-user
 from django.contrib.auth.models import User
-from django.http import HttpRequest, HttpResponse
+from django.forms import Form
+from django.http import HttpRequest, HttpResponse, JsonResponse
+from django.urls import reverse
+from django.views.decorators.csrf import csrf_exempt
 from opentelemetry import trace
 from rest_framework import viewsets
 from rest_framework.decorators import api_view
+from rest_framework.exceptions import MethodNotAllowed
 from rest_framework.permissions import IsAdminUser
-
-from .dns import DnsSourceUpdateError, remove_dns_record, write_dns_record
+from rest_framework.request import Request
+from rest_framework.views import APIView
+
+from .dns import (
+    DnsSourceUpdateError,
+    RecordChange,
+    apply_record_changes,
+    aremove_dns_record,
+    awrite_dns_record,
+    remove_dns_record,
+    write_dns_record,
+)
 from .forms import CleanupForm, PresentForm
-from .models import AccessLevel, Domain, DomainUserPermission
-from .serializers import DomainSerializer, DomainUserPermissionSerializer, UserSerializer
+from .idempotency import (
+    IDEMPOTENCY_KEY_HEADER,
+    IdempotencyKeyError,
+    IdempotentRequest,
+    alookup_outcome,
+    astore_outcome,
+    lookup_outcome,
+    store_outcome,
+)
+from .models import (
+    Domain,
+    DomainUserPermission,
+    OperationStatus,
+    RecordAction,
+    RecordOperation,
+)
+from .outbox import aenqueue, await_operation, enqueue, wait_for_operation
+from .permissions import auser_can_manage, user_can_manage, user_can_manage_all
+from .serializers import (
+    DomainSerializer,
+    DomainUserPermissionSerializer,
+    RecordOperationSerializer,
+    UserSerializer,
+)
+from .settings import DNS_ASYNC_MAX_WAIT, DNS_ASYNC_MODE, DNS_BATCH_MAX_RECORDS
 
 FQDN_PREFIX = "_acme-challenge."
+WAIT_ERROR = "The wait parameter must be a number."
 tracer = trace.get_tracer(__name__)
 
 
+def _operation_response(operation: RecordOperation) -> HttpResponse:
+    """Build the response for a DNS record operation accepted in asynchronous mode.
+
+    Args:
+        operation: the operation.
+
+    Returns:
+        a 204 if the operation has been applied, a 500 if it failed and a 202 with the
+        operation status otherwise.
+    """
+    if operation.status == OperationStatus.DONE:
+        return HttpResponse(status=204)
+    if operation.status == OperationStatus.FAILED:
+        return HttpResponse(
+            status=500,
+            content=f"{operation.error} Check httprequest-lego-provider for more details.",
+        )
+    response = JsonResponse(RecordOperationSerializer(operation).data, status=202)
+    response["Location"] = reverse("operation", args=[operation.pk])
+    return response
+
+
+def _get_wait(request: Request) -> float | None:
+    """Get how many seconds to wait for operations to be applied in asynchronous mode.
+
+    Args:
+        request: the HTTP request, with an optional `wait` query parameter.
+
+    Returns:
+        the seconds to wait, capped to the maximum, or None if the parameter is invalid.
+    """
+    try:
+        return min(float(request.query_params.get("wait", 0)), DNS_ASYNC_MAX_WAIT)
+    except ValueError:
+        return None
+
+
+def _idempotent_request(
+    request: HttpRequest | Request, fqdn: str, value: str, action: str
+) -> IdempotentRequest:
+    """Identify a present or cleanup request, to recognize its retries.
+
+    Args:
+        request: the HTTP request, with an optional idempotency key header.
+        fqdn: the FQDN of the record.
+        value: the ACME challenge of the record.
+        action: whether to add or remove the record.
+
+    Returns:
+        the identity of the request.
+    """
+    return IdempotentRequest(
+        request.user.pk, fqdn, value, action, request.headers.get(IDEMPOTENCY_KEY_HEADER)
+    )
+
+
+def _replay(request: Request, idempotent: IdempotentRequest) -> HttpResponse | None:
+    """Answer a retried request from the stored outcome of its earlier attempt.
+
+    Args:
+        request: the HTTP request.
+        idempotent: the identity of the request.
+
+    Returns:
+        the response of the earlier attempt, or None if the request has to be applied, e.g.
+        because its earlier attempt failed.
+    """
+    try:
+        outcome = lookup_outcome(idempotent)
+    except IdempotencyKeyError as exc:
+        return HttpResponse(status=422, content=str(exc))
+    if outcome is None:
+        return None
+    if outcome["operation"] is None:
+        return HttpResponse(status=204)
+    operation = RecordOperation.objects.filter(pk=outcome["operation"]).first()
+    if operation is None or operation.status == OperationStatus.FAILED:
+        return None
+    wait = _get_wait(request)
+    if wait is None:
+        return HttpResponse(status=400, content=WAIT_ERROR)
+    if wait > 0:
+        operation = wait_for_operation(operation, wait)
+    return _operation_response(operation)
+
+
+def _enqueue_operation(
+    request: Request, fqdn: str, value: str, action: str, idempotent: IdempotentRequest
+):
+    """Store a DNS record operation in the outbox and optionally wait for it to be applied.
+
+    The optional `wait` query parameter sets how many seconds to wait for the operation to be
+    applied, so that clients can keep synchronous semantics.
+
+    Args:
+        request: the HTTP request.
+        fqdn: the FQDN of the record.
+        value: the ACME challenge of the record.
+        action: whether to add or remove the record.
+        idempotent: the identity of the request, to answer its retries.
+
+    Returns:
+        an HTTP response.
+    """
+    wait = _get_wait(request)
+    if wait is None:
+        return HttpResponse(status=400, content=WAIT_ERROR)
+    operation = enqueue(request.user, fqdn, value, action)
+    store_outcome(idempotent, operation.pk)
+    if wait > 0:
+        operation = wait_for_operation(operation, wait)
+    return _operation_response(operation)
+
+
 @api_view(["POST"])
 @tracer.start_as_current_span("handle_present")
-def handle_present(request: HttpRequest) -> Optional[HttpResponse]:
+def handle_present(request: Request) -> Optional[HttpResponse]:
     """Handle the submissing of the present form.
 
     Args:
@@ -41,35 +196,32 @@ def handle_present(request: HttpRequest) -> Optional[HttpResponse]:
         return HttpResponse(content=form.errors.as_json(), status=400)
     user = request.user
     fqdn: str = form.cleaned_data["fqdn"]
-    fqdn_without_prefix = fqdn.removeprefix(FQDN_PREFIX)
     value = form.cleaned_data["value"]
 
-    dups = DomainUserPermission.objects.filter(user=user)
+    if not user_can_manage(user, fqdn.removeprefix(FQDN_PREFIX)):
+        return HttpResponse(
+            status=403,
+            content=f"The user {user} does not have permission to manage {fqdn}",
+        )
+    idempotent = _idempotent_request(request, fqdn, value, RecordAction.PRESENT)
+    response = _replay(request, idempotent)
+    if response is not None:
+        return response
+    if DNS_ASYNC_MODE:
+        return _enqueue_operation(request, fqdn, value, RecordAction.PRESENT, idempotent)
     try:
-        for dup in dups:
-            domain_fqdn = dup.domain.fqdn
-            if dup.access_level == AccessLevel.DOMAIN and fqdn_without_prefix == domain_fqdn:
-                write_dns_record(fqdn, value)
-                return HttpResponse(status=204)
-            if dup.access_level == AccessLevel.SUBDOMAIN and fqdn_without_prefix.endswith(
-                f".{domain_fqdn}"
-            ):
-                write_dns_record(fqdn, value)
-                return HttpResponse(status=204)
+        write_dns_record(fqdn, value)
     except DnsSourceUpdateError as exc:
         return HttpResponse(
             status=500, content=f"{str(exc)} Check httprequest-lego-provider for more details."
         )
-
-    return HttpResponse(
-        status=403,
-        content=f"The user {user} does not have permission to manage {fqdn}",
-    )
+    store_outcome(idempotent)
+    return HttpResponse(status=204)
 
 
 @api_view(["POST"])
 @tracer.start_as_current_span("handle_cleanup")
-def handle_cleanup(request: HttpRequest) -> Optional[HttpResponse]:
+def handle_cleanup(request: Request) -> Optional[HttpResponse]:
     """Handle the submissing of the cleanup form.
 
     Args:
@@ -83,28 +235,406 @@ def handle_cleanup(request: HttpRequest) -> Optional[HttpResponse]:
         return HttpResponse(content=form.errors.as_json(), status=400)
     user = request.user
     fqdn: str = form.cleaned_data["fqdn"]
-    fqdn_without_prefix = fqdn.removeprefix(FQDN_PREFIX)
-    dups = DomainUserPermission.objects.filter(user=user)
+    value = form.cleaned_data["value"]
+
+    if not user_can_manage(user, fqdn.removeprefix(FQDN_PREFIX)):
+        return HttpResponse(
+            status=403,
+            content=f"The user {user} does not have permission to manage {fqdn}",
+        )
+    idempotent = _idempotent_request(request, fqdn, value, RecordAction.CLEANUP)
+    response = _replay(request, idempotent)
+    if response is not None:
+        return response
+    if DNS_ASYNC_MODE:
+        return _enqueue_operation(request, fqdn, value, RecordAction.CLEANUP, idempotent)
     try:
-        for dup in dups:
-            domain_fqdn = dup.domain.fqdn
-            if dup.access_level == AccessLevel.DOMAIN and fqdn_without_prefix == domain_fqdn:
-                remove_dns_record(fqdn)
-                return HttpResponse(status=204)
-            if dup.access_level == AccessLevel.SUBDOMAIN and fqdn_without_prefix.endswith(
-                "." + domain_fqdn
-            ):
-                remove_dns_record(fqdn)
-                return HttpResponse(status=204)
+        remove_dns_record(fqdn, value)
     except DnsSourceUpdateError as exc:
         return HttpResponse(
             status=500, content=f"{str(exc)} Check httprequest-lego-provider for more details."
         )
+    store_outcome(idempotent)
+    return HttpResponse(status=204)
+
+
+def _batch_operation_result(result: Dict[str, Any], operation: RecordOperation) -> None:
+    """Report the status of a DNS record operation in the result of a batch item.
+
+    Args:
+        result: the result of the batch item.
+        operation: the operation enqueued for the item.
+    """
+    result["operation"] = operation.pk
+    if operation.status == OperationStatus.DONE:
+        result["status"] = 204
+    elif operation.status == OperationStatus.FAILED:
+        result["status"] = 500
+        result["detail"] = f"{operation.error} Check httprequest-lego-provider for more details."
+    else:
+        result["status"] = 202
+        result["location"] = reverse("operation", args=[operation.pk])
+
+
+def _enqueue_batch(user: User, results: List[Dict[str, Any]], action: str, wait: float) -> None:
+    """Store the DNS record operations of a batch in the outbox and optionally wait for them.
+
+    Args:
+        user: the user requesting the operations.
+        results: the results of the authorized items, updated with their outcome.
+        action: whether to add or remove the records.
+        wait: seconds to wait for the operations to be applied, all together.
+    """
+    operations = [enqueue(user, result["fqdn"], result["value"], action) for result in results]
+    deadline = time.monotonic() + wait
+    for result, operation in zip(results, operations):
+        remaining = deadline - time.monotonic()
+        if remaining > 0:
+            operation = wait_for_operation(operation, remaining)
+        _batch_operation_result(result, operation)
+
+
+def _apply_batch(results: List[Dict[str, Any]], action: str) -> None:
+    """Apply the DNS record changes of a batch together, in a single commit and push.
+
+    Args:
+        results: the results of the authorized items, updated with their outcome.
+        action: whether to add or remove the records.
+    """
+    changes = [
+        (
+            RecordChange(result["fqdn"], result["value"], "Add")
+            if action == RecordAction.PRESENT
+            else RecordChange(result["fqdn"], result["value"], "Remove")
+        )
+        for result in results
+    ]
+    try:
+        apply_record_changes(changes)
+    except DnsSourceUpdateError:
+        # Each change holds its own error, reported in the result of its item.
+        pass
+    for result, change in zip(results, changes):
+        if change.error:
+            result["status"] = 500
+            result["detail"] = (
+                f"{str(change.error)} Check httprequest-lego-provider for more details."
+            )
+        else:
+            result["status"] = 204
+
+
+def _validate_batch(
+    items: List[Any], form_class: Type[Form]
+) -> Tuple[List[Dict[str, Any]], List[Dict[str, Any]]]:
+    """Validate the items of a batch with the form of the single endpoint.
+
+    Args:
+        items: the items of the batch.
+        form_class: the form validating each item.
 
-    return HttpResponse(
-        status=403,
-        content=f"The user {user} does not have permission to manage {fqdn}",
+    Returns:
+        the results of all the items, in order, and the results of the valid items, holding
+        their cleaned FQDN and value.
+    """
+    results: List[Dict[str, Any]] = []
+    accepted: List[Dict[str, Any]] = []
+    for item in items:
+        form = form_class(item if isinstance(item, dict) else {})
+        if form.is_valid():
+            result = {"fqdn": form.cleaned_data["fqdn"], "value": form.cleaned_data["value"]}
+            accepted.append(result)
+        else:
+            result = {"status": 400, "errors": form.errors.get_json_data()}
+        results.append(result)
+    return results, accepted
+
+
+def _authorize_batch(user: User, accepted: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """Check in one pass that the user can manage the records of the valid items of a batch.
+
+    Args:
+        user: the user requesting the changes.
+        accepted: the results of the valid items, updated with the outcome of the others.
+
+    Returns:
+        the results of the authorized items.
+    """
+    allowed = user_can_manage_all(
+        user, [result["fqdn"].removeprefix(FQDN_PREFIX) for result in accepted]
     )
+    authorized: List[Dict[str, Any]] = []
+    for result, can_manage in zip(accepted, allowed):
+        if can_manage:
+            authorized.append(result)
+        else:
+            result["status"] = 403
+            result["detail"] = (
+                f"The user {user} does not have permission to manage {result['fqdn']}"
+            )
+    return authorized
+
+
+def _handle_batch(request: Request, form_class: Type[Form], action: str) -> HttpResponse:
+    """Handle a batch of present or cleanup requests.
+
+    Every item is validated with the form of the single endpoint and all of them are
+    authorized in one pass. The record changes of the valid and authorized items are then
+    applied together, in a single commit and push, or enqueued together in asynchronous mode.
+
+    Args:
+        request: the HTTP request, whose body is a list of FQDN and value pairs.
+        form_class: the form validating each item.
+        action: whether to add or remove the records.
+
+    Returns:
+        an HTTP response with the outcome of each item, in order, using the status codes of
+        the single endpoint.
+    """
+    items = request.data
+    if not isinstance(items, list) or not items:
+        return HttpResponse(status=400, content="Please provide a list of FQDN and value pairs.")
+    if len(items) > DNS_BATCH_MAX_RECORDS:
+        return HttpResponse(
+            status=400, content=f"Please provide at most {DNS_BATCH_MAX_RECORDS} records."
+        )
+    wait = _get_wait(request) if DNS_ASYNC_MODE else 0.0
+    if wait is None:
+        return HttpResponse(status=400, content=WAIT_ERROR)
+    results, accepted = _validate_batch(items, form_class)
+    authorized = _authorize_batch(request.user, accepted)
+    trace.get_current_span().set_attribute("dns.batch_size", len(authorized))
+    if DNS_ASYNC_MODE:
+        _enqueue_batch(request.user, authorized, action, wait)
+    elif authorized:
+        _apply_batch(authorized, action)
+    for result in accepted:
+        del result["value"]
+    return JsonResponse({"results": results})
+
+
+@api_view(["POST"])
+@tracer.start_as_current_span("handle_present_batch")
+def handle_present_batch(request: Request) -> HttpResponse:
+    """Handle the submission of a batch of present requests.
+
+    Args:
+        request: the HTTP request.
+
+    Returns:
+        an HTTP response with the outcome of each record.
+    """
+    return _handle_batch(request, PresentForm, RecordAction.PRESENT)
+
+
+@api_view(["POST"])
+@tracer.start_as_current_span("handle_cleanup_batch")
+def handle_cleanup_batch(request: Request) -> HttpResponse:
+    """Handle the submission of a batch of cleanup requests.
+
+    Args:
+        request: the HTTP request.
+
+    Returns:
+        an HTTP response with the outcome of each record.
+    """
+    return _handle_batch(request, CleanupForm, RecordAction.CLEANUP)
+
+
+def _initialize_request(request: HttpRequest) -> Tuple[Request, HttpResponse | None]:
+    """Authenticate, authorize and parse a request the way the DRF views do.
+
+    Authentication may hash a password and query the database, so this runs on a thread.
+
+    Args:
+        request: the HTTP request.
+
+    Returns:
+        the DRF request and, if it has been rejected, the rendered error response.
+    """
+    view = APIView()
+    view.args, view.kwargs = (), {}
+    view.headers = view.default_response_headers
+    drf_request = view.initialize_request(request)
+    view.request = drf_request
+    try:
+        if request.method != "POST":
+            raise MethodNotAllowed(request.method)
+        view.initial(drf_request)
+        drf_request.data  # pylint: disable=pointless-statement
+    except Exception as exc:  # pylint: disable=broad-exception-caught
+        # Unexpected exceptions are raised again by the DRF exception handling.
+        response = view.finalize_response(drf_request, view.handle_exception(exc))
+        if isinstance(exc, MethodNotAllowed):
+            response["Allow"] = "POST"
+        response.render()
+        return drf_request, response
+    return drf_request, None
+
+
+async def _areplay(request: Request, idempotent: IdempotentRequest) -> HttpResponse | None:
+    """Answer a retried request from the stored outcome of its earlier attempt, without blocking.
+
+    Args:
+        request: the HTTP request.
+        idempotent: the identity of the request.
+
+    Returns:
+        the response of the earlier attempt, or None if the request has to be applied, e.g.
+        because its earlier attempt failed.
+    """
+    try:
+        outcome = await alookup_outcome(idempotent)
+    except IdempotencyKeyError as exc:
+        return HttpResponse(status=422, content=str(exc))
+    if outcome is None:
+        return None
+    if outcome["operation"] is None:
+        return HttpResponse(status=204)
+    operation = await RecordOperation.objects.filter(pk=outcome["operation"]).afirst()
+    if operation is None or operation.status == OperationStatus.FAILED:
+        return None
+    wait = _get_wait(request)
+    if wait is None:
+        return HttpResponse(status=400, content=WAIT_ERROR)
+    if wait > 0:
+        operation = await await_operation(operation, wait)
+    return _operation_response(operation)
+
+
+async def _aenqueue_operation(
+    request: Request, fqdn: str, value: str, action: str, idempotent: IdempotentRequest
+):
+    """Store a DNS record operation in the outbox and optionally await for it to be applied.
+
+    Args:
+        request: the HTTP request.
+        fqdn: the FQDN of the record.
+        value: the ACME challenge of the record.
+        action: whether to add or remove the record.
+        idempotent: the identity of the request, to answer its retries.
+
+    Returns:
+        an HTTP response.
+    """
+    wait = _get_wait(request)
+    if wait is None:
+        return HttpResponse(status=400, content=WAIT_ERROR)
+    operation = await aenqueue(request.user, fqdn, value, action)
+    await astore_outcome(idempotent, operation.pk)
+    if wait > 0:
+        operation = await await_operation(operation, wait)
+    return _operation_response(operation)
+
+
+async def _aapply_record(request: Request, fqdn: str, value: str, action: str) -> HttpResponse:
+    """Replay, enqueue or apply a valid and authorized present or cleanup request.
+
+    Args:
+        request: the HTTP request.
+        fqdn: the FQDN of the record.
+        value: the ACME challenge of the record.
+        action: whether to add or remove the record.
+
+    Returns:
+        an HTTP response.
+    """
+    idempotent = _idempotent_request(request, fqdn, value, action)
+    response = await _areplay(request, idempotent)
+    if response is not None:
+        return response
+    if DNS_ASYNC_MODE:
+        return await _aenqueue_operation(request, fqdn, value, action, idempotent)
+    try:
+        if action == RecordAction.PRESENT:
+            await awrite_dns_record(fqdn, value)
+        else:
+            await aremove_dns_record(fqdn, value)
+    except DnsSourceUpdateError as exc:
+        return HttpResponse(
+            status=500, content=f"{str(exc)} Check httprequest-lego-provider for more details."
+        )
+    await astore_outcome(idempotent)
+    return HttpResponse(status=204)
+
+
+async def _ahandle_record(request: HttpRequest, form_class: Type[Form], action: str):
+    """Handle a present or cleanup request without blocking the event loop.
+
+    Args:
+        request: the HTTP request.
+        form_class: the form validating the request.
+        action: whether to add or remove the record.
+
+    Returns:
+        an HTTP response.
+    """
+    drf_request, response = await sync_to_async(_initialize_request)(request)
+    if response is not None:
+        return response
+    form = form_class(drf_request.data)
+    if not form.is_valid():
+        return HttpResponse(content=form.errors.as_json(), status=400)
+    user = drf_request.user
+    fqdn: str = form.cleaned_data["fqdn"]
+    value = form.cleaned_data["value"]
+
+    if not await auser_can_manage(user, fqdn.removeprefix(FQDN_PREFIX)):
+        return HttpResponse(
+            status=403,
+            content=f"The user {user} does not have permission to manage {fqdn}",
+        )
+    return await _aapply_record(drf_request, fqdn, value, action)
+
+
+@csrf_exempt
+async def ahandle_present(request: HttpRequest) -> HttpResponse:
+    """Handle the submission of the present form in an event loop, when served over ASGI.
+
+    Args:
+        request: the HTTP request.
+
+    Returns:
+        an HTTP response.
+    """
+    with tracer.start_as_current_span("ahandle_present"):
+        return await _ahandle_record(request, PresentForm, RecordAction.PRESENT)
+
+
+@csrf_exempt
+async def ahandle_cleanup(request: HttpRequest) -> HttpResponse:
+    """Handle the submission of the cleanup form in an event loop, when served over ASGI.
+
+    Args:
+        request: the HTTP request.
+
+    Returns:
+        an HTTP response.
+    """
+    with tracer.start_as_current_span("ahandle_cleanup"):
+        return await _ahandle_record(request, CleanupForm, RecordAction.CLEANUP)
+
+
+@api_view(["GET"])
+@tracer.start_as_current_span("handle_operation")
+def handle_operation(request: Request, operation_id: int) -> HttpResponse:
+    """Report the status of a DNS record operation accepted in asynchronous mode.
+
+    Args:
+        request: the HTTP request.
+        operation_id: the identifier of the operation.
+
+    Returns:
+        an HTTP response with the operation status.
+    """
+    operations = RecordOperation.objects.all()
+    if not request.user.is_staff:
+        operations = operations.filter(user=request.user)
+    try:
+        operation = operations.get(pk=operation_id)
+    except RecordOperation.DoesNotExist:
+        return HttpResponse(status=404)
+    return JsonResponse(RecordOperationSerializer(operation).data)
 
 
 class DomainViewSet(viewsets.ModelViewSet):
@@ -0,0 +1,319 @@
+# Copyright 2025 Canonical Ltd.
+# See LICENSE file for licensing details.
+"""Editing of the TXT records of the zone files."""
+
+import hashlib
+import io
+import logging
+import os
+import stat
+import tempfile
+import threading
+from collections import OrderedDict
+from collections.abc import Iterable
+from pathlib import Path
+from typing import Callable, Dict, List, Tuple
+
+from opentelemetry import trace
+
+from .settings import DNS_ZONE_INDEX_CACHE_SIZE
+
+tracer = trace.get_tracer(__name__)
+
+RECORD_CONTENT = "{record} 600 IN TXT \042{value}\042\n"
+
+
+def _record_value(line: str) -> str:
+    """Get the TXT value of a record line in bind9 format.
+
+    Args:
+        line: the record line.
+
+    Returns:
+        the value of the record, without quotes.
+    """
+    return line.rsplit(None, 1)[-1].strip("\042")
+
+
+def _record_kept(
+    edits: Dict[Tuple[str, str | None], Tuple[int, bool]], subdomain: str, value: str | None
+) -> bool | None:
+    """Check whether the edits keep a record of a DNS record file.
+
+    The last edit of the record itself or of all the records of its subdomain decides.
+
+    Args:
+        edits: the position of each edit and whether it adds the record, by subdomain and
+            value, a None value standing for all the values of the subdomain.
+        subdomain: the subdomain of the record.
+        value: the value of the record, or None for all the values of the subdomain.
+
+    Returns:
+        whether the record is kept, or None if no edit applies to it.
+    """
+    applying = [edits[key] for key in ((subdomain, value), (subdomain, None)) if key in edits]
+    return max(applying)[1] if applying else None
+
+
+def edit_zone_lines(
+    lines: Iterable[str],
+    edits: Dict[Tuple[str, str | None], bool],
+    write: Callable[[str], object],
+) -> bool:
+    """Add and remove TXT records while streaming the lines of a DNS record file.
+
+    Each line is tokenized once and written through unless it holds a record the edits remove,
+    then the added records missing from the file are appended, so that the file is edited in
+    a single pass whatever the number of edits.
+
+    Args:
+        lines: the lines of the DNS record file.
+        edits: whether to add or remove the record, by subdomain and value, a None value
+            removing all the records of the subdomain, in the order the edits apply.
+        write: the function writing the lines of the updated file.
+
+    Returns:
+        whether the updated file differs from the original one.
+    """
+    positions = {key: (position, add) for position, (key, add) in enumerate(edits.items())}
+    subdomains = {subdomain for subdomain, _ in edits}
+    present = set()
+    changed = False
+    for line in lines:
+        fields = line.split(None, 1)
+        if fields and fields[0] in subdomains and not fields[0].startswith(";"):
+            value = _record_value(line)
+            kept = _record_kept(positions, fields[0], value)
+            if kept is False:
+                changed = True
+                continue
+            if kept:
+                logging.error("Subdomain %s already present as a DNS record.", fields[0])
+                present.add((fields[0], value))
+        write(line)
+    for (subdomain, edit_value), add in edits.items():
+        if (
+            add
+            and (subdomain, edit_value) not in present
+            and _record_kept(positions, subdomain, edit_value)
+        ):
+            write(RECORD_CONTENT.format(record=subdomain, value=edit_value))
+            changed = True
+    return changed
+
+
+def rewrite_zone_file(
+    path: Path, edits: Dict[Tuple[str, str | None], bool], durable: bool
+) -> bool:
+    """Edit the records of a DNS record file, streaming it to a file renamed over it.
+
+    The updated content is streamed to a temporary file in the same directory, which is then
+    renamed over the original one, so readers only ever see a complete file. The file is left
+    untouched if the edits do not change it.
+
+    Args:
+        path: the DNS record file.
+        edits: whether to add or remove the record, by subdomain and value, a None value
+            removing all the records of the subdomain.
+        durable: whether to sync the new content to disk before returning.
+
+    Returns:
+        whether the file has been updated.
+    """
+    with path.open(encoding="utf-8") as source:
+        descriptor, temporary = tempfile.mkstemp(prefix=f".{path.name}.", dir=path.parent)
+        try:
+            with os.fdopen(descriptor, "w", encoding="utf-8") as target:
+                changed = edit_zone_lines(source, edits, target.write)
+                if changed and durable:
+                    target.flush()
+                    os.fsync(target.fileno())
+            if changed:
+                os.chmod(temporary, stat.S_IMODE(os.fstat(source.fileno()).st_mode))
+                os.replace(temporary, path)
+        finally:
+            Path(temporary).unlink(missing_ok=True)
+    if changed and durable:
+        directory = os.open(path.parent, os.O_RDONLY)
+        try:
+            os.fsync(directory)
+        finally:
+            os.close(directory)
+    return changed
+
+
+class ZoneIndex:
+    """Parsed DNS record file, locating the records of every owner name.
+
+    Lines are kept in file order, by position, along with the positions of the records of each
+    owner name, so that editing the records of a subdomain only touches these records instead
+    of scanning the whole file.
+    """
+
+    def __init__(self, lines: Iterable[str]):
+        """Parse a DNS record file.
+
+        Args:
+            lines: the lines of the DNS record file.
+        """
+        self._lines: Dict[int, str] = {}
+        self._owners: Dict[str, List[int]] = {}
+        self._next_position = 0
+        for line in lines:
+            fields = line.split(None, 1)
+            self._append(line, fields[0] if fields and not fields[0].startswith(";") else None)
+
+    def _append(self, line: str, owner: str | None) -> None:
+        """Append a line to the file.
+
+        Args:
+            line: the line.
+            owner: the owner name of the record on the line, or None if it holds no record.
+        """
+        self._lines[self._next_position] = line
+        if owner is not None:
+            self._owners.setdefault(owner, []).append(self._next_position)
+        self._next_position += 1
+
+    def edit(self, edits: Dict[Tuple[str, str | None], bool]) -> bool:
+        """Add and remove TXT records, appending the added records missing from the file.
+
+        Args:
+            edits: whether to add or remove the record, by subdomain and value, a None value
+                removing all the records of the subdomain, in the order the edits apply.
+
+        Returns:
+            whether the file differs from the original one.
+        """
+        positions = {key: (position, add) for position, (key, add) in enumerate(edits.items())}
+        present = set()
+        changed = False
+        for subdomain in dict.fromkeys(subdomain for subdomain, _ in edits):
+            kept_positions = []
+            for position in self._owners.pop(subdomain, ()):
+                value = _record_value(self._lines[position])
+                kept = _record_kept(positions, subdomain, value)
+                if kept is False:
+                    del self._lines[position]
+                    changed = True
+                    continue
+                if kept:
+                    logging.error("Subdomain %s already present as a DNS record.", subdomain)
+                    present.add((subdomain, value))
+                kept_positions.append(position)
+            if kept_positions:
+                self._owners[subdomain] = kept_positions
+        for (subdomain, edit_value), add in edits.items():
+            if (
+                add
+                and (subdomain, edit_value) not in present
+                and _record_kept(positions, subdomain, edit_value)
+            ):
+                self._append(RECORD_CONTENT.format(record=subdomain, value=edit_value), subdomain)
+                changed = True
+        return changed
+
+    def content(self) -> bytes:
+        """Get the content of the DNS record file.
+
+        Returns:
+            the content of the file, encoded.
+        """
+        return "".join(self._lines.values()).encode("utf-8")
+
+
+class ZoneIndexCache:
+    """Bounded cache of parsed DNS record files, by git blob SHA of their content.
+
+    Blob SHAs identify the content of a file, so an index never goes stale: a file changed by
+    a fetch gets another SHA and is parsed again, and indexes no longer looked up are
+    evicted. An index is taken out of the cache while it is edited, then cached again under
+    the SHA of its new content.
+    """
+
+    def __init__(self, size: int):
+        """Initialize the cache.
+
+        Args:
+            size: maximum number of DNS record files cached, or 0 to disable the cache.
+        """
+        self._size = size
+        self._entries: OrderedDict[bytes, ZoneIndex] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def take(self, binsha: bytes) -> ZoneIndex | None:
+        """Take the index of a DNS record file out of the cache.
+
+        Args:
+            binsha: the binary SHA of the blob holding the content of the file.
+
+        Returns:
+            the index, or None if the content has to be parsed.
+        """
+        with self._lock:
+            return self._entries.pop(binsha, None)
+
+    def put(self, binsha: bytes, index: ZoneIndex) -> None:
+        """Cache the index of a DNS record file.
+
+        Args:
+            binsha: the binary SHA of the blob holding the content of the file.
+            index: the index.
+        """
+        if self._size <= 0:
+            return
+        with self._lock:
+            self._entries[binsha] = index
+            self._entries.move_to_end(binsha)
+            while len(self._entries) > self._size:
+                self._entries.popitem(last=False)
+
+    def clear(self) -> None:
+        """Drop all the cached indexes."""
+        with self._lock:
+            self._entries.clear()
+
+
+zone_indexes = ZoneIndexCache(DNS_ZONE_INDEX_CACHE_SIZE)
+
+
+def _blob_sha(data: bytes) -> bytes:
+    """Get the binary SHA git gives a blob.
+
+    Args:
+        data: the blob content.
+
+    Returns:
+        the binary SHA of the blob.
+    """
+    sha = hashlib.sha1(f"blob {len(data)}\0".encode("ascii"), usedforsecurity=False)
+    sha.update(data)
+    return sha.digest()
+
+
+@tracer.start_as_current_span("edit_indexed_zone")
+def edit_indexed_zone(
+    binsha: bytes, read: Callable[[], str], edits: Dict[Tuple[str, str | None], bool]
+) -> bytes | None:
+    """Edit the records of a DNS record file through its cached index.
+
+    Args:
+        binsha: the binary SHA of the blob holding the content of the file.
+        read: the function reading the content of the file, called if it is not cached.
+        edits: whether to add or remove the record, by subdomain and value, a None value
+            removing all the records of the subdomain.
+
+    Returns:
+        the updated content of the file, or None if the edits do not change it.
+    """
+    span = trace.get_current_span()
+    index = zone_indexes.take(binsha)
+    span.set_attribute("dns.zone_index.hit", index is not None)
+    if index is None:
+        index = ZoneIndex(io.StringIO(read()))
+    if not index.edit(edits):
+        zone_indexes.put(binsha, index)
+        return None
+    content = index.content()
+    zone_indexes.put(_blob_sha(content), index)
+    return content
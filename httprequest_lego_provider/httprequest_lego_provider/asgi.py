@@ -15,5 +15,17 @@ import os
 from django.core.asgi import get_asgi_application
 
 os.environ.setdefault("DJANGO_SETTINGS_MODULE", "httprequest_lego_provider.settings")
+# Serve the present and cleanup requests with the native async views.
+os.environ.setdefault("DJANGO_DNS_ASGI_VIEWS", "true")
 
 application = get_asgi_application()
+
+# Only the processes serving the requests warm the repository mirrors up and maintain them, not
+# the management commands run by the charm actions.
+from api.dns import (  # noqa: E402 pylint: disable=wrong-import-position
+    start_mirror_maintenance,
+    start_mirror_warmer,
+)
+
+start_mirror_warmer()
+start_mirror_maintenance()
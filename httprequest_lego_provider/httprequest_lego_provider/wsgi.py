@@ -17,3 +17,13 @@ from django.core.wsgi import get_wsgi_application
 os.environ.setdefault("DJANGO_SETTINGS_MODULE", "httprequest_lego_provider.settings")
 
 application = get_wsgi_application()
+
+# Only the processes serving the requests warm the repository mirrors up and maintain them, not
+# the management commands run by the charm actions.
+from api.dns import (  # noqa: E402 pylint: disable=wrong-import-position
+    start_mirror_maintenance,
+    start_mirror_warmer,
+)
+
+start_mirror_warmer()
+start_mirror_maintenance()
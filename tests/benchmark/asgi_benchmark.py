@@ -0,0 +1,439 @@
+#!/usr/bin/env python3
+# Copyright 2026 Canonical Ltd.
+# See LICENSE file for licensing details.
+
+r"""Concurrency benchmark of the present endpoint served over WSGI and over ASGI.
+
+Over WSGI, every in-flight ``present`` request holds a worker thread for its whole git
+round-trip, so the number of threads caps how many challenges can be in flight. Over ASGI,
+the native async views wait for the round-trip from the event loop instead.
+
+The benchmark builds the same synthetic DNS-records repository as ``benchmark.py`` and serves
+the provider twice on a local port, each time from its own process and test database: first
+over WSGI, from a pool of ``--wsgi-threads`` threads as a threaded worker would, then over
+ASGI with uvicorn. For every concurrency level, it keeps that many ``present`` requests for
+distinct subdomains in flight and reports the requests per second and the latency
+percentiles of both servers.
+
+Usage:
+    python tests/benchmark/asgi_benchmark.py \\
+        --commits 2000 \\
+        --concurrency 1 10 100 \\
+        --requests 200 \\
+        --batch-window 0.05
+"""
+
+import argparse
+import asyncio
+import base64
+import logging
+import math
+import os
+import secrets
+import socket
+import subprocess  # nosec B404
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from tempfile import TemporaryDirectory
+from urllib.parse import urlencode
+
+from benchmark import FQDN_PREFIX, build_git_repo, build_zone_dir
+
+logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(message)s")
+logger = logging.getLogger(__name__)
+
+SERVERS = ("wsgi", "asgi")
+USERNAME = "benchmark"
+
+
+def _serve_wsgi(port: int, threads: int) -> None:
+    """Serve the provider over WSGI from a bounded pool of threads.
+
+    Args:
+        port: the local port to listen on.
+        threads: the number of threads handling requests.
+    """
+    from wsgiref.simple_server import WSGIRequestHandler, WSGIServer
+
+    from django.core.wsgi import get_wsgi_application
+
+    class QuietHandler(WSGIRequestHandler):
+        """Request handler not logging every request."""
+
+        def log_message(self, *args) -> None:  # pylint: disable=arguments-differ
+            """Drop the access log line.
+
+            Args:
+                args: the log message arguments.
+            """
+
+    class PooledWSGIServer(WSGIServer):
+        """WSGI server handling requests from a pool of threads."""
+
+        request_queue_size = 1024
+
+        def __init__(self, *args, **kwargs):
+            """Initialize the server.
+
+            Args:
+                args: the server arguments.
+                kwargs: the server keyword arguments.
+            """
+            super().__init__(*args, **kwargs)
+            self._pool = ThreadPoolExecutor(max_workers=threads)
+
+        def _handle(self, request, client_address) -> None:
+            """Handle a request from a thread of the pool.
+
+            Args:
+                request: the client socket.
+                client_address: the client address.
+            """
+            try:
+                self.finish_request(request, client_address)
+            except Exception:  # pylint: disable=broad-exception-caught
+                self.handle_error(request, client_address)
+            finally:
+                self.shutdown_request(request)
+
+        def process_request(self, request, client_address) -> None:
+            """Hand a request over to the pool.
+
+            Args:
+                request: the client socket.
+                client_address: the client address.
+            """
+            self._pool.submit(self._handle, request, client_address)
+
+    server = PooledWSGIServer(("127.0.0.1", port), QuietHandler)
+    server.set_app(get_wsgi_application())
+    server.serve_forever()
+
+
+def _serve_asgi(port: int) -> None:
+    """Serve the provider over ASGI with uvicorn.
+
+    Args:
+        port: the local port to listen on.
+    """
+    import uvicorn
+
+    from httprequest_lego_provider.asgi import application
+
+    uvicorn.run(application, host="127.0.0.1", port=port, log_level="warning", lifespan="off")
+
+
+def _seed_database(domains: list[str]) -> str:
+    """Create the benchmark user and grant it access to the subdomains of the domains.
+
+    Args:
+        domains: the domain FQDNs to grant access to.
+
+    Returns:
+        The authorization header value for the benchmark user.
+    """
+    from api.models import AccessLevel, Domain, DomainUserPermission
+    from django.contrib.auth.models import User
+
+    credential = secrets.token_hex()
+    user = User.objects.create_user(USERNAME, password=credential)
+    for fqdn in domains:
+        DomainUserPermission.objects.create(
+            domain=Domain.objects.create(fqdn=fqdn),
+            user=user,
+            access_level=AccessLevel.SUBDOMAIN,
+        )
+    token = base64.b64encode(f"{USERNAME}:{credential}".encode()).decode()
+    return f"Basic {token}"
+
+
+def serve(options: argparse.Namespace) -> None:
+    """Serve the provider on a fresh test database until terminated.
+
+    Prints the authorization header of the benchmark user once the server is about to listen.
+
+    Args:
+        options: the parsed command-line options.
+    """
+    os.environ["DJANGO_GIT_REPO"] = options.repo_url
+    os.environ["DJANGO_DNS_BACKEND"] = options.backend
+    os.environ["DJANGO_DNS_ZONE_DIR"] = options.zone_dir
+    os.environ["DJANGO_DNS_BATCH_WINDOW"] = str(options.batch_window)
+    os.environ["DJANGO_DNS_ASGI_VIEWS"] = str(options.serve == "asgi").lower()
+    os.environ.setdefault("DJANGO_SETTINGS_MODULE", "api.tests.settings")
+
+    import django
+
+    django.setup()
+
+    from django.conf import settings
+    from django.test.runner import DiscoverRunner
+    from django.test.utils import setup_test_environment
+
+    setup_test_environment()
+    # A file database can be shared by the threads serving the requests.
+    settings.DATABASES["default"]["TEST"] = {"NAME": options.database}
+    DiscoverRunner(verbosity=0).setup_databases()
+    print(_seed_database(options.domain), flush=True)
+    if options.serve == "asgi":
+        _serve_asgi(options.port)
+    else:
+        _serve_wsgi(options.port, options.wsgi_threads)
+
+
+async def _present(port: int, index: int, domains: list[str], auth: str) -> tuple[int, float]:
+    """Issue a single present request for a distinct subdomain.
+
+    Args:
+        port: the local port of the server.
+        index: the request number, used to pick a distinct subdomain.
+        domains: the domain FQDNs to exercise.
+        auth: the authorization header value.
+
+    Returns:
+        The response status code and the request duration in seconds.
+    """
+    body = urlencode(
+        {
+            "fqdn": f"{FQDN_PREFIX}w{index}.{domains[index % len(domains)]}",
+            "value": secrets.token_hex(),
+        }
+    ).encode()
+    start = time.perf_counter()
+    reader, writer = await asyncio.open_connection("127.0.0.1", port)
+    writer.write(
+        (
+            f"POST /present HTTP/1.1\r\nHost: 127.0.0.1:{port}\r\nAuthorization: {auth}\r\n"
+            "Content-Type: application/x-www-form-urlencoded\r\n"
+            f"Content-Length: {len(body)}\r\nConnection: close\r\n\r\n"
+        ).encode()
+        + body
+    )
+    await writer.drain()
+    status_line = await reader.readline()
+    await reader.read()
+    elapsed = time.perf_counter() - start
+    writer.close()
+    await writer.wait_closed()
+    return int(status_line.split()[1]), elapsed
+
+
+async def _load(
+    port: int, concurrency: int, requests: int, offset: int, domains: list[str], auth: str
+) -> tuple[float, list[float], int]:
+    """Keep a number of present requests in flight until all of them are answered.
+
+    Args:
+        port: the local port of the server.
+        concurrency: the number of requests in flight.
+        requests: the total number of requests.
+        offset: the number of the first request, so that every subdomain is distinct.
+        domains: the domain FQDNs to exercise.
+        auth: the authorization header value.
+
+    Returns:
+        The wall time in seconds, the duration of every request and the number of failures.
+    """
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def bounded(index: int) -> tuple[int, float]:
+        """Issue a present request once fewer than the concurrency are in flight.
+
+        Args:
+            index: the request number.
+
+        Returns:
+            The response status code and the request duration in seconds.
+        """
+        async with semaphore:
+            return await _present(port, index, domains, auth)
+
+    start = time.perf_counter()
+    outcomes = await asyncio.gather(*(bounded(offset + i) for i in range(requests)))
+    wall = time.perf_counter() - start
+    return (
+        wall,
+        [elapsed for _, elapsed in outcomes],
+        sum(1 for status, _ in outcomes if status != 204),
+    )
+
+
+def _percentile(times: list[float], percent: float) -> float:
+    """Get a percentile of durations.
+
+    Args:
+        times: the durations.
+        percent: the percentile, between 0 and 100.
+
+    Returns:
+        The duration below which the given percentage of the durations fall.
+    """
+    ordered = sorted(times)
+    return ordered[max(math.ceil(len(ordered) * percent / 100) - 1, 0)]
+
+
+def _free_port() -> int:
+    """Get a free local port.
+
+    Returns:
+        The port number.
+    """
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def _wait_for_port(port: int, timeout: float = 30) -> None:
+    """Wait for a server to listen on a local port.
+
+    Args:
+        port: the port number.
+        timeout: the maximum number of seconds to wait.
+
+    Raises:
+        TimeoutError: if the server does not listen in time.
+    """
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        with socket.socket() as sock:
+            if sock.connect_ex(("127.0.0.1", port)) == 0:
+                return
+        time.sleep(0.1)
+    raise TimeoutError(f"no server listening on port {port}")
+
+
+def run_benchmark(
+    base_dir: Path, repo_url: str, zone_dir: Path, domains: list[str], options: argparse.Namespace
+) -> None:
+    """Drive concurrent present requests against the WSGI and the ASGI servers.
+
+    Args:
+        base_dir: directory in which to create the test databases.
+        repo_url: the ``file://`` URL of the DNS-records repository.
+        zone_dir: the directory holding the zone files for the local backend.
+        domains: the domain FQDNs seeded in the repository and database.
+        options: the parsed command-line options.
+    """
+    env = dict(os.environ)
+    # Isolate git from the host configuration, as benchmark.py does.
+    env["GIT_CONFIG_GLOBAL"] = os.devnull
+    env["GIT_CONFIG_SYSTEM"] = os.devnull
+    for variable in ("GIT_AUTHOR", "GIT_COMMITTER"):
+        env.setdefault(f"{variable}_NAME", "benchmark")
+        env.setdefault(f"{variable}_EMAIL", "benchmark@example.com")
+    for server in SERVERS:
+        port = _free_port()
+        command = [
+            sys.executable,
+            __file__,
+            "--serve",
+            server,
+            "--port",
+            str(port),
+            "--repo-url",
+            repo_url,
+            "--zone-dir",
+            str(zone_dir),
+            "--database",
+            str(base_dir / f"{server}.sqlite3"),
+            "--backend",
+            options.backend,
+            "--batch-window",
+            str(options.batch_window),
+            "--wsgi-threads",
+            str(options.wsgi_threads),
+            *(argument for domain in domains for argument in ("--domain", domain)),
+        ]
+        logger.info("Starting the %s server on port %d", server, port)
+        with subprocess.Popen(  # nosec B603
+            command, stdout=subprocess.PIPE, text=True, env=env
+        ) as process:
+            try:
+                assert process.stdout is not None  # nosec B101
+                auth = process.stdout.readline().strip()
+                _wait_for_port(port)
+                offset = 0
+                for concurrency in options.concurrency:
+                    wall, times, failures = asyncio.run(
+                        _load(port, concurrency, options.requests, offset, domains, auth)
+                    )
+                    offset += options.requests
+                    print(
+                        f"{server} concurrency={concurrency}: requests={options.requests} "
+                        f"failures={failures} wall={wall:.3f}s "
+                        f"requests/s={options.requests / wall:.1f} "
+                        f"p50={_percentile(times, 50) * 1000:.1f}ms "
+                        f"p99={_percentile(times, 99) * 1000:.1f}ms",
+                        flush=True,
+                    )
+            finally:
+                process.terminate()
+
+
+def main(argv: list[str] | None = None) -> int:
+    """Run the benchmark.
+
+    Args:
+        argv: command-line arguments.
+
+    Returns:
+        Process exit code.
+    """
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument(
+        "--commits", type=int, default=2000, help="Depth of the synthetic commit history."
+    )
+    parser.add_argument(
+        "--domains", type=int, default=5, help="Number of *.domain zone files to create."
+    )
+    parser.add_argument(
+        "--concurrency",
+        type=int,
+        nargs="+",
+        default=[1, 10, 100],
+        help="Numbers of requests kept in flight.",
+    )
+    parser.add_argument(
+        "--requests", type=int, default=200, help="Number of requests per concurrency level."
+    )
+    parser.add_argument(
+        "--batch-window",
+        type=float,
+        default=0.0,
+        help="Seconds the writer waits to group concurrent record changes into one push.",
+    )
+    parser.add_argument(
+        "--backend",
+        choices=("git", "local"),
+        default="git",
+        help="Where record changes are written: the git repository or a local zone directory.",
+    )
+    parser.add_argument(
+        "--wsgi-threads",
+        type=int,
+        default=8,
+        help="Number of threads handling requests on the WSGI server.",
+    )
+    # Internal options used to start the servers.
+    parser.add_argument("--serve", choices=SERVERS, help=argparse.SUPPRESS)
+    parser.add_argument("--port", type=int, help=argparse.SUPPRESS)
+    parser.add_argument("--repo-url", help=argparse.SUPPRESS)
+    parser.add_argument("--zone-dir", help=argparse.SUPPRESS)
+    parser.add_argument("--database", help=argparse.SUPPRESS)
+    parser.add_argument("--domain", action="append", default=[], help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+
+    if args.serve:
+        serve(args)
+        return 0
+    with TemporaryDirectory() as tmp_dir:
+        repo_url, domains = build_git_repo(Path(tmp_dir), args.domains, args.commits, 0)
+        zone_dir = build_zone_dir(Path(tmp_dir), domains)
+        run_benchmark(Path(tmp_dir), repo_url, zone_dir, domains, args)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,130 @@
+#!/usr/bin/env python3
+# Copyright 2026 Canonical Ltd.
+# See LICENSE file for licensing details.
+
+r"""Micro-benchmark of the HTTP Basic authentication cost of a present/cleanup request.
+
+Lego authenticates every call with HTTP Basic. For each request, the benchmark builds a
+request carrying the credentials of a user stored in a real test database, hashed with the
+configured password hasher, and times its authentication by DRF's ``BasicAuthentication``,
+which hashes the password every time, and by ``CachedBasicAuthentication``. The first
+authentication by the latter verifies the password and caches it, the following ones hit the
+cache, so cold and warm authentications are reported apart, along with how many queries they
+run.
+
+Usage:
+    python tests/benchmark/authentication_benchmark.py --requests 100
+"""
+
+import argparse
+import base64
+import logging
+import os
+import sys
+import time
+
+import django
+
+logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(message)s")
+logger = logging.getLogger(__name__)
+
+USERNAME = "benchmark"
+PASSWORD = "benchmark-password"  # nosec
+
+
+def _build_request():
+    """Build a present request authenticated with HTTP Basic.
+
+    Returns:
+        The request.
+    """
+    from rest_framework.request import Request
+    from rest_framework.test import APIRequestFactory
+
+    credentials = base64.b64encode(f"{USERNAME}:{PASSWORD}".encode()).decode()
+    return Request(APIRequestFactory().post("/present", HTTP_AUTHORIZATION=f"Basic {credentials}"))
+
+
+def _time_authentication(authentication, requests: int) -> tuple[float, int]:
+    """Time the authentication of requests.
+
+    Args:
+        authentication: the authentication class instance.
+        requests: the number of requests to authenticate.
+
+    Returns:
+        The mean duration of an authentication in seconds and the number of queries per
+        authentication.
+    """
+    from django.db import connection
+    from django.test.utils import CaptureQueriesContext
+
+    request = _build_request()
+    start = time.perf_counter()
+    with CaptureQueriesContext(connection) as queries:
+        for _ in range(requests):
+            user, _ = authentication.authenticate(request)
+            assert user.username == USERNAME, "unexpected user authenticated"
+    return (time.perf_counter() - start) / requests, len(queries) // requests
+
+
+def run_benchmark(options: argparse.Namespace) -> None:
+    """Time the authentication with and without the credential cache.
+
+    Args:
+        options: the parsed command-line options.
+    """
+    os.environ.setdefault("DJANGO_SETTINGS_MODULE", "api.tests.settings")
+    django.setup()
+
+    from django.test.utils import setup_test_environment, teardown_test_environment
+
+    setup_test_environment()
+
+    from django.test.runner import DiscoverRunner
+
+    runner = DiscoverRunner(verbosity=0)
+    old_config = runner.setup_databases()
+    try:
+        from api.authentication import CachedBasicAuthentication, credential_cache
+        from django.contrib.auth.models import User
+        from rest_framework.authentication import BasicAuthentication
+
+        User.objects.create_user(USERNAME, password=PASSWORD)
+        uncached, uncached_queries = _time_authentication(BasicAuthentication(), options.requests)
+        print(
+            f"uncached: mean={uncached * 1000:.3f}ms queries={uncached_queries}",
+            flush=True,
+        )
+        credential_cache.clear()
+        cold, cold_queries = _time_authentication(CachedBasicAuthentication(), 1)
+        warm, warm_queries = _time_authentication(CachedBasicAuthentication(), options.requests)
+        print(
+            f"cached: cold={cold * 1000:.3f}ms cold_queries={cold_queries} "
+            f"warm={warm * 1000:.3f}ms warm_queries={warm_queries}",
+            flush=True,
+        )
+    finally:
+        runner.teardown_databases(old_config)
+        teardown_test_environment()
+
+
+def main(argv: list[str] | None = None) -> int:
+    """Run the benchmark.
+
+    Args:
+        argv: command-line arguments.
+
+    Returns:
+        Process exit code.
+    """
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument(
+        "--requests", type=int, default=100, help="Number of requests timed per mode."
+    )
+    run_benchmark(parser.parse_args(argv))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -4,9 +4,10 @@
 
 r"""Benchmark for the httprequest-lego-provider DNS request path.
 
-Reveals the known bottleneck in ``api/dns.py``: every ``present`` / ``cleanup`` request
-performs a full ``git clone`` of the DNS-records repository, which grows slower as the
-repository accumulates history.
+Measures the git round-trip in ``api/dns.py``. The DNS-records repository is cloned once per
+process into a long-lived mirror, and every ``present`` / ``cleanup`` request then pays an
+incremental ``git fetch`` instead of a full ``git clone``, whose cost grows as the repository
+accumulates history.
 
 The benchmark builds a synthetic git repository whose shape mirrors a real DNS-records
 repository -- a long commit history made of many small, one-record-per-commit changes
@@ -14,7 +15,7 @@ across several ``*.domain`` zone files, exactly the churn ``write_dns_record`` a
 ``remove_dns_record`` produce over time. It then drives ``present`` and ``cleanup``
 requests through the real Django view layer (via the Django test client) against a real
 test database, so the emitted trace shows the full ``request -> form -> permission-query
--> git`` flow with ``git.clone`` dominating.
+-> git`` flow and how the git time splits between the initial clone and the fetches.
 
 All spans produced by the in-code OpenTelemetry instrumentation are collected in memory
 and written as an OTLP JSON traces file (``resourceSpans`` format) that
@@ -26,10 +27,19 @@ Usage:
         --domains 5 \\
         --iterations 10 \\
         --traces-output traces.json
+
+Pass ``--concurrency`` to fire concurrent ``present`` requests instead, and
+``--batch-window`` to let the provider group them into fewer commits and pushes. Pass
+``--backend local`` to write the zone files straight to a local directory instead of the git
+repository, to compare both backends. Pass ``--files`` to pad the repository with zone files
+that are never touched, to measure the cost of the tree width separately from the history
+depth. Pass ``--batch`` to compare, for that many subdomains, one single ``present`` and
+``cleanup`` call per record with one call to the batch endpoints holding all of them.
 """
 
 import argparse
 import base64
+import json
 import logging
 import os
 import secrets
@@ -37,6 +47,7 @@ import shutil
 import subprocess  # nosec B404
 import sys
 import time
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 from tempfile import TemporaryDirectory
 
@@ -189,7 +200,7 @@ class _FastImportStream:
         return b"".join(self._chunks) + b"done\n"
 
 
-def _fast_import_stream(domains: list[str], num_commits: int) -> bytes:
+def _fast_import_stream(domains: list[str], num_commits: int, num_files: int) -> bytes:
     """Build a ``git fast-import`` stream for a long, realistic DNS-records history.
 
     The stream seeds one zone file per domain, then applies ``num_commits`` incremental
@@ -201,14 +212,17 @@ def _fast_import_stream(domains: list[str], num_commits: int) -> bytes:
     Args:
         domains: the domain FQDNs to create zone files for.
         num_commits: the number of incremental record-change commits to add.
+        num_files: the total number of zone files, padded with zone files for unused domains.
 
     Returns:
         The encoded fast-import stream.
     """
     stream = _FastImportStream()
 
+    padding = [f"unused{i}.example.net" for i in range(num_files - len(domains))]
     seed_changes = [
-        (stream.add_blob(_zone_content(domain)), f"{domain}.domain") for domain in domains
+        (stream.add_blob(_zone_content(domain)), f"{domain}.domain")
+        for domain in domains + padding
     ]
     stream.add_commit("Seed zone files", seed_changes)
 
@@ -220,17 +234,22 @@ def _fast_import_stream(domains: list[str], num_commits: int) -> bytes:
     return stream.getvalue()
 
 
-def build_git_repo(base_dir: Path, num_domains: int, num_commits: int) -> tuple[str, list[str]]:
+def build_git_repo(
+    base_dir: Path, num_domains: int, num_commits: int, num_files: int
+) -> tuple[str, list[str]]:
     """Build a synthetic DNS-records repository with a realistic long history.
 
     Creates a bare "remote" repository and populates it, via a single ``git fast-import``
     stream, with ``num_domains`` zone files and ``num_commits`` incremental record changes,
-    mimicking how the provider accumulates history one record at a time.
+    mimicking how the provider accumulates history one record at a time. The tree is padded
+    up to ``num_files`` zone files that the requests never touch. The remote allows partial
+    clones, as the usual git hosting services do.
 
     Args:
         base_dir: directory in which to create the repository.
-        num_domains: number of ``*.domain`` zone files to create.
+        num_domains: number of ``*.domain`` zone files exercised by the requests.
         num_commits: number of incremental record-change commits to add.
+        num_files: total number of ``*.domain`` zone files in the tree.
 
     Returns:
         A tuple of the ``file://`` URL of the bare remote and the list of domain FQDNs.
@@ -240,10 +259,17 @@ def build_git_repo(base_dir: Path, num_domains: int, num_commits: int) -> tuple[
     """
     remote = base_dir / "remote.git"
     _git(base_dir, "init", "--bare", "-b", "main", str(remote))
+    _git(remote, "config", "uploadpack.allowFilter", "true")
 
     domains = [f"example{i}.com" for i in range(num_domains)]
-    logger.info("Building %d commits of history across %d zone files", num_commits, num_domains)
-    stream = _fast_import_stream(domains, num_commits)
+    num_files = max(num_files, num_domains)
+    logger.info(
+        "Building %d commits of history across %d of %d zone files",
+        num_commits,
+        num_domains,
+        num_files,
+    )
+    stream = _fast_import_stream(domains, num_commits, num_files)
     result = subprocess.run(  # nosec B603
         [GIT, "fast-import", "--quiet", "--done"],
         cwd=str(remote),
@@ -260,6 +286,23 @@ def build_git_repo(base_dir: Path, num_domains: int, num_commits: int) -> tuple[
     return f"file://{remote}", domains
 
 
+def build_zone_dir(base_dir: Path, domains: list[str]) -> Path:
+    """Create a local directory holding a zone file per domain, for the local backend.
+
+    Args:
+        base_dir: directory in which to create the zone directory.
+        domains: the domain FQDNs to create zone files for.
+
+    Returns:
+        The path of the zone directory.
+    """
+    zone_dir = base_dir / "zones"
+    zone_dir.mkdir()
+    for domain in domains:
+        (zone_dir / f"{domain}.domain").write_bytes(_zone_content(domain))
+    return zone_dir
+
+
 def setup_tracing():
     """Configure the global OpenTelemetry tracer with an in-memory exporter.
 
@@ -300,33 +343,50 @@ def export_traces(exporter, output: Path) -> int:
 
 
 def _report_clone_share(spans) -> None:
-    """Print how much wall-clock time is spent in ``git.clone`` versus the request roots.
+    """Print how much wall-clock time is spent in git and the backends versus the request roots.
 
     Args:
         spans: the finished spans collected by the exporter.
     """
-    clone_ns = sum(s.end_time - s.start_time for s in spans if s.name == "git.clone")
     root_ns = sum(
         s.end_time - s.start_time for s in spans if s.name in ("handle_present", "handle_cleanup")
     )
     if not root_ns:
         return
-    print(
-        f"git.clone total={clone_ns / 1e9:.3f}s "
-        f"({100 * clone_ns / root_ns:.1f}% of request time)",
-        flush=True,
-    )
+    for name in (
+        "git.clone",
+        "git.fetch",
+        "git.sparse_checkout",
+        "_apply_record_changes",
+        "LocalRecordBackend.apply",
+    ):
+        span_ns = sum(s.end_time - s.start_time for s in spans if s.name == name)
+        if not span_ns:
+            continue
+        print(
+            f"{name} total={span_ns / 1e9:.3f}s ({100 * span_ns / root_ns:.1f}% of request time)",
+            flush=True,
+        )
 
 
-def run_benchmark(repo_url: str, domains: list[str], iterations: int) -> None:
+def run_benchmark(
+    repo_url: str, zone_dir: Path, domains: list[str], options: argparse.Namespace
+) -> None:
     """Drive present/cleanup requests through the Django view layer.
 
     Args:
         repo_url: the ``file://`` URL of the DNS-records repository.
+        zone_dir: the directory holding the zone files for the local backend.
         domains: the domain FQDNs seeded in the repository and database.
-        iterations: number of present/cleanup cycles to run.
+        options: the parsed command-line options.
     """
     os.environ["DJANGO_GIT_REPO"] = repo_url
+    os.environ["DJANGO_DNS_BACKEND"] = options.backend
+    os.environ["DJANGO_DNS_ZONE_DIR"] = str(zone_dir)
+    os.environ["DJANGO_DNS_BATCH_WINDOW"] = str(options.batch_window)
+    os.environ["DJANGO_DNS_GIT_WRITER"] = options.git_writer
+    if options.batch:
+        os.environ["DJANGO_DNS_BATCH_MAX_RECORDS"] = str(options.batch)
     os.environ.setdefault("DJANGO_SETTINGS_MODULE", "api.tests.settings")
     # Isolate every git invocation (including the provider's GitPython clone/commit path)
     # from the host's system/global git configuration, so runner settings such as commit
@@ -350,22 +410,31 @@ def run_benchmark(repo_url: str, domains: list[str], iterations: int) -> None:
     runner = DiscoverRunner(verbosity=0)
     old_config = runner.setup_databases()
     try:
-        _drive_requests(domains, iterations)
+        auth = _seed_database(domains)
+        if options.batch:
+            remote = Path(repo_url.removeprefix("file://")) if options.backend == "git" else None
+            _drive_batch_requests(domains, options.batch, auth, remote)
+        elif options.concurrency > 1:
+            remote = Path(repo_url.removeprefix("file://")) if options.backend == "git" else None
+            _drive_concurrent_requests(domains, options, auth, remote)
+        else:
+            _drive_requests(domains, options.iterations, auth)
     finally:
         runner.teardown_databases(old_config)
         teardown_test_environment()
 
 
-def _drive_requests(domains: list[str], iterations: int) -> None:
-    """Seed the database and issue present/cleanup requests.
+def _seed_database(domains: list[str]) -> dict:
+    """Create the benchmark user and grant it access to the domains and their subdomains.
 
     Args:
-        domains: the domain FQDNs to seed and exercise.
-        iterations: number of present/cleanup cycles to run.
+        domains: the domain FQDNs to grant access to.
+
+    Returns:
+        The authorization header for the benchmark user.
     """
     from api.models import AccessLevel, Domain, DomainUserPermission
     from django.contrib.auth.models import User
-    from django.test import Client
 
     username = "benchmark"
     credential = secrets.token_hex()
@@ -374,12 +443,25 @@ def _drive_requests(domains: list[str], iterations: int) -> None:
     user.save()
     for fqdn in domains:
         domain = Domain.objects.create(fqdn=fqdn)
-        DomainUserPermission.objects.create(
-            domain=domain, user=user, access_level=AccessLevel.DOMAIN
-        )
+        for access_level in (AccessLevel.DOMAIN, AccessLevel.SUBDOMAIN):
+            DomainUserPermission.objects.create(
+                domain=domain, user=user, access_level=access_level
+            )
 
     token = base64.b64encode(f"{username}:{credential}".encode()).decode()
-    auth = {"AUTHORIZATION": f"Basic {token}"}
+    return {"AUTHORIZATION": f"Basic {token}"}
+
+
+def _drive_requests(domains: list[str], iterations: int, auth: dict) -> None:
+    """Issue sequential present/cleanup requests.
+
+    Args:
+        domains: the domain FQDNs to exercise.
+        iterations: number of present/cleanup cycles to run.
+        auth: the authorization header for the benchmark user.
+    """
+    from django.test import Client
+
     client = Client()
 
     present_times = []
@@ -403,6 +485,143 @@ def _drive_requests(domains: list[str], iterations: int) -> None:
     _report("cleanup", cleanup_times)
 
 
+def _count_commits(remote: Path) -> int:
+    """Count the commits on the main branch of the remote repository.
+
+    Args:
+        remote: the path of the bare remote repository.
+
+    Returns:
+        The number of commits.
+    """
+    result = subprocess.run(  # nosec B603
+        [GIT, "rev-list", "--count", "main"],
+        cwd=str(remote),
+        capture_output=True,
+        text=True,
+        env=_git_env(),
+        check=True,
+    )
+    return int(result.stdout)
+
+
+def _drive_concurrent_requests(
+    domains: list[str], options: argparse.Namespace, auth: dict, remote: Path | None
+) -> None:
+    """Fire concurrent present requests for distinct subdomains and report push throughput.
+
+    Args:
+        domains: the domain FQDNs to exercise.
+        options: the parsed command-line options.
+        auth: the authorization header for the benchmark user.
+        remote: the path of the bare remote repository, to count the pushed commits, or None
+            when the records are not written to git.
+    """
+    from django.db import connection
+    from django.test import Client
+
+    def present(index: int) -> float:
+        """Issue a single present request.
+
+        Args:
+            index: the request number, used to pick a distinct subdomain.
+
+        Returns:
+            The request duration in seconds.
+        """
+        client = Client()
+        challenge = f"{FQDN_PREFIX}w{index}.{domains[index % len(domains)]}"
+        start = time.perf_counter()
+        response = client.post(
+            "/present", data={"fqdn": challenge, "value": secrets.token_hex()}, headers=auth
+        )
+        elapsed = time.perf_counter() - start
+        connection.close()
+        assert response.status_code == 204, f"present failed: {response.status_code}"
+        return elapsed
+
+    commits_before = _count_commits(remote) if remote else 0
+    requests = options.iterations * options.concurrency
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=options.concurrency) as pool:
+        times = list(pool.map(present, range(requests)))
+    wall = time.perf_counter() - start
+
+    _report(f"present (concurrency={options.concurrency})", times)
+    if remote is None:
+        print(
+            f"throughput: requests={requests} wall={wall:.3f}s requests/s={requests / wall:.1f}",
+            flush=True,
+        )
+        return
+    pushes = _count_commits(remote) - commits_before
+    print(
+        f"throughput: requests={requests} pushes={pushes} wall={wall:.3f}s "
+        f"requests/s={requests / wall:.1f} pushes/s={pushes / wall:.1f} "
+        f"requests/push={requests / max(pushes, 1):.1f}",
+        flush=True,
+    )
+
+
+def _drive_batch_requests(
+    domains: list[str], records: int, auth: dict, remote: Path | None
+) -> None:
+    """Compare single present/cleanup calls for many records with one batch call.
+
+    Args:
+        domains: the domain FQDNs to exercise.
+        records: the number of records, on distinct subdomains, per certificate.
+        auth: the authorization header for the benchmark user.
+        remote: the path of the bare remote repository, to count the pushed commits, or None
+            when the records are not written to git.
+    """
+    from django.test import Client
+
+    client = Client()
+    # The batch calls get records of their own: sending the records the single calls have just
+    # presented or cleaned up again would not change any zone file, nor push anything.
+    single_items, batch_items = (
+        [
+            {
+                "fqdn": f"{FQDN_PREFIX}{run}{i}.{domains[i % len(domains)]}",
+                "value": secrets.token_hex(),
+            }
+            for i in range(records)
+        ]
+        for run in ("single", "batch")
+    )
+    for endpoint in ("/present", "/cleanup"):
+        commits_before = _count_commits(remote) if remote else 0
+        start = time.perf_counter()
+        for item in single_items:
+            response = client.post(endpoint, data=item, headers=auth)
+            assert response.status_code == 204, f"{endpoint} failed: {response.status_code}"
+        single = time.perf_counter() - start
+        single_pushes = (_count_commits(remote) - commits_before) if remote else 0
+
+        commits_before = _count_commits(remote) if remote else 0
+        start = time.perf_counter()
+        response = client.post(
+            f"{endpoint}/batch",
+            data=json.dumps(batch_items),
+            content_type="application/json",
+            headers=auth,
+        )
+        batch = time.perf_counter() - start
+        batch_pushes = (_count_commits(remote) - commits_before) if remote else 0
+        assert response.status_code == 200, f"{endpoint}/batch failed: {response.status_code}"
+        statuses = {result["status"] for result in response.json()["results"]}
+        assert statuses == {204}, f"{endpoint}/batch failed: {statuses}"
+        assert not remote or batch_pushes == 1, f"{endpoint}/batch pushed {batch_pushes} times"
+
+        print(
+            f"{endpoint.lstrip('/')}: records={records} single={single:.3f}s "
+            f"single_pushes={single_pushes} batch={batch:.3f}s batch_pushes={batch_pushes} "
+            f"speedup={single / batch:.1f}x",
+            flush=True,
+        )
+
+
 def _report(label: str, times: list[float]) -> None:
     """Print timing statistics for a series of requests.
 
@@ -439,9 +658,50 @@ def main(argv: list[str] | None = None) -> int:
     parser.add_argument(
         "--domains", type=int, default=5, help="Number of *.domain zone files to create."
     )
+    parser.add_argument(
+        "--files",
+        type=int,
+        default=0,
+        help="Total number of *.domain zone files in the tree, padded with zone files that are "
+        "never touched (primary knob for tree width). Defaults to --domains.",
+    )
     parser.add_argument(
         "--iterations", type=int, default=10, help="Number of present/cleanup cycles to run."
     )
+    parser.add_argument(
+        "--concurrency",
+        type=int,
+        default=1,
+        help="Number of concurrent clients; above 1, fires concurrent present requests and "
+        "reports pushes per second instead of the sequential present/cleanup cycles.",
+    )
+    parser.add_argument(
+        "--batch",
+        type=int,
+        default=0,
+        help="Number of records per certificate; if set, compares one present/cleanup call per "
+        "record with a single call to the batch endpoints.",
+    )
+    parser.add_argument(
+        "--batch-window",
+        type=float,
+        default=0.0,
+        help="Seconds the writer waits to group concurrent record changes into one push.",
+    )
+    parser.add_argument(
+        "--backend",
+        choices=("git", "local"),
+        default="git",
+        help="Where record changes are written: committed and pushed to the git repository, or "
+        "rewritten in place in a local zone directory.",
+    )
+    parser.add_argument(
+        "--git-writer",
+        choices=("worktree", "objectdb"),
+        default="worktree",
+        help="How record changes are committed: through a checked-out working tree and git "
+        "subprocesses, or straight into the object database in process.",
+    )
     parser.add_argument(
         "--traces-output",
         type=Path,
@@ -452,8 +712,9 @@ def main(argv: list[str] | None = None) -> int:
 
     exporter = setup_tracing()
     with TemporaryDirectory() as tmp_dir:
-        repo_url, domains = build_git_repo(Path(tmp_dir), args.domains, args.commits)
-        run_benchmark(repo_url, domains, args.iterations)
+        repo_url, domains = build_git_repo(Path(tmp_dir), args.domains, args.commits, args.files)
+        zone_dir = build_zone_dir(Path(tmp_dir), domains)
+        run_benchmark(repo_url, zone_dir, domains, args)
     export_traces(exporter, args.traces_output)
     return 0
 
@@ -0,0 +1,159 @@
+#!/usr/bin/env python3
+# Copyright 2026 Canonical Ltd.
+# See LICENSE file for licensing details.
+
+r"""Benchmark of the repository history compaction.
+
+The DNS-records repository gets a commit for every record change, so the cost of cloning it
+grows with its history. ``compact_history`` squashes the history behind a checkpoint commit,
+keeping the most recent commits, so that the branch stops growing.
+
+The benchmark builds the same synthetic DNS-records repository as ``benchmark.py``, with a
+long history of one-record-per-commit changes, and times a full blobless clone, a shallow
+clone like the one the provider keeps, and an incremental fetch of a full clone after a new
+commit. It then compacts the history, timing the compaction itself, and times the same
+operations on the compacted branch.
+
+Usage:
+    python tests/benchmark/compaction_benchmark.py \\
+        --commits 100000 \\
+        --keep 100 \\
+        --repeat 3
+"""
+
+import argparse
+import logging
+import os
+import shutil
+import statistics
+import subprocess  # nosec B404
+import sys
+import time
+from pathlib import Path
+from tempfile import TemporaryDirectory
+
+from benchmark import GIT, _git, _git_env, build_git_repo
+
+logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(message)s")
+logger = logging.getLogger(__name__)
+
+
+def _time(repeat: int, operation, cleanup=None) -> float:
+    """Time an operation.
+
+    Args:
+        repeat: the number of timed runs.
+        operation: the function to time.
+        cleanup: the function undoing the operation between runs, if any.
+
+    Returns:
+        The median duration of the operation in seconds.
+    """
+    durations = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        operation()
+        durations.append(time.perf_counter() - start)
+        if cleanup:
+            cleanup()
+    return statistics.median(durations)
+
+
+def _push_record(work_dir: Path, url: str) -> None:
+    """Push a new commit to the branch of the remote repository.
+
+    Args:
+        work_dir: the directory to clone the repository in.
+        url: the URL of the remote repository.
+    """
+    writer = work_dir / "writer"
+    shutil.rmtree(writer, ignore_errors=True)
+    _git(work_dir, "clone", "--depth=1", "--branch=main", url, str(writer))
+    with (writer / "example0.com.domain").open("a", encoding="utf-8") as file:
+        file.write(f'benchmark{time.monotonic_ns()} 600 IN TXT "token"\n')
+    _git(writer, "commit", "-qam", "Add benchmark record")
+    _git(writer, "push", "-q", "origin", "HEAD:main")
+
+
+def _measure(work_dir: Path, url: str, repeat: int) -> str:
+    """Time the clones and fetches of the branch of the remote repository.
+
+    Args:
+        work_dir: the directory to clone the repository in.
+        url: the URL of the remote repository.
+        repeat: the number of timed runs per operation.
+
+    Returns:
+        The timings, formatted for display.
+    """
+    clone = work_dir / "clone"
+    options = ("--filter=blob:none", "--no-checkout", "--single-branch", "--branch=main")
+
+    def remove_clone() -> None:
+        shutil.rmtree(clone, ignore_errors=True)
+
+    full = _time(repeat, lambda: _git(work_dir, "clone", *options, url, str(clone)), remove_clone)
+    shallow = _time(
+        repeat,
+        lambda: _git(work_dir, "clone", "--depth=1", *options, url, str(clone)),
+        remove_clone,
+    )
+    _git(work_dir, "clone", *options, url, str(clone))
+    durations = []
+    for _ in range(repeat):
+        _push_record(work_dir, url)
+        start = time.perf_counter()
+        _git(clone, "fetch", "-q", "origin", "main")
+        durations.append(time.perf_counter() - start)
+    commits = subprocess.run(  # nosec B603
+        [GIT, "rev-list", "--count", "FETCH_HEAD"],
+        cwd=clone,
+        env=_git_env(),
+        capture_output=True,
+        text=True,
+        check=True,
+    ).stdout.strip()
+    remove_clone()
+    return (
+        f"commits={commits} full clone={full * 1000:.1f}ms shallow clone={shallow * 1000:.1f}ms "
+        f"fetch={statistics.median(durations) * 1000:.1f}ms"
+    )
+
+
+def main(argv: list[str] | None = None) -> int:
+    """Run the benchmark.
+
+    Args:
+        argv: command-line arguments.
+
+    Returns:
+        Process exit code.
+    """
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument(
+        "--commits", type=int, default=100000, help="Number of record-change commits."
+    )
+    parser.add_argument("--domains", type=int, default=5, help="Number of zone files.")
+    parser.add_argument(
+        "--keep", type=int, default=100, help="Number of recent commits kept by the compaction."
+    )
+    parser.add_argument("--repeat", type=int, default=3, help="Number of timed runs per case.")
+    options = parser.parse_args(argv)
+
+    from api import history
+
+    with TemporaryDirectory() as tmp:
+        work_dir = Path(tmp)
+        url, _ = build_git_repo(work_dir, options.domains, options.commits, options.domains)
+        print(f"before: {_measure(work_dir, url, options.repeat)}", flush=True)
+        history.GIT_REPO_URL = url
+        os.environ.update(_git_env())
+        start = time.perf_counter()
+        history.compact_history(options.keep)
+        print(f"compaction={(time.perf_counter() - start) * 1000:.1f}ms", flush=True)
+        print(f"after: {_measure(work_dir, url, options.repeat)}", flush=True)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
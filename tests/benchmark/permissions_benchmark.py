@@ -0,0 +1,221 @@
+#!/usr/bin/env python3
+# Copyright 2026 Canonical Ltd.
+# See LICENSE file for licensing details.
+
+r"""Benchmark for the present/cleanup authorization check as the number of grants grows.
+
+Service accounts can hold thousands of subdomain grants. For each grant count, the benchmark
+creates a user holding that many ``DomainUserPermission`` rows against a real test database
+and times ``user_can_manage`` for a FQDN covered by the last grant, the worst case for a
+linear scan, and for a FQDN no grant covers. The first check loads the grants into the
+permission cache and the following ones hit it, so cold and warm checks are reported apart,
+along with how many queries they run. The same checks are also answered straight from the
+database by ``query_permission``, the path taken when the cache is disabled, against a
+background of other domains and users each holding a grant, so that the indexed lookup is
+measured on a realistically sized table.
+
+Usage:
+    python tests/benchmark/permissions_benchmark.py \\
+        --grants 10 100 1000 10000 \\
+        --checks 100 \\
+        --domains 100000 \\
+        --users 10000
+"""
+
+import argparse
+import logging
+import os
+import sys
+import time
+
+import django
+
+logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(message)s")
+logger = logging.getLogger(__name__)
+
+
+def _seed_grants(username: str, grants: int):
+    """Create a user holding subdomain grants on ``grants`` domains.
+
+    Args:
+        username: the name of the user to create.
+        grants: the number of grants.
+
+    Returns:
+        The user.
+    """
+    from api.models import AccessLevel, Domain, DomainUserPermission
+    from django.contrib.auth.models import User
+
+    user = User.objects.create_user(username)
+    domains = Domain.objects.bulk_create(
+        Domain(fqdn=f"{username}-{i}.example.com") for i in range(grants)
+    )
+    DomainUserPermission.objects.bulk_create(
+        (
+            DomainUserPermission(domain=domain, user=user, access_level=AccessLevel.SUBDOMAIN)
+            for domain in domains
+        ),
+        batch_size=1000,
+    )
+    return user
+
+
+def _seed_background(domains: int, users: int) -> None:
+    """Create domains and users unrelated to the benchmarked ones, each user with a grant.
+
+    Args:
+        domains: the number of domains.
+        users: the number of users, granted domain access to the domains in turn.
+    """
+    from api.models import AccessLevel, Domain, DomainUserPermission
+    from django.contrib.auth.models import User
+
+    created_domains = Domain.objects.bulk_create(
+        (Domain(fqdn=f"_acme-challenge.site{i}.background.example.org") for i in range(domains)),
+        batch_size=1000,
+    )
+    created_users = User.objects.bulk_create(
+        (User(username=f"background{i}") for i in range(users)), batch_size=1000
+    )
+    if not created_domains:
+        return
+    DomainUserPermission.objects.bulk_create(
+        (
+            DomainUserPermission(
+                domain=created_domains[i % len(created_domains)],
+                user=user,
+                access_level=AccessLevel.DOMAIN,
+            )
+            for i, user in enumerate(created_users)
+        ),
+        batch_size=1000,
+    )
+
+
+def _time_query(user, fqdn: str, checks: int) -> float:
+    """Time an authorization check answered straight from the database.
+
+    Args:
+        user: the user to check.
+        fqdn: the FQDN to check.
+        checks: the number of checks to run.
+
+    Returns:
+        The mean duration of a check in seconds.
+    """
+    from api.permissions import query_permission
+
+    start = time.perf_counter()
+    for _ in range(checks):
+        query_permission(user, fqdn)
+    return (time.perf_counter() - start) / checks
+
+
+def _time_checks(user, fqdn: str, checks: int) -> tuple[float, int, float, int, bool]:
+    """Time an authorization check for a FQDN with a cold cache, then repeated warm ones.
+
+    Args:
+        user: the user to check.
+        fqdn: the FQDN to check.
+        checks: the number of warm checks to run.
+
+    Returns:
+        The duration of the cold check in seconds and its number of queries, the mean
+        duration of a warm check in seconds and their number of queries, and the outcome.
+    """
+    from api.permissions import permission_cache, user_can_manage
+    from django.db import connection
+    from django.test.utils import CaptureQueriesContext
+
+    permission_cache.clear()
+    start = time.perf_counter()
+    with CaptureQueriesContext(connection) as cold_queries:
+        allowed = user_can_manage(user, fqdn)
+    cold = time.perf_counter() - start
+    start = time.perf_counter()
+    with CaptureQueriesContext(connection) as warm_queries:
+        for _ in range(checks):
+            user_can_manage(user, fqdn)
+    warm = (time.perf_counter() - start) / checks
+    return cold, len(cold_queries), warm, len(warm_queries), allowed
+
+
+def run_benchmark(options: argparse.Namespace) -> None:
+    """Time the authorization check for every grant count.
+
+    Args:
+        options: the parsed command-line options.
+    """
+    os.environ.setdefault("DJANGO_SETTINGS_MODULE", "api.tests.settings")
+    django.setup()
+
+    from django.test.utils import setup_test_environment, teardown_test_environment
+
+    setup_test_environment()
+
+    from django.test.runner import DiscoverRunner
+
+    runner = DiscoverRunner(verbosity=0)
+    old_config = runner.setup_databases()
+    try:
+        logger.info(
+            "Creating %d background domains and %d background users",
+            options.domains,
+            options.users,
+        )
+        _seed_background(options.domains, options.users)
+        for grants in options.grants:
+            username = f"service{grants}"
+            logger.info("Granting %d subdomains to %s", grants, username)
+            user = _seed_grants(username, grants)
+            for label, fqdn in (
+                ("granted", f"_acme-challenge.{username}-{grants - 1}.example.com"),
+                ("denied", "_acme-challenge.unknown.example.com"),
+            ):
+                cold, cold_queries, warm, warm_queries, allowed = _time_checks(
+                    user, fqdn, options.checks
+                )
+                assert allowed is (label == "granted"), f"unexpected outcome for {fqdn}"
+                query = _time_query(user, fqdn, options.checks)
+                print(
+                    f"grants={grants} {label}: cold={cold * 1000:.3f}ms "
+                    f"cold_queries={cold_queries} warm={warm * 1000:.3f}ms "
+                    f"warm_queries={warm_queries} query={query * 1000:.3f}ms",
+                    flush=True,
+                )
+    finally:
+        runner.teardown_databases(old_config)
+        teardown_test_environment()
+
+
+def main(argv: list[str] | None = None) -> int:
+    """Run the benchmark.
+
+    Args:
+        argv: command-line arguments.
+
+    Returns:
+        Process exit code.
+    """
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument(
+        "--grants",
+        type=int,
+        nargs="+",
+        default=[10, 100, 1000, 10000],
+        help="Grant counts to benchmark.",
+    )
+    parser.add_argument(
+        "--checks", type=int, default=100, help="Number of warm checks timed per grant count."
+    )
+    parser.add_argument(
+        "--domains", type=int, default=100000, help="Number of background domains."
+    )
+    parser.add_argument("--users", type=int, default=10000, help="Number of background users.")
+    run_benchmark(parser.parse_args(argv))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,172 @@
+#!/usr/bin/env python3
+# Copyright 2026 Canonical Ltd.
+# See LICENSE file for licensing details.
+
+r"""Throughput benchmark of the DNS record changes as the zone files are sharded.
+
+Without sharding, every zone file lives in one repository branch, so the changes to unrelated
+domains all queue up for the same commit and push. With ``DJANGO_DNS_SHARDS``, groups of
+domains are stored in their own repositories or branches, each with its own mirror and writer,
+so their changes are committed and pushed in parallel.
+
+For every shard count, the benchmark builds that many synthetic DNS-records repositories like
+``benchmark.py`` does, spreads the domains over them round-robin, the first repository being
+the default one, and keeps ``--concurrency`` record changes for distinct subdomains in flight
+through ``write_dns_record``. It reports the aggregate throughput of all the shards and the
+number of commits each of them received.
+
+Pushing to a local bare repository is nearly free, whereas a push to a git hosting service
+takes a network round-trip and the server-side checks, during which a writer cannot commit
+the next changes. ``--push-latency`` makes every remote repository wait that long before
+accepting a push, through a ``pre-receive`` hook, to stand in for it. With no latency, more
+shards mean more, smaller commits competing for the same CPU, so sharding only pays off when
+the pushes dominate.
+
+Usage:
+    python tests/benchmark/shard_benchmark.py \\
+        --shards 1 2 4 8 \\
+        --domains 8 \\
+        --concurrency 32 \\
+        --records 400 \\
+        --push-latency 0.2
+"""
+
+import argparse
+import logging
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from tempfile import TemporaryDirectory
+
+from benchmark import FQDN_PREFIX, _git_env, build_git_repo
+
+logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(message)s")
+logger = logging.getLogger(__name__)
+
+
+def _configure_shards(
+    work_dir: Path, shards: int, domains: list[str], commits: int, push_latency: float
+) -> tuple[list[str], str]:
+    """Build a repository per shard and spread the domains over them.
+
+    Args:
+        work_dir: the directory to create the repositories in.
+        shards: the number of shards.
+        domains: the domains of the zone files.
+        commits: the number of commits of history of each repository.
+        push_latency: the seconds each repository waits before accepting a push.
+
+    Returns:
+        the URLs of the repositories, the first one being the default one, and the shards
+        configuration of the others.
+    """
+    urls = []
+    for shard in range(shards):
+        shard_dir = work_dir / f"shard{shard}"
+        shard_dir.mkdir()
+        url, _ = build_git_repo(shard_dir, len(domains), commits, len(domains))
+        if push_latency:
+            hook = shard_dir / "remote.git" / "hooks" / "pre-receive"
+            hook.write_text(f"#!/bin/sh\nexec sleep {push_latency}\n", encoding="utf-8")
+            hook.chmod(0o755)
+        urls.append(url)
+    configuration = ";".join(
+        f"{','.join(domains[shard::shards])}={urls[shard]}" for shard in range(1, shards)
+    )
+    return urls, configuration
+
+
+def run_benchmark(options: argparse.Namespace) -> None:
+    """Time concurrent record changes for each shard count.
+
+    Args:
+        options: the parsed command-line options.
+    """
+    from api import dns, mirror
+    from git import Repo
+
+    os.environ.update(_git_env())
+    domains = [f"example{i}.com" for i in range(options.domains)]
+    dns.DNS_GIT_WRITER = options.git_writer
+    dns.DNS_BATCH_WINDOW = options.batch_window
+    for shards in options.shards:
+        with TemporaryDirectory() as tmp:
+            work_dir = Path(tmp)
+            mirror.GIT_MIRROR_DIR = str(work_dir)
+            urls, dns.DNS_SHARDS = _configure_shards(
+                work_dir, shards, domains, options.commits, options.push_latency
+            )
+            dns.GIT_REPO_URL = urls[0]
+            dns._writers.clear()  # pylint: disable=protected-access
+            mirror._mirrors.clear()  # pylint: disable=protected-access
+            # Clone every shard up front, so that only the changes are timed.
+            for domain in domains:
+                dns.write_dns_record(f"{FQDN_PREFIX}warmup.{domain}", "warmup")
+            heads = [Repo(url.removeprefix("file://")).head.commit for url in urls]
+
+            start = time.perf_counter()
+            with ThreadPoolExecutor(max_workers=options.concurrency) as executor:
+                for future in [
+                    executor.submit(
+                        dns.write_dns_record,
+                        f"{FQDN_PREFIX}site{i}.{domains[i % len(domains)]}",
+                        f"token{i}",
+                    )
+                    for i in range(options.records)
+                ]:
+                    future.result()
+            elapsed = time.perf_counter() - start
+
+            commits = [
+                len(list(Repo(url.removeprefix("file://")).iter_commits(f"{head}..HEAD")))
+                for url, head in zip(urls, heads)
+            ]
+            print(
+                f"shards={shards} records={options.records} "
+                f"throughput={options.records / elapsed:.1f}rec/s "
+                f"commits per shard={commits}",
+                flush=True,
+            )
+
+
+def main(argv: list[str] | None = None) -> int:
+    """Run the benchmark.
+
+    Args:
+        argv: command-line arguments.
+
+    Returns:
+        Process exit code.
+    """
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument(
+        "--shards", type=int, nargs="+", default=[1, 2, 4, 8], help="Numbers of shards."
+    )
+    parser.add_argument("--domains", type=int, default=8, help="Number of zone files.")
+    parser.add_argument(
+        "--commits", type=int, default=1000, help="Commits of history of each repository."
+    )
+    parser.add_argument(
+        "--concurrency", type=int, default=32, help="Number of record changes in flight."
+    )
+    parser.add_argument("--records", type=int, default=400, help="Number of record changes.")
+    parser.add_argument(
+        "--batch-window", type=float, default=0, help="Seconds to wait for concurrent changes."
+    )
+    parser.add_argument(
+        "--push-latency",
+        type=float,
+        default=0.2,
+        help="Seconds the remote repositories wait before accepting a push.",
+    )
+    parser.add_argument(
+        "--git-writer", choices=("worktree", "objectdb"), default="objectdb", help="Git writer."
+    )
+    run_benchmark(parser.parse_args(argv))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
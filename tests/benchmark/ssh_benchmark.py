@@ -0,0 +1,219 @@
+#!/usr/bin/env python3
+# Copyright 2026 Canonical Ltd.
+# See LICENSE file for licensing details.
+
+r"""Benchmark of the SSH handshakes saved by multiplexing the git operations.
+
+Every git network operation over SSH opens its own TCP connection, exchanges keys and
+authenticates before transferring anything. The provider instead keeps one master connection
+per remote repository and multiplexes the git sessions over it, only checking the master is
+still alive before using it.
+
+The benchmark builds the same synthetic DNS-records repository as ``benchmark.py`` and serves
+it from a throwaway ``sshd`` listening on a local port, with freshly generated host and user
+keys. It then times ``git ls-remote`` and an incremental shallow ``git fetch`` against it,
+first connecting for every operation, then through a master connection, and reports the
+median duration of both and of the master health check. ``sshd`` must be installed; pass
+``--url`` and ``--ssh-option`` to measure against an existing SSH remote instead, whose
+latency is closer to a production git server.
+
+Usage:
+    python tests/benchmark/ssh_benchmark.py \\
+        --commits 2000 \\
+        --repeat 20
+"""
+
+import argparse
+import getpass
+import logging
+import shlex
+import shutil
+import socket
+import statistics
+import subprocess  # nosec B404
+import sys
+import time
+from pathlib import Path
+from tempfile import TemporaryDirectory
+
+from benchmark import GIT, _git_env, build_git_repo
+
+logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(message)s")
+logger = logging.getLogger(__name__)
+
+SSH_KEYGEN = shutil.which("ssh-keygen") or "ssh-keygen"
+SSHD = shutil.which("sshd") or "/usr/sbin/sshd"
+
+
+def _free_port() -> int:
+    """Get a free local port.
+
+    Returns:
+        the port number.
+    """
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def _start_sshd(directory: Path) -> tuple[subprocess.Popen, int, list[str]]:
+    """Start a throwaway sshd accepting a freshly generated user key.
+
+    Args:
+        directory: the directory to write the keys and the configuration in.
+
+    Returns:
+        the sshd process, its port and the ssh options to connect to it.
+
+    Raises:
+        RuntimeError: if sshd is not installed or does not start listening.
+    """
+    if not Path(SSHD).exists():
+        raise RuntimeError("sshd is not installed, pass --url to use an existing SSH remote")
+    for key in ("host_key", "user_key"):
+        subprocess.run(  # nosec B603
+            [SSH_KEYGEN, "-q", "-t", "ed25519", "-N", "", "-f", str(directory / key)],
+            check=True,
+        )
+    shutil.copy(directory / "user_key.pub", directory / "authorized_keys")
+    port = _free_port()
+    config = directory / "sshd_config"
+    config.write_text(
+        f"ListenAddress 127.0.0.1\nPort {port}\nHostKey {directory / 'host_key'}\n"
+        f"AuthorizedKeysFile {directory / 'authorized_keys'}\nPidFile {directory / 'sshd.pid'}\n"
+        "StrictModes no\nUsePAM no\nPasswordAuthentication no\n",
+        encoding="utf-8",
+    )
+    process = subprocess.Popen(  # pylint: disable=consider-using-with  # nosec B603
+        [SSHD, "-D", "-e", "-f", str(config)], stderr=subprocess.DEVNULL
+    )
+    deadline = time.monotonic() + 10
+    while time.monotonic() < deadline:
+        try:
+            socket.create_connection(("127.0.0.1", port), timeout=1).close()
+            break
+        except OSError:
+            time.sleep(0.05)
+    else:
+        process.terminate()
+        raise RuntimeError("sshd did not start listening")
+    options = [
+        "-i",
+        str(directory / "user_key"),
+        "-o",
+        f"UserKnownHostsFile={directory / 'known_hosts'}",
+        "-o",
+        "StrictHostKeyChecking=accept-new",
+    ]
+    return process, port, options
+
+
+def _time_git(cwd: Path, ssh_command: str, repeat: int, *args: str) -> float:
+    """Time a git network operation.
+
+    Args:
+        cwd: the directory to run git in.
+        ssh_command: the ssh command for git to use.
+        repeat: the number of timed runs.
+        args: the git arguments.
+
+    Returns:
+        The median duration of the operation in seconds.
+    """
+    env = {**_git_env(), "GIT_SSH_COMMAND": ssh_command}
+    durations = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        subprocess.run(  # nosec B603
+            [GIT, *args], cwd=cwd, env=env, check=True, capture_output=True
+        )
+        durations.append(time.perf_counter() - start)
+    return statistics.median(durations)
+
+
+def run_benchmark(url: str, ssh_options: list[str], work_dir: Path, repeat: int) -> None:
+    """Time the git network operations with and without a master connection.
+
+    Args:
+        url: the SSH URL of the remote repository.
+        ssh_options: the ssh options to connect to the remote.
+        work_dir: the directory to clone the repository in.
+        repeat: the number of timed runs per operation.
+    """
+    from api.mirror import SSH, SshMaster
+
+    master = SshMaster(url, 300, ssh_options)
+    plain_command = shlex.join([SSH, *ssh_options])
+    clone = work_dir / "clone"
+    subprocess.run(  # nosec B603
+        [GIT, "clone", "--depth=1", "--filter=blob:none", "--no-checkout", url, str(clone)],
+        env={**_git_env(), "GIT_SSH_COMMAND": plain_command},
+        check=True,
+        capture_output=True,
+    )
+    try:
+        master.ensure()
+        durations = []
+        for _ in range(repeat):
+            start = time.perf_counter()
+            master.ensure()
+            durations.append(time.perf_counter() - start)
+        print(f"health check={statistics.median(durations) * 1000:.3f}ms", flush=True)
+        for label, args in (
+            ("ls-remote", ("ls-remote", url)),
+            ("fetch", ("fetch", "--depth=1", "origin", "main")),
+        ):
+            plain = _time_git(clone, plain_command, repeat, *args)
+            multiplexed = _time_git(clone, master.ssh_command, repeat, *args)
+            print(
+                f"{label}: handshake={plain * 1000:.3f}ms multiplexed={multiplexed * 1000:.3f}ms "
+                f"saved={(plain - multiplexed) * 1000:.3f}ms",
+                flush=True,
+            )
+    finally:
+        master.close()
+
+
+def main(argv: list[str] | None = None) -> int:
+    """Run the benchmark.
+
+    Args:
+        argv: command-line arguments.
+
+    Returns:
+        Process exit code.
+    """
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument(
+        "--url", help="SSH URL of an existing remote repository with a main branch."
+    )
+    parser.add_argument(
+        "--ssh-option",
+        action="append",
+        default=[],
+        help="ssh option to connect to the existing remote, e.g. -oIdentityFile=<path>.",
+    )
+    parser.add_argument(
+        "--commits", type=int, default=2000, help="Number of commits of the synthetic repository."
+    )
+    parser.add_argument("--repeat", type=int, default=20, help="Number of timed runs per case.")
+    options = parser.parse_args(argv)
+    with TemporaryDirectory() as tmp:
+        work_dir = Path(tmp)
+        if options.url:
+            run_benchmark(options.url, options.ssh_option, work_dir, options.repeat)
+            return 0
+        remote_url, _ = build_git_repo(work_dir, 5, options.commits, 5)
+        sshd, port, ssh_options = _start_sshd(work_dir)
+        try:
+            url = f"ssh://{getpass.getuser()}@127.0.0.1:{port}{remote_url.removeprefix('file://')}"
+            logger.info("Serving %s", url)
+            run_benchmark(url, ssh_options, work_dir, options.repeat)
+        finally:
+            sshd.terminate()
+            sshd.wait()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,134 @@
+#!/usr/bin/env python3
+# Copyright 2026 Canonical Ltd.
+# See LICENSE file for licensing details.
+
+r"""Micro-benchmark of the validation every present and cleanup request goes through.
+
+Each request validates its FQDN with ``PresentForm`` or ``CleanupForm`` and maps it to the
+zone file of its domain, which takes microseconds. Opening an OpenTelemetry span costs about
+as much, so these steps are accounted for in the span of the request instead of their own.
+
+The benchmark configures the same in-memory tracing as ``benchmark.py``, validates a mix of
+valid and invalid FQDNs, and reports the mean duration of the validation of a request and of
+the FQDN check alone, the number of spans opened per request and, for reference, the cost of
+a single span. Most of the validation time goes to the bookkeeping of the Django forms. The
+benchmark exits with an error if the validation takes longer than ``--threshold``
+microseconds or opens any span.
+
+Usage:
+    python tests/benchmark/validation_benchmark.py \\
+        --requests 100000 \\
+        --threshold 200
+"""
+
+import argparse
+import os
+import sys
+import time
+
+import django
+from benchmark import setup_tracing
+
+FQDNS = [
+    "_acme-challenge.example.com",
+    "_acme-challenge.site1.example.com.",
+    "_acme-challenge.a-very-long-subdomain-label.with.several.labels.example.org",
+    "_acme-challenge.-invalid.example.com",
+    "example.com",
+]
+
+
+def _validate(form_class, fqdn: str) -> None:
+    """Validate a request the way the present and cleanup views do.
+
+    Args:
+        form_class: the form validating the request.
+        fqdn: the FQDN of the request.
+    """
+    from api.dns import _record_filename
+
+    form = form_class({"fqdn": fqdn, "value": "token"})
+    if form.is_valid():
+        _record_filename(form.cleaned_data["fqdn"])
+
+
+def _time_span(tracer, iterations: int) -> float:
+    """Time opening and closing an empty span.
+
+    Args:
+        tracer: the tracer.
+        iterations: the number of spans to open.
+
+    Returns:
+        The mean duration of a span in seconds.
+    """
+    start = time.perf_counter()
+    for _ in range(iterations):
+        with tracer.start_as_current_span("span"):
+            pass
+    return (time.perf_counter() - start) / iterations
+
+
+def run_benchmark(options: argparse.Namespace) -> bool:
+    """Time the validation of the requests.
+
+    Args:
+        options: the parsed command-line options.
+
+    Returns:
+        Whether the validation stayed below the threshold without opening any span.
+    """
+    os.environ.setdefault("DJANGO_SETTINGS_MODULE", "api.tests.settings")
+    exporter = setup_tracing()
+    django.setup()
+
+    from api.forms import CleanupForm, PresentForm, is_fqdn_compliant
+    from opentelemetry import trace
+
+    tracer = trace.get_tracer(__name__)
+    for fqdn in FQDNS:
+        _validate(PresentForm, fqdn)
+    exporter.clear()
+    start = time.perf_counter()
+    for i in range(options.requests):
+        _validate(CleanupForm if i % 2 else PresentForm, FQDNS[i % len(FQDNS)])
+    validation = (time.perf_counter() - start) / options.requests
+    spans = len(exporter.get_finished_spans()) / options.requests
+    start = time.perf_counter()
+    for i in range(options.requests):
+        is_fqdn_compliant(FQDNS[i % len(FQDNS)])
+    check = (time.perf_counter() - start) / options.requests
+    span = _time_span(tracer, options.requests)
+    print(
+        f"validation={validation * 1e6:.2f}us fqdn check={check * 1e6:.2f}us "
+        f"spans per request={spans:g} "
+        f"span={span * 1e6:.2f}us threshold={options.threshold:g}us",
+        flush=True,
+    )
+    return validation * 1e6 <= options.threshold and not spans
+
+
+def main(argv: list[str] | None = None) -> int:
+    """Run the benchmark.
+
+    Args:
+        argv: command-line arguments.
+
+    Returns:
+        Process exit code.
+    """
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument(
+        "--requests", type=int, default=100000, help="Number of requests validated."
+    )
+    parser.add_argument(
+        "--threshold",
+        type=float,
+        default=200,
+        help="Maximum mean duration of the validation of a request, in microseconds.",
+    )
+    return 0 if run_benchmark(parser.parse_args(argv)) else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,218 @@
+#!/usr/bin/env python3
+# Copyright 2026 Canonical Ltd.
+# See LICENSE file for licensing details.
+
+r"""Micro-benchmark of the zone file edits as the zone files and the groups of changes grow.
+
+For each zone file size, the benchmark writes a synthetic zone file holding that many TXT
+records and times the edits a group of changes makes to it. The previous editor read the whole
+file, then for each change filtered every line out into a new list, splitting each line twice,
+joined the list back and wrote the file over. The streaming editor tokenizes each line once and
+applies all the changes of the group in a single pass, writing the result to a temporary file
+renamed over the original one. The indexed editor looks the records up in the index cached for
+the zone file by a previous request, only writing the spliced content out. All the editors get
+the same edits, alternately removing and adding records spread over the file, and their
+results are checked to match.
+
+Usage:
+    python tests/benchmark/zone_edit_benchmark.py \\
+        --records 1000 10000 100000 \\
+        --edits 1 10 100 \\
+        --repeat 5
+"""
+
+import argparse
+import logging
+import statistics
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Dict, Tuple
+
+logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(message)s")
+logger = logging.getLogger(__name__)
+
+
+def _write_zone_file(path: Path, records: int) -> None:
+    """Write a synthetic zone file.
+
+    Args:
+        path: the zone file.
+        records: the number of TXT records in the zone file.
+    """
+    from api.zones import RECORD_CONTENT
+
+    with path.open("w", encoding="utf-8") as file:
+        file.write("; synthetic zone file\n")
+        for i in range(records):
+            file.write(RECORD_CONTENT.format(record=f"site{i}", value=f"token{i}"))
+
+
+def _build_edits(records: int, edits: int) -> Dict[Tuple[str, str | None], bool]:
+    """Build edits spread over a synthetic zone file.
+
+    Args:
+        records: the number of TXT records in the zone file.
+        edits: the number of edits.
+
+    Returns:
+        whether to add or remove the record, by subdomain and value.
+    """
+    step = max(records // edits, 1)
+    built: Dict[Tuple[str, str | None], bool] = {}
+    for i in range(edits):
+        position = (i * step) % records
+        if i % 2:
+            built[(f"site{position}", f"token{position}")] = False
+        else:
+            built[(f"site{position}", f"new-token{position}")] = True
+    return built
+
+
+def _edit_sequentially(path: Path, edits: Dict[Tuple[str, str | None], bool]) -> None:
+    """Edit a zone file the way the previous editor did, one full pass per edit.
+
+    Args:
+        path: the zone file.
+        edits: whether to add or remove the record, by subdomain and value.
+    """
+    from api.zones import RECORD_CONTENT
+
+    content = path.read_text("utf-8")
+    for (subdomain, value), add in edits.items():
+        record = RECORD_CONTENT.format(record=subdomain, value=value)
+        new_content = [
+            line
+            for line in content.splitlines(keepends=True)
+            if add
+            or line.strip().startswith(";")
+            or not line.split()
+            or line.split()[0] != subdomain
+            or line.split()[-1] != f"\042{value}\042"
+        ]
+        if add and record not in new_content:
+            new_content.append(record)
+        content = "".join(new_content)
+    path.write_text(content, encoding="utf-8")
+
+
+def _edit_streaming(path: Path, edits: Dict[Tuple[str, str | None], bool]) -> None:
+    """Edit a zone file with the streaming editor, in a single pass.
+
+    Args:
+        path: the zone file.
+        edits: whether to add or remove the record, by subdomain and value.
+    """
+    from api.zones import rewrite_zone_file
+
+    rewrite_zone_file(path, edits, durable=False)
+
+
+def _time_indexed(directory: Path, records: int, edits: int, repeat: int) -> float:
+    """Time the indexed editor on the cached index of a synthetic zone file.
+
+    Args:
+        directory: the directory to write the zone file in.
+        records: the number of TXT records in the zone file.
+        edits: the number of edits.
+        repeat: the number of timed runs.
+
+    Returns:
+        The median duration of an edit in seconds.
+    """
+    from api.zones import ZoneIndex
+
+    path = directory / "_edit_indexed.domain"
+    durations = []
+    for _ in range(repeat):
+        _write_zone_file(path, records)
+        with path.open(encoding="utf-8") as file:
+            index = ZoneIndex(file)
+        start = time.perf_counter()
+        index.edit(_build_edits(records, edits))
+        path.write_bytes(index.content())
+        durations.append(time.perf_counter() - start)
+    return statistics.median(durations)
+
+
+def _time_editor(editor, directory: Path, records: int, edits: int, repeat: int) -> float:
+    """Time an editor on a freshly written synthetic zone file.
+
+    Args:
+        editor: the function editing the zone file.
+        directory: the directory to write the zone file in.
+        records: the number of TXT records in the zone file.
+        edits: the number of edits.
+        repeat: the number of timed runs.
+
+    Returns:
+        The median duration of an edit in seconds.
+    """
+    path = directory / f"{editor.__name__}.domain"
+    durations = []
+    for _ in range(repeat):
+        _write_zone_file(path, records)
+        start = time.perf_counter()
+        editor(path, _build_edits(records, edits))
+        durations.append(time.perf_counter() - start)
+    return statistics.median(durations)
+
+
+def run_benchmark(options: argparse.Namespace) -> None:
+    """Time the editors for each zone file size and number of edits.
+
+    Args:
+        options: the parsed command-line options.
+    """
+    logging.getLogger().setLevel(logging.CRITICAL)
+    with tempfile.TemporaryDirectory() as directory:
+        for records in options.records:
+            for edits in options.edits:
+                sequential = _time_editor(
+                    _edit_sequentially, Path(directory), records, edits, options.repeat
+                )
+                streaming = _time_editor(
+                    _edit_streaming, Path(directory), records, edits, options.repeat
+                )
+                indexed = _time_indexed(Path(directory), records, edits, options.repeat)
+                contents = {
+                    (Path(directory) / f"{editor}.domain").read_text()
+                    for editor in ("_edit_sequentially", "_edit_streaming", "_edit_indexed")
+                }
+                assert len(contents) == 1, "editors disagree"
+                print(
+                    f"records={records} edits={edits} "
+                    f"sequential={sequential * 1000:.3f}ms streaming={streaming * 1000:.3f}ms "
+                    f"indexed={indexed * 1000:.3f}ms",
+                    flush=True,
+                )
+
+
+def main(argv: list[str] | None = None) -> int:
+    """Run the benchmark.
+
+    Args:
+        argv: command-line arguments.
+
+    Returns:
+        Process exit code.
+    """
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument(
+        "--records",
+        type=int,
+        nargs="+",
+        default=[1000, 10000, 100000],
+        help="Numbers of TXT records in the zone file.",
+    )
+    parser.add_argument(
+        "--edits", type=int, nargs="+", default=[1, 10, 100], help="Numbers of edits per group."
+    )
+    parser.add_argument("--repeat", type=int, default=5, help="Number of timed runs per case.")
+    run_benchmark(parser.parse_args(argv))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())